@@ -1,11 +1,17 @@
 import streamlit as st
 import os
+import uuid
+from html import escape
 from pathlib import Path
-from video_generator import VideoGenerator
-from script_generator import ScriptGenerator
-from PIL import Image
+from urllib.parse import quote
+from encoding import DEFAULT_PROFILE, DRAFT_PROFILE, PROFILES
+from render_service import QueueFull, RenderClient, RenderError, start_service
 import time
 
+# Scripts and videos are made by the render service's worker processes; this
+# page only submits jobs and polls them. The image pipeline (NumPy) is imported
+# on the first upload, so the page comes up fast
+
 # Page config
 st.set_page_config(
     page_title="AI Ad Video Generator",
@@ -42,6 +48,99 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_render_client():
+    """Client of the render service at AD_RENDER_SERVICE_URL, or of a local one
+
+    Without a URL the app uses the service on AD_RENDER_SERVICE_PORT and
+    starts it when nothing answers there, so every app process on the
+    machine shares its workers. Either way renders run in the service's
+    worker processes, as many at a time as it has workers however many
+    sessions are open. Browsers get videos straight from the service only
+    when AD_RENDER_SERVICE_PUBLIC_URL says where they can reach it.
+    """
+    public_url = os.environ.get("AD_RENDER_SERVICE_PUBLIC_URL")
+    if os.environ.get("AD_RENDER_SERVICE_URL"):
+        return RenderClient(os.environ["AD_RENDER_SERVICE_URL"], public_url=public_url)
+    
+    workers = os.environ.get("AD_RENDER_WORKERS")
+    return start_service(host=os.environ.get("AD_RENDER_SERVICE_HOST", "127.0.0.1"),
+                         port=int(os.environ.get("AD_RENDER_SERVICE_PORT", 8766)),
+                         workers=int(workers) if workers else None, public_url=public_url)
+
+render_client = get_render_client()
+
+@st.cache_resource(max_entries=32)
+def load_upload(file_id, _uploaded_file):
+    """Decode an upload once; every rerun gets the same ProductImage back"""
+    from product_image import ProductImage
+    return ProductImage(_uploaded_file.getvalue(), name=_uploaded_file.name)
+
+# Finished videos copied next to the app for Streamlit's static file server
+# (server.enableStaticServing in .streamlit/config.toml), which reads them
+# from disk per request, with Range support for seeking
+STATIC_VIDEO_DIR = Path(__file__).resolve().parent / "static" / "videos"
+MAX_STATIC_VIDEOS = 16
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def video_bytes(name):
+    """A finished video read from the render service, one copy for all sessions"""
+    return render_client.file_bytes(name)
+
+def static_video_url(name):
+    """Same-origin URL of a finished video, None when static serving is off or it expired
+    
+    The first session to show a video copies it from the render service to
+    STATIC_VIDEO_DIR; names are never reused, so every later one just links
+    to that file. The least recently shown copies beyond MAX_STATIC_VIDEOS
+    are removed.
+    """
+    if not st.get_option("server.enableStaticServing"):
+        return None
+    path = STATIC_VIDEO_DIR / name
+    if path.exists():
+        path.touch()
+    else:
+        STATIC_VIDEO_DIR.mkdir(parents=True, exist_ok=True)
+        if not render_client.save_file(name, path):
+            return None
+        copies = sorted(STATIC_VIDEO_DIR.glob("*.mp4"), key=lambda p: p.stat().st_mtime)
+        for stale in copies[:-MAX_STATIC_VIDEOS]:
+            stale.unlink(missing_ok=True)
+    return f"app/static/videos/{quote(name)}"
+
+def show_video(name):
+    """Video player fed by the render service or Streamlit's static files, never session memory"""
+    url = render_client.file_url(name)
+    if url:
+        st.video(url)
+        return
+    url = static_video_url(name)
+    if url:
+        st.markdown(f'<video src="{escape(url)}" controls style="width: 100%"></video>',
+                    unsafe_allow_html=True)
+    else:
+        st.video(video_bytes(name))
+
+def download_link(label, name, file_name):
+    """Download button for a finished video
+    
+    With AD_RENDER_SERVICE_PUBLIC_URL set the browser downloads it from the
+    render service, otherwise from Streamlit's static file server. Only with
+    static serving off does Streamlit send the bytes from memory.
+    """
+    url = render_client.file_url(name, download_name=file_name)
+    if url:
+        st.link_button(label, url)
+        return
+    url = static_video_url(name)
+    if url:
+        st.markdown(f'<a href="{escape(url)}" download="{escape(file_name)}">{escape(label)}</a>',
+                    unsafe_allow_html=True)
+    else:
+        st.download_button(label=label, data=video_bytes(name), file_name=file_name,
+                           mime="video/mp4", key=f"download_{name}")
+
 # Header
 st.markdown('<h1 class="main-header">🎬 AI Ad Video Generator</h1>', unsafe_allow_html=True)
 st.markdown('<p class="sub-header">Transform your product images into stunning 30-second advertisement videos!</p>', unsafe_allow_html=True)
@@ -49,8 +148,17 @@ st.markdown('<p class="sub-header">Transform your product images into stunning 3
 # Initialize session state
 if 'video_generated' not in st.session_state:
     st.session_state.video_generated = False
-if 'video_path' not in st.session_state:
-    st.session_state.video_path = None
+if 'video_name' not in st.session_state:
+    st.session_state.video_name = None
+if 'video_is_draft' not in st.session_state:
+    st.session_state.video_is_draft = False
+if 'render_report' not in st.session_state:
+    st.session_state.render_report = None
+if 'variants' not in st.session_state:
+    st.session_state.variants = None
+if 'client_id' not in st.session_state:
+    # Identifies this session to the render service's per-client job limit
+    st.session_state.client_id = uuid.uuid4().hex
 
 # Sidebar - Configuration
 with st.sidebar:
@@ -79,6 +187,12 @@ with st.sidebar:
     st.subheader("🎥 Video Settings")
     video_duration = st.slider("Video Duration (seconds)", 15, 45, 30)
     video_quality = st.select_slider("Quality", options=["720p", "1080p"], value="1080p")
+    encoding_names = [name for name in PROFILES if name != DRAFT_PROFILE]
+    encoding_profile = st.selectbox("Encoding", encoding_names,
+                                    index=encoding_names.index(DEFAULT_PROFILE),
+                                    format_func=lambda name: f"{name}: {PROFILES[name].description}",
+                                    help="Trades encode time against file size; "
+                                         "drafts always use the fastest profile")
     
     include_voiceover = st.checkbox("Include Voiceover", value=True)
     include_music = st.checkbox("Include Background Music", value=False)
@@ -90,6 +204,95 @@ with st.sidebar:
     product_name = st.text_input("Product Name", placeholder="Auto-detected from image")
     product_tagline = st.text_input("Tagline", placeholder="E.g., 'Innovation Redefined'")
     discount_text = st.text_input("Offer/Discount", placeholder="E.g., '50% OFF!'")
+    
+    st.markdown("---")
+    
+    # Diagnostics
+    st.subheader("⏱️ Diagnostics")
+    profile_run = st.checkbox("Profile rendering (cProfile)", value=False,
+                              help="Slower; adds the hottest functions to the performance report")
+
+def submit_job(kind, product, priority, **fields):
+    """Queue a render job for this session; None (with a message) when the service is busy"""
+    try:
+        return render_client.submit(kind, product.data, product.name, hf_key=hf_key,
+                                    pexels_key=pexels_key or None, priority=priority,
+                                    client=st.session_state.client_id, **fields)
+    except QueueFull as e:
+        st.warning(f"⏳ The renderers are busy ({e}). Please try again in about {e.retry_after}s.")
+    except RenderError as e:
+        st.error(f"❌ {e}")
+    return None
+
+def generate_video(product, draft=False, script=None):
+    """Render through the service with progress, storing the result in session state
+    
+    Returns True when the video is ready; on failure the error stays on screen.
+    """
+    # Progress tracking
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    
+    # A promoted draft reuses its script; otherwise the job writes one first
+    fields = {} if script else {"tagline": product_tagline or None}
+    job = submit_job(
+        "video", product,
+        # Drafts are quick and someone is waiting on them, so they go first
+        "high" if draft else "normal",
+        script=script,
+        duration=video_duration,
+        quality=video_quality,
+        include_voiceover=include_voiceover,
+        include_music=include_music,
+        product_name=product_name,
+        discount_text=discount_text,
+        draft=draft,
+        encoding=None if draft else encoding_profile,
+        profile=profile_run,
+        **fields
+    )
+    if job is None:
+        progress_bar.empty()
+        return False
+    
+    def show_status(status):
+        if status["state"] == "queued":
+            status_text.text(f"⏳ Waiting for a free renderer ({status['position']} job(s) ahead)...")
+            progress_bar.progress(10)
+        elif status["state"] == "running":
+            elapsed = time.time() - status["started"]
+            action = "Creating draft preview" if draft else "Writing the script and creating the video"
+            status_text.text(f"🎥 {action}... {elapsed:.0f}s")
+            progress_bar.progress(40)
+    
+    try:
+        status = render_client.wait(job["id"], on_status=show_status)
+    except RenderError as e:
+        st.error(f"❌ {e}")
+        return False
+    if status["state"] != "done":
+        progress_bar.empty()
+        st.error(f"❌ Error generating video: {status.get('error', status['state'])}")
+        return False
+    
+    result = status["result"]
+    progress_bar.progress(100)
+    status_text.text("✅ Draft ready!" if draft else "✅ Video generated successfully!")
+    
+    with st.expander("📄 View Generated Script"):
+        st.write(result["script"])
+    
+    st.session_state.video_generated = True
+    st.session_state.video_name = result["video"]
+    st.session_state.video_is_draft = draft
+    st.session_state.script = result["script"]
+    st.session_state.product = product
+    st.session_state.render_report = result["report"]
+    st.session_state.variants = None
+    
+    if not draft:
+        st.success("🎉 Your advertisement video is ready!")
+    return True
 
 # Main content area
 col1, col2 = st.columns([1, 1])
@@ -103,15 +306,9 @@ with col1:
     )
     
     if uploaded_file:
-        # Display uploaded image
-        image = Image.open(uploaded_file)
-        st.image(image, caption="Your Product", use_container_width=True)
-        
-        # Save uploaded file
-        temp_dir = Path("temp")
-        temp_dir.mkdir(exist_ok=True)
-        image_path = temp_dir / uploaded_file.name
-        image.save(image_path)
+        # Decoded once per upload; the same object feeds the preview, script and video
+        product = load_upload(uploaded_file.file_id, uploaded_file)
+        st.image(product.preview, caption="Your Product", use_container_width=True)
         
         st.success(f"✅ Image uploaded: {uploaded_file.name}")
 
@@ -119,100 +316,111 @@ with col2:
     st.subheader("🎬 Generate Video")
     
     if uploaded_file:
-        if st.button("🚀 Generate Advertisement Video", type="primary"):
+        col_draft, col_full = st.columns([1, 1])
+        with col_draft:
+            preview_clicked = st.button("⚡ Quick Preview",
+                                        help="Low-resolution draft in a few seconds to check the layout")
+        with col_full:
+            generate_clicked = st.button("🚀 Generate Advertisement Video", type="primary")
+        
+        if preview_clicked or generate_clicked:
             if not hf_key:
                 st.error("❌ Please provide Hugging Face API key in sidebar!")
             else:
-                # Progress tracking
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                try:
-                    # Step 1: Generate script
-                    status_text.text("📝 Generating AI script...")
-                    progress_bar.progress(20)
-                    
-                    script_gen = ScriptGenerator(hf_key)
-                    script = script_gen.generate_script(
-                        str(image_path),
-                        product_name or None,
-                        product_tagline or None,
-                        discount_text or None
-                    )
-                    
-                    with st.expander("📄 View Generated Script"):
-                        st.write(script)
-                    
-                    # Step 2: Generate video
-                    status_text.text("🎥 Creating video with animations...")
-                    progress_bar.progress(40)
-                    
-                    video_gen = VideoGenerator(
-                        hf_api_key=hf_key,
-                        pexels_api_key=pexels_key if pexels_key else None
-                    )
-                    
-                    status_text.text("🎨 Adding effects and transitions...")
-                    progress_bar.progress(60)
-                    
-                    output_path = video_gen.create_ad_video(
-                        image_path=str(image_path),
-                        script=script,
-                        duration=video_duration,
-                        quality=video_quality,
-                        include_voiceover=include_voiceover,
-                        include_music=include_music,
-                        product_name=product_name,
-                        discount_text=discount_text
-                    )
-                    
-                    status_text.text("✨ Finalizing video...")
-                    progress_bar.progress(90)
-                    
-                    time.sleep(1)
-                    progress_bar.progress(100)
-                    status_text.text("✅ Video generated successfully!")
-                    
-                    st.session_state.video_generated = True
-                    st.session_state.video_path = output_path
-                    
-                    st.success("🎉 Your advertisement video is ready!")
-                    
-                except Exception as e:
-                    st.error(f"❌ Error generating video: {str(e)}")
-                    st.exception(e)
+                generate_video(product, draft=preview_clicked)
     else:
         st.info("👆 Upload a product image to get started!")
 
 # Video preview and download
-if st.session_state.video_generated and st.session_state.video_path:
+if st.session_state.video_generated and st.session_state.video_name:
     st.markdown("---")
     st.subheader("🎬 Your Advertisement Video")
     
     col_preview, col_download = st.columns([2, 1])
     
+    video_size = render_client.file_size(st.session_state.video_name)
+    
     with col_preview:
-        if os.path.exists(st.session_state.video_path):
-            st.video(st.session_state.video_path)
+        if video_size is None:
+            st.warning("⌛ This video has expired from the output store. Generate it again.")
+        else:
+            show_video(st.session_state.video_name)
+        
+        if st.session_state.video_is_draft:
+            st.info("👀 This is a low-resolution draft preview. Happy with the layout?")
+            if st.button("🚀 Render Full Quality", type="primary"):
+                # Rerun to show the new video; on failure keep the error visible
+                if generate_video(st.session_state.product, draft=False,
+                                  script=st.session_state.script):
+                    st.rerun()
     
     with col_download:
         st.markdown("### 📥 Download")
         
-        with open(st.session_state.video_path, 'rb') as video_file:
-            video_bytes = video_file.read()
-            st.download_button(
-                label="⬇️ Download MP4",
-                data=video_bytes,
-                file_name=f"ad_video_{int(time.time())}.mp4",
-                mime="video/mp4"
-            )
+        if video_size is not None:
+            download_link("⬇️ Download MP4", st.session_state.video_name,
+                          f"ad_video_{int(time.time())}.mp4")
+            st.info(f"📊 File size: {video_size / 1024 / 1024:.2f} MB")
         
-        st.info(f"📊 File size: {os.path.getsize(st.session_state.video_path) / 1024 / 1024:.2f} MB")
+        report_data = st.session_state.render_report
+        if report_data:
+            st.caption(f"⏱️ Generated in {report_data['total_seconds']:.1f}s")
+        
+        # Every aspect ratio and quality, one render pass per aspect
+        if not st.session_state.video_is_draft:
+            if st.button("📐 Export All Formats",
+                         help="9:16, 1:1 and 16:9 at 1080p and 720p, one render per aspect"):
+                # Batch exports yield to single videos someone is watching for
+                job = submit_job("variants", st.session_state.product, "low",
+                                 script=st.session_state.script,
+                                 include_voiceover=include_voiceover, include_music=include_music,
+                                 product_name=product_name, discount_text=discount_text,
+                                 encoding=encoding_profile)
+                if job:
+                    with st.spinner("Rendering all formats..."):
+                        try:
+                            status = render_client.wait(job["id"])
+                        except RenderError as e:
+                            status = {"state": "failed", "error": str(e)}
+                    if status["state"] == "done":
+                        st.session_state.variants = {
+                            (variant["aspect"], variant["quality"]): variant["video"]
+                            for variant in status["result"]["variants"]}
+                    else:
+                        st.error(f"❌ Error exporting formats: {status.get('error', status['state'])}")
+            
+            for (aspect, quality), variant_name in (st.session_state.variants or {}).items():
+                if render_client.file_size(variant_name) is not None:
+                    download_link(f"⬇️ {aspect} {quality}", variant_name,
+                                  f"ad_video_{aspect.replace(':', 'x')}_{quality}.mp4")
         
         if st.button("🔄 Generate Another Video"):
             st.session_state.video_generated = False
-            st.session_state.video_path = None
+            st.session_state.video_name = None
+            st.session_state.video_is_draft = False
+            st.session_state.render_report = None
+            st.session_state.variants = None
             st.rerun()
+    
+    report_data = st.session_state.render_report
+    if report_data:
+        with st.expander("⏱️ Performance Report"):
+            st.markdown("**Stages**")
+            st.table([{"stage": span["name"], "seconds": span["seconds"]}
+                      for span in report_data["spans"]])
+            
+            if report_data["frames"]:
+                st.markdown("**Frame render times per scene**")
+                st.table([{"scene": scene, **{k: v for k, v in stats.items() if k != "histogram"}}
+                          for scene, stats in report_data["frames"].items()])
+                scene = st.selectbox("Histogram", list(report_data["frames"]))
+                st.bar_chart({"frames": report_data["frames"][scene]["histogram"]})
+            
+            if report_data["counters"]:
+                st.json(report_data["counters"])
+            if report_data["profile"]:
+                st.markdown("**cProfile (cumulative)**")
+                st.code(report_data["profile"])
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,180 @@
+import os
+import subprocess
+import threading
+
+import numpy as np
+
+from ffmpeg_writer import get_ffmpeg_exe
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+
+# Music level under the voice, and how far it ducks while the voice speaks
+MUSIC_GAIN = 0.35
+DUCK_DEPTH = 0.3
+
+
+class AudioTrack:
+    """PCM audio held in memory: float32 samples, shape (frames, channels), in [-1, 1]
+
+    Tracks are decoded, padded, mixed and handed to ffmpeg without touching
+    the disk; `open_pipe()` streams the samples into an ffmpeg input.
+    """
+
+    def __init__(self, samples, sample_rate=SAMPLE_RATE):
+        self.samples = samples
+        self.sample_rate = sample_rate
+
+    @classmethod
+    def decode(cls, path, sample_rate=SAMPLE_RATE, channels=CHANNELS):
+        """Decode any file ffmpeg understands straight into memory"""
+        result = subprocess.run([get_ffmpeg_exe(), '-loglevel', 'error', '-i', str(path),
+                                 '-f', 'f32le', '-ac', str(channels), '-ar', str(sample_rate), '-'],
+                                capture_output=True)
+        if result.returncode != 0:
+            raise IOError(f"ffmpeg could not decode {path}: "
+                          f"{result.stderr.decode(errors='replace').strip()}")
+        samples = np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, channels)
+        return cls(samples, sample_rate)
+
+    @classmethod
+    def silence(cls, duration, sample_rate=SAMPLE_RATE, channels=CHANNELS):
+        return cls(np.zeros((int(round(duration * sample_rate)), channels), dtype=np.float32),
+                   sample_rate)
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    @property
+    def channels(self):
+        return self.samples.shape[1]
+
+    def fit(self, duration):
+        """Copy padded with silence or cut to exactly `duration` seconds"""
+        frames = int(round(duration * self.sample_rate))
+        samples = np.zeros((frames, self.channels), dtype=np.float32)
+        keep = min(frames, len(self.samples))
+        samples[:keep] = self.samples[:keep]
+        return AudioTrack(samples, self.sample_rate)
+
+    def loop(self, duration):
+        """Copy repeated end to end to fill `duration` seconds"""
+        frames = int(round(duration * self.sample_rate))
+        if not len(self.samples):
+            return AudioTrack.silence(duration, self.sample_rate, self.channels)
+        return AudioTrack(self.samples[np.arange(frames) % len(self.samples)], self.sample_rate)
+
+    def pcm16(self):
+        """Interleaved signed 16-bit little-endian bytes, ffmpeg's s16le"""
+        return (np.clip(self.samples, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+    def input_args(self, fd):
+        """ffmpeg input arguments reading this track from file descriptor `fd`"""
+        return ['-f', 's16le', '-ar', str(self.sample_rate), '-ac', str(self.channels),
+                '-i', f'pipe:{fd}']
+
+    def open_pipe(self):
+        """(read fd for ffmpeg, thread writing the PCM into the pipe)
+
+        Pass the fd to the ffmpeg process (pass_fds) and close it once the
+        process has started or failed; the thread ends when ffmpeg has read
+        everything or gone away.
+        """
+        read_fd, write_fd = os.pipe()
+        data = self.pcm16()
+
+        def feed():
+            try:
+                with open(write_fd, 'wb') as pipe:
+                    pipe.write(data)
+            except (BrokenPipeError, OSError):
+                pass
+
+        thread = threading.Thread(target=feed, daemon=True, name="audio-feed")
+        thread.start()
+        return read_fd, thread
+
+
+def synthesize_music(duration, sample_rate=SAMPLE_RATE, bpm=110):
+    """Offline music bed: a four-chord pad over a soft kick, generated with NumPy"""
+    t = np.arange(int(round(duration * sample_rate)), dtype=np.float32) / sample_rate
+    beat = 60 / bpm
+    bar = beat * 4
+
+    # A minor, F, C, G; each bar fades in and out so chord changes don't click
+    chords = np.array([(220.00, 261.63, 329.63), (174.61, 220.00, 261.63),
+                       (130.81, 164.81, 196.00), (196.00, 246.94, 293.66)], dtype=np.float32)
+    freqs = chords[(t // bar).astype(np.int64) % len(chords)]
+    in_bar = t % bar
+    envelope = np.minimum(1.0, np.minimum(in_bar / 0.05, (bar - in_bar) / 0.1))
+
+    phase = 2 * np.pi * t[:, None]
+    # Slight detune between channels widens the pad
+    left = np.sin(phase * freqs).mean(axis=1)
+    right = np.sin(phase * freqs * 1.003).mean(axis=1)
+
+    in_beat = t % beat
+    kick = np.sin(2 * np.pi * (45 + 80 * np.exp(-in_beat * 30)) * in_beat) * np.exp(-in_beat * 14)
+
+    pad = 0.5 * envelope[:, None] * np.stack([left, right], axis=1)
+    samples = pad + 0.4 * kick[:, None]
+    return AudioTrack(samples.astype(np.float32), sample_rate)
+
+
+def duck_gain(speech, sample_rate=SAMPLE_RATE, depth=DUCK_DEPTH, threshold=0.02,
+              window=0.02, attack=0.08, release=0.4):
+    """Per-sample music gain: `depth` while `speech` is active, 1.0 in between
+
+    Speech activity is the RMS of `window`-second blocks. Activity is held
+    for `release` seconds so short pauses between words don't pump the
+    music, and gain changes ramp over `attack` seconds.
+    """
+    hop = max(1, int(sample_rate * window))
+    mono = np.abs(speech).mean(axis=1) if speech.ndim > 1 else np.abs(speech)
+    blocks = -(-len(mono) // hop)
+    padded = np.zeros(blocks * hop, dtype=np.float32)
+    padded[:len(mono)] = mono
+    rms = np.sqrt((padded.reshape(blocks, hop) ** 2).mean(axis=1))
+
+    hold = max(1, int(round(release / window)))
+    active = np.convolve(rms > threshold, np.ones(hold), mode="full")[:blocks] > 0
+    target = np.where(active, depth, 1.0)
+
+    ramp = max(1, int(round(attack / window)))
+    edges = np.pad(target, (ramp // 2, ramp - 1 - ramp // 2), mode="edge")
+    smooth = np.convolve(edges, np.ones(ramp) / ramp, mode="valid")
+
+    centers = (np.arange(blocks) + 0.5) * hop
+    return np.interp(np.arange(len(mono)), centers, smooth).astype(np.float32)
+
+
+def build_soundtrack(duration, voiceover_path=None, music=False, music_path=None,
+                     music_gain=MUSIC_GAIN, duck_depth=DUCK_DEPTH):
+    """The video's audio as one in-memory AudioTrack, or None when there is none
+
+    The voiceover is decoded once and padded or cut to `duration`. With
+    music=True a bed (`music_path` looped, or synthesize_music()) is mixed
+    underneath and ducked while the voice speaks.
+    """
+    if not voiceover_path and not music:
+        return None
+
+    if voiceover_path:
+        track = AudioTrack.decode(voiceover_path).fit(duration)
+    else:
+        track = AudioTrack.silence(duration)
+    if not music:
+        return track
+
+    if music_path:
+        bed = AudioTrack.decode(music_path).loop(duration)
+    else:
+        bed = synthesize_music(duration)
+    gain = music_gain * duck_gain(track.samples, track.sample_rate, depth=duck_depth)
+    mixed = track.samples + bed.samples * gain[:, None]
+
+    peak = np.abs(mixed).max() if len(mixed) else 0.0
+    if peak > 0.99:
+        mixed *= 0.99 / peak
+    return AudioTrack(mixed.astype(np.float32), track.sample_rate)
@@ -0,0 +1,57 @@
+import numpy as np
+from collections import OrderedDict
+
+
+class BackgroundCache:
+    """Gradient backgrounds built once per (kind, resolution, colors) as NumPy arrays"""
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+
+    def radial(self, width, height, base=(20, 20, 30), strength=50):
+        """Radial glow, brightest in the center and fading to `base` at the corners"""
+        key = ("radial", width, height, tuple(base), strength)
+        return self._get(key, lambda: self._build_radial(width, height, base, strength))
+
+    def linear(self, width, height, color1, color2):
+        """Vertical gradient from `color1` at the top to `color2` at the bottom"""
+        key = ("linear", width, height, tuple(color1), tuple(color2))
+        return self._get(key, lambda: self._build_linear(width, height, color1, color2))
+
+    def clear(self):
+        self._cache.clear()
+
+    def _get(self, key, build):
+        arr = self._cache.get(key)
+        if arr is None:
+            arr = build()
+            # Cached arrays are shared by every frame, so callers only get read-only views
+            arr.setflags(write=False)
+            self._cache[key] = arr
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return arr.view()
+
+    @staticmethod
+    def _build_radial(width, height, base, strength):
+        ys = np.arange(height, dtype=np.float64)[:, None] - height / 2
+        xs = np.arange(width, dtype=np.float64)[None, :] - width / 2
+        dist = np.sqrt(xs ** 2 + ys ** 2)
+        max_dist = ((width / 2) ** 2 + (height / 2) ** 2) ** 0.5
+        brightness = (strength * (1 - dist / max_dist)).astype(np.int32)
+
+        arr = np.empty((height, width, 3), dtype=np.uint8)
+        for channel, value in enumerate(base):
+            arr[:, :, channel] = np.clip(value + brightness, 0, 255)
+        return arr
+
+    @staticmethod
+    def _build_linear(width, height, color1, color2):
+        t = (np.arange(height, dtype=np.float64) / height)[:, None]
+        c1 = np.asarray(color1, dtype=np.float64)[None, :]
+        c2 = np.asarray(color2, dtype=np.float64)[None, :]
+        rows = (c1 * (1 - t) + c2 * t).astype(np.uint8)
+        return np.ascontiguousarray(np.broadcast_to(rows[:, None, :], (height, width, 3)))
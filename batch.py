@@ -0,0 +1,240 @@
+"""Batch ad generation for a whole product catalog
+
+Reads a CSV or JSONL manifest with one product per row:
+
+    id,image_path,product_name,tagline,discount
+    sku-1,images/mug.png,Coffee Mug,Start every morning right,20% OFF
+
+Only image_path is required; relative paths are resolved against the
+manifest's folder and id defaults to the row number. Every finished item is
+appended to a checkpoint file, so re-running the same command after a crash
+or kill skips everything already rendered.
+
+Usage: python batch.py catalog.csv --workers 4 --quality 720p
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+from encoding import DEFAULT_PROFILE, PROFILES
+
+# Per-process generators, created on first use inside each worker
+_script_gen = None
+_video_gen = None
+
+
+def load_manifest(path):
+    """List of item dicts from a .csv or .jsonl manifest"""
+    path = Path(path)
+    if path.suffix.lower() in (".jsonl", ".ndjson"):
+        with open(path) as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+
+    items = []
+    for index, row in enumerate(rows, start=1):
+        row = {key.strip(): (value.strip() if isinstance(value, str) else value)
+               for key, value in row.items() if key}
+        image_path = row.get("image_path") or row.get("image")
+        if not image_path:
+            raise ValueError(f"{path}:{index}: missing image_path")
+        image_path = Path(image_path)
+        if not image_path.is_absolute():
+            image_path = path.parent / image_path
+        items.append({
+            "id": str(row.get("id") or index),
+            "image_path": str(image_path),
+            "product_name": row.get("product_name") or None,
+            "tagline": row.get("tagline") or None,
+            "discount": row.get("discount") or None,
+        })
+    return items
+
+
+def load_checkpoint(path):
+    """Map of item id -> last recorded result"""
+    done = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    # A line cut short by a kill mid-write
+                    continue
+                done[result["id"]] = result
+    return done
+
+
+def append_checkpoint(path, result):
+    with open(path, "a") as f:
+        f.write(json.dumps(result) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def process_item(item, options):
+    """Worker entry point: script + video for one catalog item"""
+    global _script_gen, _video_gen
+    from product_image import ProductImage
+    from script_generator import ScriptGenerator
+    from video_generator import VideoGenerator
+
+    if _video_gen is None:
+        _script_gen = ScriptGenerator(options["hf_key"], api_url=options.get("api_url"))
+        # Each worker gets its own temp dir so voiceovers never collide
+        # Catalog results are kept: no quota or age limit on the batch output dir
+        _video_gen = VideoGenerator(options["hf_key"], output_dir=options["output_dir"],
+                                    temp_dir=Path(options["temp_dir"]) / f"worker_{os.getpid()}",
+                                    output_max_bytes=None, output_max_age=None)
+
+    start = time.time()
+    try:
+        # Read once, shared by script and video generation
+        product = ProductImage.open(item["image_path"])
+        if options["offline"]:
+            script = _script_gen.generate_fallback_script(item["product_name"] or "this product")
+        else:
+            script = _script_gen.generate_script(product, item["product_name"],
+                                                 item["tagline"], item["discount"])
+        if options.get("all_formats"):
+            # Every aspect and quality, one render pass per aspect
+            variants = _video_gen.create_ad_videos(
+                product, script, include_voiceover=options["voiceover"],
+                product_name=item["product_name"], discount_text=item["discount"],
+                encoding=options.get("encoding"))
+            return {"id": item["id"], "status": "ok",
+                    "output": variants.get(("9:16", options["quality"])),
+                    "outputs": {f"{aspect} {quality}": path
+                                for (aspect, quality), path in variants.items()},
+                    "seconds": round(time.time() - start, 2)}
+        output_path = _video_gen.create_ad_video(
+            product, script, quality=options["quality"],
+            include_voiceover=options["voiceover"], product_name=item["product_name"],
+            discount_text=item["discount"], encoder="ffmpeg", encoding=options.get("encoding"))
+        return {"id": item["id"], "status": "ok", "output": output_path,
+                "seconds": round(time.time() - start, 2)}
+    except Exception as e:
+        return {"id": item["id"], "status": "failed", "error": f"{type(e).__name__}: {e}",
+                "traceback": traceback.format_exc(), "seconds": round(time.time() - start, 2)}
+
+
+def run_batch(items, options, checkpoint_path, workers=1, retry_failed=True, log=print):
+    """Process `items` in a bounded pool, skipping those already in the checkpoint"""
+    done = load_checkpoint(checkpoint_path)
+    pending = [item for item in items
+               if done.get(item["id"], {}).get("status") != "ok"
+               and (retry_failed or item["id"] not in done)]
+    skipped = len(items) - len(pending)
+    log(f"{len(items)} items, {skipped} already done, {len(pending)} to render "
+        f"with {workers} worker(s)")
+
+    results = []
+    start = time.time()
+    queue = iter(pending)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Keep only a couple of items per worker in flight instead of the whole catalog
+        in_flight = set()
+        for item in queue:
+            in_flight.add(pool.submit(process_item, item, options))
+            if len(in_flight) >= workers * 2:
+                break
+
+        while in_flight:
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                append_checkpoint(checkpoint_path, result)
+                results.append(result)
+
+                elapsed = time.time() - start
+                rate = len(results) / elapsed * 3600 if elapsed else 0.0
+                if result["status"] == "ok":
+                    log(f"[{len(results)}/{len(pending)}] {result['id']}: ok in "
+                        f"{result['seconds']}s ({rate:.0f} ads/hour)")
+                else:
+                    log(f"[{len(results)}/{len(pending)}] {result['id']}: FAILED {result['error']}")
+
+                next_item = next(queue, None)
+                if next_item is not None:
+                    in_flight.add(pool.submit(process_item, next_item, options))
+
+    elapsed = time.time() - start
+    succeeded = [r for r in results if r["status"] == "ok"]
+    return {
+        "total": len(items),
+        "skipped": skipped,
+        "processed": len(results),
+        "succeeded": len(succeeded),
+        "failed": {r["id"]: r["error"] for r in results if r["status"] != "ok"},
+        "elapsed_seconds": round(elapsed, 1),
+        "ads_per_hour": round(len(succeeded) / elapsed * 3600, 1) if elapsed else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate ads for every product in a manifest")
+    parser.add_argument("manifest", help="CSV or JSONL manifest of products")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--quality", default="720p", choices=["720p", "1080p"])
+    parser.add_argument("--encoding", default=DEFAULT_PROFILE, choices=list(PROFILES),
+                        help="encoding profile (see encoding.py)")
+    parser.add_argument("--output-dir", default="outputs/batch")
+    parser.add_argument("--temp-dir", default="temp/batch")
+    parser.add_argument("--checkpoint", help="progress file (default: <manifest>.checkpoint.jsonl)")
+    parser.add_argument("--all-formats", action="store_true",
+                        help="export 9:16, 1:1 and 16:9 at 1080p and 720p, each aspect rendered once")
+    parser.add_argument("--no-voiceover", action="store_true")
+    parser.add_argument("--offline", action="store_true",
+                        help="use the built-in fallback scripts instead of the Hugging Face API")
+    parser.add_argument("--api-url", help="inference endpoint to use instead of Hugging Face "
+                        "(e.g. benchmarks/stub_inference_server.py)")
+    parser.add_argument("--skip-failed", action="store_true",
+                        help="do not retry items that failed in a previous run")
+    parser.add_argument("--report", help="write the final summary as JSON to this path")
+    args = parser.parse_args(argv)
+
+    hf_key = os.environ.get("HUGGINGFACE_API_KEY")
+    if not hf_key and not args.offline and not args.api_url:
+        parser.error("set HUGGINGFACE_API_KEY or pass --offline")
+
+    items = load_manifest(args.manifest)
+    checkpoint_path = args.checkpoint or f"{args.manifest}.checkpoint.jsonl"
+    options = {
+        "hf_key": hf_key,
+        "quality": args.quality,
+        "output_dir": args.output_dir,
+        "temp_dir": args.temp_dir,
+        "voiceover": not args.no_voiceover,
+        "offline": args.offline,
+        "api_url": args.api_url,
+        "all_formats": args.all_formats,
+        "encoding": args.encoding,
+    }
+
+    summary = run_batch(items, options, checkpoint_path, workers=args.workers,
+                        retry_failed=not args.skip_failed)
+
+    print(f"\nDone: {summary['succeeded']} ok, {len(summary['failed'])} failed, "
+          f"{summary['skipped']} skipped in {summary['elapsed_seconds']}s "
+          f"({summary['ads_per_hour']} ads/hour)")
+    for item_id, error in summary["failed"].items():
+        print(f"  {item_id}: {error}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
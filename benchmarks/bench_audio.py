@@ -0,0 +1,90 @@
+"""Audio assembly: moviepy AudioFileClip + temp-audio.m4a vs. the in-memory soundtrack
+
+Both mux a 30s voiceover into the same video-only MP4. The old path decodes
+the MP3 with moviepy, encodes it to a temporary M4A and muxes that file; the
+new one decodes once into NumPy, pads it and pipes the PCM into the muxer.
+The in-memory path is also timed with the ducked music bed mixed in.
+
+Usage: python benchmarks/bench_audio.py [--voiceover-seconds 20] [--runs 3]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from audio_track import build_soundtrack  # noqa: E402
+from ffmpeg_writer import get_ffmpeg_exe  # noqa: E402
+from parallel_render import concat_segments  # noqa: E402
+
+DURATION = 30
+
+
+def old_mux(video_path, voiceover_path, output_path, workdir):
+    from moviepy.editor import AudioFileClip
+
+    audio = AudioFileClip(voiceover_path)
+    audio = audio.subclip(0, min(audio.duration, DURATION))
+    temp_audio = os.path.join(workdir, "temp-audio.m4a")
+    audio.write_audiofile(temp_audio, fps=44100, codec="aac", logger=None)
+    audio.close()
+    concat_segments([video_path], output_path, audio=temp_audio, duration=DURATION)
+    written = os.path.getsize(temp_audio)
+    os.remove(temp_audio)
+    return written
+
+
+def new_mux(video_path, voiceover_path, output_path, music=False):
+    track = build_soundtrack(DURATION, voiceover_path, music=music)
+    concat_segments([video_path], output_path, audio=track, duration=DURATION)
+    return 0
+
+
+def best_of(runs, fn):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        written = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--voiceover-seconds", type=float, default=20)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        video_path = os.path.join(workdir, "video.mp4")
+        voiceover_path = os.path.join(workdir, "voiceover.mp3")
+        output_path = os.path.join(workdir, "out.mp4")
+        ffmpeg = [get_ffmpeg_exe(), "-y", "-loglevel", "error", "-f", "lavfi"]
+        subprocess.run(ffmpeg + ["-i", f"color=c=black:s=720x1280:d={DURATION}:r=30",
+                                 "-c:v", "libx264", "-preset", "ultrafast", video_path], check=True)
+        subprocess.run(ffmpeg + ["-i", f"sine=frequency=220:duration={args.voiceover_seconds}",
+                                 "-q:a", "9", voiceover_path], check=True)
+
+        rows = [
+            ("moviepy + temp m4a", lambda: old_mux(video_path, voiceover_path, output_path,
+                                                   workdir)),
+            ("in-memory", lambda: new_mux(video_path, voiceover_path, output_path)),
+            ("in-memory + music", lambda: new_mux(video_path, voiceover_path, output_path,
+                                                  music=True)),
+        ]
+        print(f"{args.voiceover_seconds:g}s voiceover muxed into a {DURATION}s video "
+              f"(best of {args.runs})")
+        print(f"{'audio path':<20} {'wall':>8} {'temp audio written':>19}")
+        for name, fn in rows:
+            seconds, written = best_of(args.runs, fn)
+            print(f"{name:<20} {seconds * 1000:>6.0f}ms {written / 1024:>16.0f}KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Background rendering benchmark: legacy PIL drawing vs. the cached NumPy engine
+
+Usage: python benchmarks/bench_backgrounds.py [--frames N]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backgrounds import BackgroundCache  # noqa: E402
+
+RESOLUTIONS = {"720p": (720, 1280), "1080p": (1080, 1920)}
+
+# (scene, kind, colors, frames per scene at 30fps)
+SCENES = [
+    ("hook", "radial", ((20, 20, 30), 50), 150),
+    ("benefits", "linear", ((30, 30, 50), (50, 30, 70)), 300),
+    ("social_proof", "linear", ((40, 20, 60), (20, 40, 80)), 150),
+    ("urgency", "linear", ((80, 20, 20), (120, 30, 30)), 150),
+]
+
+
+def legacy_radial(width, height, base, strength):
+    """Per-pixel draw.point loop previously used by create_hook_scene"""
+    bg = Image.new('RGB', (width, height), base)
+    draw = ImageDraw.Draw(bg)
+    max_dist = ((width / 2) ** 2 + (height / 2) ** 2) ** 0.5
+    for y in range(height):
+        for x in range(width):
+            dist = ((x - width / 2) ** 2 + (y - height / 2) ** 2) ** 0.5
+            brightness = int(strength * (1 - dist / max_dist))
+            draw.point((x, y), (base[0] + brightness, base[1] + brightness, base[2] + brightness))
+    return bg
+
+
+def legacy_linear(width, height, color1, color2):
+    """Per-line draw.line loop previously used by create_gradient_bg"""
+    bg = Image.new('RGB', (width, height))
+    draw = ImageDraw.Draw(bg)
+    for y in range(height):
+        t = y / height
+        r = int(color1[0] * (1 - t) + color2[0] * t)
+        g = int(color1[1] * (1 - t) + color2[1] * t)
+        b = int(color1[2] * (1 - t) + color2[2] * t)
+        draw.line([(0, y), (width, y)], fill=(r, g, b))
+    return bg
+
+
+def time_per_call(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=30,
+                        help="frames sampled per measurement (the per-pixel path always samples 1)")
+    args = parser.parse_args()
+
+    print(f"{'res':<6} {'scene':<13} {'legacy/frame':>13} {'numpy/frame':>12} "
+          f"{'legacy/scene':>13} {'numpy/scene':>12} {'speedup':>9}")
+
+    for res, (width, height) in RESOLUTIONS.items():
+        for scene, kind, colors, scene_frames in SCENES:
+            cache = BackgroundCache()
+            if kind == "radial":
+                legacy = lambda: legacy_radial(width, height, *colors)
+                fast = lambda: Image.fromarray(cache.radial(width, height, *colors))
+                legacy_calls = 1
+            else:
+                legacy = lambda: legacy_linear(width, height, *colors)
+                fast = lambda: Image.fromarray(cache.linear(width, height, *colors))
+                legacy_calls = args.frames
+
+            legacy_frame = time_per_call(legacy, legacy_calls)
+
+            # The first call builds the gradient, every later frame reuses it
+            start = time.perf_counter()
+            fast()
+            build = time.perf_counter() - start
+            fast_frame = time_per_call(fast, args.frames)
+
+            legacy_scene = legacy_frame * scene_frames
+            fast_scene = build + fast_frame * (scene_frames - 1)
+            print(f"{res:<6} {scene:<13} {legacy_frame * 1000:>11.2f}ms {fast_frame * 1000:>10.2f}ms "
+                  f"{legacy_scene:>12.2f}s {fast_scene:>11.3f}s {legacy_scene / fast_scene:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
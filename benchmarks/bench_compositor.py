@@ -0,0 +1,119 @@
+"""Per-frame compositing cost: PIL paste/putalpha vs. the premultiplied NumPy compositor
+
+Each row is one operation a scene performs every frame, done the way the
+scenes used to (PIL images, paste with the sprite as mask, a fresh RGBA
+canvas plus putalpha for fades, glow and product resized, rotated and
+pasted separately) and the way they do now (compositor.blit on pooled
+frame arrays, fades and text pasted by PIL on a copy of the region,
+product and glow placed with one affine pass and one blit). The faded
+sprite is reused, as a cached sprite is. Sizes follow the scene layouts
+at --quality.
+
+Usage: python benchmarks/bench_compositor.py [--quality 1080p] [--frames 60]
+"""
+import argparse
+import time
+
+import numpy as np
+from PIL import Image, ImageEnhance, ImageFilter
+
+from common import RESOLUTIONS, make_product_image
+from compositor import Sprite, affine, blit
+from frame_pool import CHANNELS
+from sprite_cache import SpriteCache
+from text_renderer import TextRenderer
+
+
+def mip_chain(img):
+    """Halving chain the old sprite cache resized from"""
+    levels = [img]
+    while max(levels[-1].size) >= 128:
+        w, h = levels[-1].size
+        levels.append(levels[-1].resize((w // 2, h // 2), Image.Resampling.BOX))
+    return levels
+
+
+def per_frame(frames, fn):
+    start = time.perf_counter()
+    for n in range(frames):
+        fn(n)
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quality", default="1080p", choices=list(RESOLUTIONS))
+    parser.add_argument("--frames", type=int, default=60)
+    args = parser.parse_args()
+    width, height = RESOLUTIONS[args.quality]
+    frames = args.frames
+
+    product = Image.open(make_product_image("/tmp/bench_compositor_product.png")).convert("RGBA")
+    pil_frame = Image.new("RGB", (width, height), (40, 20, 60))
+    frame = np.zeros((height, width, CHANNELS), dtype=np.uint8)
+    frame[:, :, :3] = (40, 20, 60)
+
+    size = int(width * 0.5)
+    x, y = (width - size) // 2, (height - size) // 2
+    rgba = product.resize((size, size), Image.Resampling.LANCZOS)
+    sprite = Sprite.from_image(rgba)
+
+    def pil_fade(n):
+        faded = Image.new("RGBA", rgba.size, (0, 0, 0, 0))
+        faded.paste(rgba, (0, 0))
+        faded.putalpha(255 - n % 200)
+        pil_frame.paste(faded, (x, y), faded)
+
+    # Hook: every frame has a new size and angle, so sprites are never reused
+    hook_size = int(width * 0.6)
+    radius = SpriteCache.GLOW_RADIUS * max(product.size) / hook_size
+    glow = product.filter(ImageFilter.GaussianBlur(radius=radius))
+    glow = ImageEnhance.Brightness(glow).enhance(SpriteCache.GLOW_BRIGHTNESS)
+    old_levels = [mip_chain(glow), mip_chain(product)]
+    new_levels = SpriteCache()._levels(product, "glow", hook_size)
+
+    def hook_size_angle(n):
+        scale = 0.3 + 0.7 * n / frames
+        return int(hook_size * scale) // 4 * 4, (n * 360 // frames) // 2 * 2
+
+    def pil_hook(n):
+        s, angle = hook_size_angle(n)
+        for levels in old_levels:
+            layer = SpriteCache._pick_level(levels, s).resize((s, s), Image.Resampling.LANCZOS)
+            layer = layer.rotate(angle, expand=False)
+            pil_frame.paste(layer, ((width - s) // 2, (height - s) // 2), layer)
+
+    def numpy_hook(n):
+        s, angle = hook_size_angle(n)
+        combined = affine(SpriteCache._pick_level(new_levels, s), s, angle)
+        blit(frame, combined, (width - s) // 2, (height - s) // 2)
+
+    text = TextRenderer()
+    text_size = int(90 * width / 1080)
+
+    def pil_text(n):
+        text.draw(pil_frame, "30% OFF", width // 2, height // 4, text_size, (255, 255, 0),
+                  alpha=1 + n % 254)
+
+    def numpy_text(n):
+        text.draw(frame, "30% OFF", width // 2, height // 4, text_size, (255, 255, 0),
+                  alpha=1 + n % 254)
+
+    rows = [
+        ("product paste", lambda n: pil_frame.paste(rgba, (x, y), rgba),
+         lambda n: blit(frame, sprite, x, y)),
+        ("product fade", pil_fade, lambda n: blit(frame, sprite, x, y, opacity=255 - n % 200)),
+        ("hook product + glow", pil_hook, numpy_hook),
+        ("text fade", pil_text, numpy_text),
+    ]
+
+    print(f"{args.quality} ({width}x{height}), ms per frame over {frames} frames")
+    print(f"{'operation':<20} {'PIL':>8} {'NumPy':>8} {'speedup':>8}")
+    for name, pil_fn, numpy_fn in rows:
+        pil_ms = per_frame(frames, pil_fn)
+        numpy_ms = per_frame(frames, numpy_fn)
+        print(f"{name:<20} {pil_ms:>8.2f} {numpy_ms:>8.2f} {pil_ms / numpy_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Serving finished videos: whole-file read() per viewer vs. chunked streaming
+
+The old app read the MP4 into memory for every session on every rerun
+(`video_file.read()` into st.download_button). The file server streams it
+in CHUNK_SIZE pieces instead. Both serve the same file to `--viewers`
+concurrent viewers; peak Python memory is measured with tracemalloc.
+
+Usage: python benchmarks/bench_downloads.py [--size-mb 200] [--viewers 8]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from output_store import CHUNK_SIZE, FileServer, OutputStore  # noqa: E402
+
+
+def run_viewers(viewers, fetch):
+    threads = [threading.Thread(target=fetch) for _ in range(viewers)]
+    tracemalloc.start()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=200)
+    parser.add_argument("--viewers", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        store = OutputStore(workdir)
+        path = os.path.join(workdir, "ad_video.mp4")
+        with open(path, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+        store.add(path)
+
+        # Every session holds the whole file until its rerun finishes
+        held = []
+        lock = threading.Lock()
+
+        def read_whole():
+            with open(path, "rb") as f:
+                data = f.read()
+            with lock:
+                held.append(data)
+
+        read_time, read_peak = run_viewers(args.viewers, read_whole)
+        held.clear()
+
+        with FileServer(store) as server:
+            url = server.url_for(path)
+
+            def stream():
+                with urllib.request.urlopen(url) as response:
+                    while response.read(CHUNK_SIZE):
+                        pass
+
+            stream_time, stream_peak = run_viewers(args.viewers, stream)
+
+    print(f"{args.size_mb}MB video, {args.viewers} concurrent viewers")
+    print(f"{'serving':<10} {'peak memory':>12} {'wall':>8}")
+    print(f"{'read()':<10} {read_peak:>10.1f}MB {read_time:>7.2f}s")
+    print(f"{'streamed':<10} {stream_peak:>10.1f}MB {stream_time:>7.2f}s")
+
+
+if __name__ == "__main__":
+    main()
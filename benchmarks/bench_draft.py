@@ -0,0 +1,60 @@
+"""Draft vs. full render: wall time, file size and PSNR of the upscaled draft
+
+Usage: python benchmarks/bench_draft.py [--quality 720p|1080p]
+"""
+import argparse
+import os
+import re
+import subprocess
+import tempfile
+import time
+
+from common import OfflineVideoGenerator, RESOLUTIONS, make_product_image
+from ffmpeg_writer import get_ffmpeg_exe
+
+
+def render(generator, image_path, quality, draft):
+    start = time.perf_counter()
+    path = generator.create_ad_video(image_path, "benchmark", quality=quality,
+                                     include_voiceover=False, product_name="Benchmark",
+                                     discount_text="30% OFF", encoder="ffmpeg",
+                                     use_cache=False, draft=draft)
+    return path, time.perf_counter() - start
+
+
+def psnr(reference, draft, width, height):
+    """Average PSNR of the draft scaled back up to the reference size and frame rate"""
+    graph = f"[1:v]scale={width}:{height}:flags=bicubic,fps=30[d];[0:v][d]psnr"
+    proc = subprocess.run([get_ffmpeg_exe(), "-i", reference, "-i", draft,
+                           "-lavfi", graph, "-f", "null", "-"],
+                          capture_output=True, text=True)
+    match = re.search(r"average:([\d.]+|inf)", proc.stderr)
+    return float(match.group(1)) if match else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quality", default="1080p", choices=list(RESOLUTIONS))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        image_path = make_product_image("product.png")
+        generator = OfflineVideoGenerator(hf_api_key=None)
+
+        full_path, full_time = render(generator, image_path, args.quality, draft=False)
+        draft_path, draft_time = render(generator, image_path, args.quality, draft=True)
+        width, height = RESOLUTIONS[args.quality]
+
+        full_size = os.path.getsize(full_path)
+        draft_size = os.path.getsize(draft_path)
+        print(f"{'mode':<6} {'wall':>8} {'size':>9}")
+        print(f"{'full':<6} {full_time:>7.1f}s {full_size / 1024:>7.0f}KB")
+        print(f"{'draft':<6} {draft_time:>7.1f}s {draft_size / 1024:>7.0f}KB")
+        print(f"speed-up: {full_time / draft_time:.1f}x, "
+              f"size ratio: {draft_size / full_size:.2f}, "
+              f"PSNR of upscaled draft: {psnr(full_path, draft_path, width, height):.1f}dB")
+
+
+if __name__ == "__main__":
+    main()
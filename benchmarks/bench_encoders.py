@@ -0,0 +1,72 @@
+"""Encoder backend benchmark: moviepy vs. direct ffmpeg pipe
+
+Each backend renders a full ad in its own subprocess so wall time and peak RSS
+are measured independently.
+
+Usage: python benchmarks/bench_encoders.py [--quality 720p|1080p] [--no-voiceover]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKENDS = ("moviepy", "ffmpeg")
+
+
+def run_backend(backend, quality, voiceover):
+    """Child process entry point: render once and print a JSON result line"""
+    from common import OfflineVideoGenerator, make_product_image, peak_rss_mb
+
+    image_path = make_product_image(Path("product.png"))
+    generator = OfflineVideoGenerator(hf_api_key=None)
+
+    start = time.perf_counter()
+    output_path = generator.create_ad_video(image_path, "benchmark", quality=quality,
+                                            include_voiceover=voiceover,
+                                            product_name="Benchmark", encoder=backend)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "backend": backend,
+        "seconds": round(elapsed, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "ffmpeg_peak_rss_mb": round(peak_rss_mb(children=True), 1),
+        "size_mb": round(os.path.getsize(output_path) / 1024 / 1024, 2),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quality", default="1080p", choices=["720p", "1080p"])
+    parser.add_argument("--no-voiceover", action="store_true")
+    parser.add_argument("--backend", choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.backend:
+        run_backend(args.backend, args.quality, not args.no_voiceover)
+        return
+
+    results = []
+    for backend in BACKENDS:
+        with tempfile.TemporaryDirectory() as workdir:
+            cmd = [sys.executable, os.path.abspath(__file__), "--backend", backend,
+                   "--quality", args.quality]
+            if args.no_voiceover:
+                cmd.append("--no-voiceover")
+            env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+            proc = subprocess.run(cmd, cwd=workdir, env=env, check=True,
+                                  capture_output=True, text=True)
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(f"{'backend':<9} {'wall':>8} {'python RSS':>11} {'ffmpeg RSS':>11} {'size':>8}")
+    for r in results:
+        print(f"{r['backend']:<9} {r['seconds']:>7.1f}s {r['peak_rss_mb']:>9.0f}MB "
+              f"{r['ffmpeg_peak_rss_mb']:>9.0f}MB {r['size_mb']:>6.2f}MB")
+
+
+if __name__ == "__main__":
+    main()
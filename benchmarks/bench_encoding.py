@@ -0,0 +1,78 @@
+"""Encoding profiles: encode time vs. file size of the 30s ad at 720p and 1080p
+
+The ad is rendered once per resolution into a lossless intermediate (x264
+CRF 0) with the music bed muxed in. Every profile then encodes from that
+file, so rendering is out of the picture; the time to just decode the
+intermediate is measured separately and subtracted. The 30s ad cannot use
+all of the social profile's 8 MB, so target-size profiles with smaller
+budgets (--sizes, in MB) are added to show how close files land.
+
+Usage: python benchmarks/bench_encoding.py [--qualities 720p 1080p] [--profiles draft standard]
+                                           [--sizes 1.2 0.9]
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+from common import OfflineVideoGenerator, RESOLUTIONS, make_product_image
+from audio_track import build_soundtrack
+from encoding import PROFILES, EncodingProfile, target_size
+from ffmpeg_writer import get_ffmpeg_exe
+from product_image import ProductImage
+from video_generator import SCENE_DURATIONS
+
+DURATION = sum(SCENE_DURATIONS.values())
+LOSSLESS = EncodingProfile("lossless", preset="ultrafast", crf=0)
+
+
+def render_intermediate(path, width, height, workdir):
+    generator = OfflineVideoGenerator(hf_api_key=None, output_dir=workdir, temp_dir=workdir)
+    product = ProductImage.open(make_product_image(os.path.join(workdir, "product.png")))
+    generator.write_with_ffmpeg(path, product.rgba, width, height, 30,
+                                audio=build_soundtrack(DURATION, music=True),
+                                product_name="Benchmark", discount_text="30% OFF",
+                                encoding=LOSSLESS)
+
+
+def timed(cmd):
+    start = time.perf_counter()
+    subprocess.run(cmd, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--qualities", nargs="+", default=list(RESOLUTIONS),
+                        choices=list(RESOLUTIONS))
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument("--sizes", nargs="*", type=float, default=[1.2, 0.9])
+    args = parser.parse_args()
+    profiles = [PROFILES[name] for name in args.profiles] + [target_size(mb) for mb in args.sizes]
+    ffmpeg = [get_ffmpeg_exe(), "-y", "-loglevel", "error"]
+
+    print(f"{'quality':<8} {'profile':<9} {'encode':>8} {'x realtime':>11} {'size':>9} {'budget':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for quality in args.qualities:
+            width, height = RESOLUTIONS[quality]
+            source = os.path.join(workdir, f"lossless_{quality}.mkv")
+            render_intermediate(source, width, height, workdir)
+            decode = timed(ffmpeg + ["-i", source, "-f", "null", "-"])
+
+            for profile in profiles:
+                profile = profile.resolve(DURATION)
+                name = profile.name
+                output = os.path.join(workdir, f"{name}_{quality}.mp4")
+                seconds = timed(ffmpeg + ["-i", source] + profile.video_args()
+                                + profile.audio_args() + [output]) - decode
+                size = os.path.getsize(output)
+                budget = ""
+                if profile.target_bytes:
+                    budget = f"{size / profile.target_bytes:>7.0%}"
+                print(f"{quality:<8} {name:<9} {seconds:>7.1f}s {DURATION / seconds:>10.1f}x "
+                      f"{size / 1e6:>7.2f}MB {budget:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Frame allocations: fresh PIL image + np.array per frame vs. the in-place frame pool
+
+The legacy renderer below reproduces what LayeredScene.render did before the
+pool: a new (or copied) frame per frame and an RGB copy of it for the
+encoder. Both render the same layers. Reported: frame-sized buffers
+allocated, minor page faults (fresh pages touched by large allocations),
+peak NumPy memory held (tracemalloc; the pool keeps its ring and baked bases
+resident), garbage collector runs and render time per frame.
+
+Usage: python benchmarks/bench_frame_pool.py [--quality 720p]
+"""
+import argparse
+import gc
+import resource
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from common import OfflineVideoGenerator, RESOLUTIONS, make_product_image
+from frame_pool import CHANNELS
+from video_generator import SCENES
+
+
+def legacy_render(layered, t, cache):
+    """One frame the pre-pool way; returns (frame, frame buffers allocated)"""
+    states = tuple(layer.state(t) for layer in layered.layers)
+    if states == cache.get("states"):
+        return cache["frame"], 0
+    layered._track_changes(states)
+    layered._last_states = states
+    prefix = layered._stable_prefix()
+    allocated = 2
+    shape = (layered.height, layered.width, CHANNELS)
+    if prefix == 0:
+        frame = np.zeros(shape, dtype=np.uint8)
+    else:
+        base_key = (prefix, states[:prefix])
+        if base_key != cache.get("base_key"):
+            cache["base"] = layered._composite(np.zeros(shape, dtype=np.uint8), states, 0, prefix)
+            cache["base_key"] = base_key
+            allocated += 1
+        frame = cache["base"].copy()
+    layered._composite(frame, states, prefix, len(layered.layers))
+    cache["states"], cache["frame"] = states, np.ascontiguousarray(frame[:, :, :3])
+    return cache["frame"], allocated
+
+
+def measure(render_scene):
+    collections = [0]
+
+    def on_gc(phase, info):
+        if phase == "start":
+            collections[0] += 1
+
+    gc.collect()
+    gc.callbacks.append(on_gc)
+    tracemalloc.start()
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+    start = time.perf_counter()
+    try:
+        frames, buffers = render_scene()
+        elapsed = time.perf_counter() - start
+        faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt - faults
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        gc.callbacks.remove(on_gc)
+    return {"frames": frames, "buffers": buffers, "faults": faults, "gc": collections[0],
+            "peak_mb": peak / 1e6, "ms": elapsed / frames * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quality", default="720p", choices=list(RESOLUTIONS))
+    args = parser.parse_args()
+    width, height = RESOLUTIONS[args.quality]
+    fps = 30
+
+    image_path = make_product_image("/tmp/bench_frame_pool_product.png")
+    product_img = Image.open(image_path).convert("RGBA")
+
+    def scenes(generator):
+        for scene, duration in SCENES:
+            layered = generator.build_scene(scene, product_img, width, height,
+                                            "Benchmark", "30% OFF")
+            for frame_num in range(duration * fps):
+                yield layered, frame_num / (duration * fps)
+
+    def legacy():
+        generator = OfflineVideoGenerator(hf_api_key=None, temp_dir="/tmp/bench_frame_pool")
+        frames = buffers = 0
+        caches = {}
+        for layered, t in scenes(generator):
+            _, allocated = legacy_render(layered, t, caches.setdefault(id(layered), {}))
+            frames += 1
+            buffers += allocated
+        return frames, buffers
+
+    def pooled():
+        generator = OfflineVideoGenerator(hf_api_key=None, temp_dir="/tmp/bench_frame_pool")
+        frames = 0
+        for layered, t in scenes(generator):
+            layered.render(t)
+            frames += 1
+        return frames, generator.frame_pool_stats()["allocations"]
+
+    print(f"{args.quality} ({width}x{height}), all scenes")
+    print(f"{'renderer':<9} {'frame buffers':>14} {'per frame':>10} {'page faults':>12} "
+          f"{'numpy peak':>11} {'gc runs':>8} {'ms/frame':>9}")
+    for name, render_scene in [("legacy", legacy), ("pooled", pooled)]:
+        result = measure(render_scene)
+        print(f"{name:<9} {result['buffers']:>14} {result['buffers'] / result['frames']:>10.2f} "
+              f"{result['faults']:>12} {result['peak_mb']:>9.1f}MB {result['gc']:>8} {result['ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
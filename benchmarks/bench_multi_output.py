@@ -0,0 +1,44 @@
+"""Multi-aspect outputs: one create_ad_video per variant vs. one create_ad_videos pass
+
+Usage: python benchmarks/bench_multi_output.py [--quality 720p --quality 1080p]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from common import OfflineVideoGenerator, make_product_image
+from video_generator import ASPECTS, QUALITIES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quality", action="append", choices=list(QUALITIES),
+                        help="output quality (repeatable, default: both)")
+    args = parser.parse_args()
+    outputs = [(aspect, quality) for aspect in ASPECTS for quality in args.quality or QUALITIES]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        image_path = make_product_image("product.png")
+        kwargs = dict(product_name="Benchmark", discount_text="30% OFF", use_cache=False)
+
+        generator = OfflineVideoGenerator(hf_api_key=None)
+        start = time.perf_counter()
+        for aspect, quality in outputs:
+            generator.create_ad_video(image_path, "benchmark", quality=quality, aspect=aspect,
+                                      encoder="ffmpeg", **kwargs)
+        separate = time.perf_counter() - start
+
+        generator = OfflineVideoGenerator(hf_api_key=None)
+        start = time.perf_counter()
+        generator.create_ad_videos(image_path, "benchmark", outputs=outputs, **kwargs)
+        single_pass = time.perf_counter() - start
+
+        print(f"{len(outputs)} outputs: {', '.join(f'{a} {q}' for a, q in outputs)}")
+        print(f"separate renders: {separate:>7.1f}s")
+        print(f"single pass:      {single_pass:>7.1f}s ({separate / single_pass:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Render service: throughput and queue wait as the number of clients grows
+
+Starts a RenderService with --workers worker processes behind its HTTP
+server. --clients concurrent clients, like browser tabs, then each submit
+--jobs renders one after another through RenderClient, and wait out
+Retry-After whenever the service answers 429. Throughput should stay at
+what the workers can render however many clients there are. Extra clients
+only wait longer, and beyond --max-queued waiting jobs they are turned away
+instead of piling up. Jobs are 720p drafts with a fixed script and no
+voiceover, so nothing touches the network; every job's image differs by a
+pixel so no render is served from the cache.
+
+Usage: python benchmarks/bench_render_service.py [--workers 1] [--clients 1 2 4 8] [--jobs 2]
+"""
+import argparse
+import io
+import itertools
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from PIL import Image
+
+from common import make_product_image
+from render_service import QueueFull, RenderClient, RenderServer, RenderService
+
+SCRIPT = ("Meet Benchmark Brew, the smoothest cup you will make all week. "
+          "Rich flavour, zero bitterness, ready in two minutes. "
+          "Thousands of happy customers already start their day with it. "
+          "Order now while the launch offer lasts!")
+
+_unique = itertools.count()
+
+
+def job_image(base):
+    """The product image with one corner pixel changed, so the render cache never hits"""
+    img = base.copy()
+    n = next(_unique)
+    img.putpixel((0, 0), (n % 256, n // 256 % 256, 0, 255))
+    data = io.BytesIO()
+    img.save(data, format="PNG")
+    return data.getvalue()
+
+
+def run_client(client, name, base, jobs, results):
+    for _ in range(jobs):
+        rejected = 0
+        submitted = time.time()
+        while True:
+            try:
+                job = client.submit("video", job_image(base), client=name, script=SCRIPT,
+                                    draft=True, quality="720p", include_voiceover=False,
+                                    include_music=False, product_name="Benchmark Brew",
+                                    discount_text="30% OFF")
+                break
+            except QueueFull as e:
+                rejected += 1
+                time.sleep(e.retry_after)
+        status = client.wait(job["id"], poll=0.1)
+        results.append({"state": status["state"], "rejected": rejected,
+                        "wait": status["started"] - status["created"],
+                        "latency": status["finished"] - submitted})
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--max-queued", type=int, default=None,
+                        help="waiting jobs before 429 (default 4x workers)")
+    parser.add_argument("--clients", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--jobs", type=int, default=2, help="jobs per client")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        base = Image.open(make_product_image(os.path.join(workdir, "product.png"))).convert("RGBA")
+        service = RenderService(os.path.join(workdir, "outputs"), os.path.join(workdir, "jobs"),
+                                workers=args.workers, max_queued=args.max_queued)
+        server = RenderServer(service).start()
+        client = RenderClient(server.url)
+        try:
+            # Worker start-up and imports are paid once, not by the first measured clients
+            run_client(client, "warmup", base, args.workers, [])
+
+            print(f"{service.workers} worker(s), at most {service.max_queued} queued, "
+                  f"{args.jobs} job(s) per client")
+            print(f"{'clients':>7} {'jobs':>5} {'jobs/min':>9} {'wait p50':>9} {'wait p95':>9} "
+                  f"{'latency p50':>12} {'latency p95':>12} {'429s':>5}")
+            for clients in args.clients:
+                results = []
+                threads = [threading.Thread(target=run_client,
+                                            args=(client, f"client{i}", base, args.jobs, results))
+                           for i in range(clients)]
+                start = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - start
+
+                done = [r for r in results if r["state"] == "done"]
+                waits = [r["wait"] for r in done]
+                latencies = [r["latency"] for r in done]
+                print(f"{clients:>7} {len(done):>5} {len(done) / elapsed * 60:>9.1f} "
+                      f"{statistics.median(waits):>8.1f}s {percentile(waits, 0.95):>8.1f}s "
+                      f"{statistics.median(latencies):>11.1f}s {percentile(latencies, 0.95):>11.1f}s "
+                      f"{sum(r['rejected'] for r in results):>5}")
+        finally:
+            server.stop()
+            service.close()
+
+
+if __name__ == "__main__":
+    main()
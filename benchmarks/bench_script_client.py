@@ -0,0 +1,74 @@
+"""Script API client: bare requests.post vs. pooled/retrying/caching client
+
+Both variants send the same prompts (a catalog with repeated products) to the
+local stub server, which fails every few requests with a 503 + Retry-After.
+
+Usage: python benchmarks/bench_script_client.py [--items 40] [--unique 10] [--threads 4]
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from hf_client import InferenceClient  # noqa: E402
+from script_generator import ScriptGenerator  # noqa: E402
+from stub_inference_server import StubInferenceServer  # noqa: E402
+
+
+def bare_post(url, prompt):
+    """What call_hf_api used to do: one unpooled request, no retry, no cache"""
+    response = requests.post(url, json={"inputs": prompt}, timeout=30)
+    if response.status_code != 200:
+        raise Exception(f"API error: {response.status_code}")
+    return response.json()
+
+
+def run(variant, prompts, threads, fail_every):
+    with StubInferenceServer(fail_every=fail_every) as server:
+        if variant == "bare":
+            call = lambda prompt: bare_post(server.url, prompt)  # noqa: E731
+        else:
+            client = InferenceClient(server.url, max_concurrent=threads, backoff=0.05)
+            generator = ScriptGenerator(None, client=client)
+            call = generator.call_hf_api
+
+        def attempt(prompt):
+            try:
+                call(prompt)
+                return True
+            except Exception:
+                return False
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            ok = sum(pool.map(attempt, prompts))
+        elapsed = time.perf_counter() - start
+        return {"seconds": elapsed, "ok": ok, **server.stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=40)
+    parser.add_argument("--unique", type=int, default=10, help="distinct prompts in the catalog")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--fail-every", type=int, default=5)
+    args = parser.parse_args()
+
+    prompts = [f"[INST] Write an ad for product {i % args.unique} [/INST]"
+               for i in range(args.items)]
+    print(f"{'client':<8} {'wall':>7} {'ok':>6} {'requests':>9} {'503s':>5} {'conns':>6}")
+    for variant in ("bare", "pooled"):
+        r = run(variant, prompts, args.threads, args.fail_every)
+        print(f"{variant:<8} {r['seconds']:>6.2f}s {r['ok']:>3}/{len(prompts):<2} "
+              f"{r['requests']:>9} {r['failures']:>5} {r['connections']:>6}")
+
+
+if __name__ == "__main__":
+    main()
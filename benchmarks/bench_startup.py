@@ -0,0 +1,95 @@
+"""Streamlit app: cold start and rerun latency, driven by streamlit's AppTest
+
+Cold start is the first run of app.py in a fresh process that has already
+imported streamlit, as when the first session connects to a running
+server. A rerun is what every widget interaction costs: with a product
+image uploaded, a sidebar checkbox is toggled and the script runs again
+from the top. The upload is a --image-size square PNG, about what a phone
+photo decodes to. Nothing is rendered. The cold start of a
+one-line app is measured the same way, as the floor set by streamlit and
+AppTest themselves. Each app process starts its own render service on a
+free port, so cold start includes launching it.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--reruns 20] [--image-size 3000]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT, make_product_image
+
+CHILD = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+
+app_path, image_path, reruns = sys.argv[1], sys.argv[2], int(sys.argv[3])
+with open(image_path, "rb") as f:
+    image = f.read()
+
+at = AppTest.from_file(app_path, default_timeout=120)
+at.secrets["HUGGINGFACE_API_KEY"] = "hf_benchmark"
+start = time.perf_counter()
+at.run()
+cold = time.perf_counter() - start
+
+times = []
+if reruns:
+    at.file_uploader[0].upload("product.png", image, "image/png").run()
+for _ in range(reruns):
+    music = at.checkbox[1]
+    music.set_value(not music.value)
+    start = time.perf_counter()
+    at.run()
+    times.append(time.perf_counter() - start)
+assert not at.exception, at.exception
+print(json.dumps({"cold": cold, "reruns": times}))
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure(app_path, image_path, reruns):
+    env = dict(os.environ, AD_RENDER_SERVICE_PORT=str(free_port()))
+    proc = subprocess.run([sys.executable, "-c", CHILD, str(app_path), image_path, str(reruns)],
+                          cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes")
+    parser.add_argument("--reruns", type=int, default=20, help="widget interactions per process")
+    parser.add_argument("--image-size", type=int, default=3000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        image_path = make_product_image(os.path.join(workdir, "product.png"), args.image_size)
+        empty_app = os.path.join(workdir, "empty_app.py")
+        with open(empty_app, "w") as f:
+            f.write("import streamlit as st\nst.markdown('empty')\n")
+        floor = [measure(empty_app, image_path, 0)["cold"] for _ in range(args.runs)]
+        results = [measure(os.path.join(ROOT, "app.py"), image_path, args.reruns)
+                   for _ in range(args.runs)]
+
+    cold = [r["cold"] for r in results]
+    reruns = [t for r in results for t in r["reruns"]]
+    print(f"{args.runs} processes, {args.reruns} reruns each, "
+          f"{args.image_size}x{args.image_size} upload")
+    print(f"{'':<26} {'median':>8} {'p90':>8}")
+    for name, values in [("cold start, empty app", floor), ("cold start", cold),
+                         ("rerun (image uploaded)", reruns)]:
+        p90 = statistics.quantiles(values, n=10)[-1] if len(values) > 1 else values[0]
+        print(f"{name:<26} {statistics.median(values) * 1000:>6.0f}ms {p90 * 1000:>6.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
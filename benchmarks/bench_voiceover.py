@@ -0,0 +1,56 @@
+"""Voiceover overlap and cache: sequential TTS vs. TTS during rendering vs. cached
+
+The offline tone backend sleeps `--latency` seconds per call to stand in for a
+network TTS request, so the numbers show how much of that latency the
+overlap hides.
+
+Usage: python benchmarks/bench_voiceover.py [--quality 720p] [--latency 4] [--workers 1]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from common import OfflineVideoGenerator, RESOLUTIONS, make_product_image
+from voiceover import ToneBackend
+
+SCRIPT = ("Meet the product that changes everything. Built to last, designed to impress. "
+          "Thousands of happy customers agree. Order today before the offer ends!")
+
+
+def render(image_path, quality, latency, overlap, workers, temp_dir):
+    generator = OfflineVideoGenerator(hf_api_key=None, temp_dir=temp_dir,
+                                      tts_backend=ToneBackend(latency=latency),
+                                      overlap_voiceover=overlap)
+    start = time.perf_counter()
+    _, report = generator.create_ad_video(image_path, SCRIPT, quality=quality, encoder="ffmpeg",
+                                          workers=workers, use_cache=False, return_report=True)
+    elapsed = time.perf_counter() - start
+    waited = sum(s["seconds"] for s in report["spans"] if s["name"].endswith("wait_voiceover"))
+    return elapsed, waited
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quality", default="720p", choices=list(RESOLUTIONS))
+    parser.add_argument("--latency", type=float, default=4.0)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        image_path = make_product_image("product.png")
+        runs = [
+            ("sequential", False, "tts_a"),
+            ("overlapped", True, "tts_b"),
+            ("cached", True, "tts_b"),
+        ]
+        print(f"{'mode':<11} {'wall':>8} {'waited for TTS':>15}")
+        for mode, overlap, temp_dir in runs:
+            elapsed, waited = render(image_path, args.quality, args.latency, overlap,
+                                     args.workers, temp_dir)
+            print(f"{mode:<11} {elapsed:>7.1f}s {waited:>14.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Shared helpers for the offline benchmarks (no API keys, no network)"""
+import resource
+import sys
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from video_generator import VideoGenerator  # noqa: E402
+from voiceover import ToneBackend  # noqa: E402
+
+RESOLUTIONS = {"720p": (720, 1280), "1080p": (1080, 1920)}
+
+
+def make_product_image(path, size=800):
+    """Synthetic product shot: a shaded disc with a label on a transparent canvas"""
+    img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((size // 8, size // 8, size * 7 // 8, size * 7 // 8), fill=(210, 90, 40, 255))
+    draw.ellipse((size // 4, size // 5, size // 2, size * 2 // 5), fill=(250, 190, 150, 255))
+    draw.rectangle((size * 3 // 8, size // 2, size * 5 // 8, size * 5 // 8), fill=(30, 30, 30, 255))
+    img.save(path)
+    return str(path)
+
+
+class OfflineVideoGenerator(VideoGenerator):
+    """VideoGenerator whose voiceover is a local 30s tone instead of a gTTS request"""
+
+    def __init__(self, *args, tts_backend=None, **kwargs):
+        super().__init__(*args, tts_backend=tts_backend or ToneBackend(seconds=30), **kwargs)
+
+
+def peak_rss_mb(children=False):
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(who).ru_maxrss / 1024
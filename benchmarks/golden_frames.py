@@ -0,0 +1,272 @@
+"""Golden-frame regression check: scene frames compared with stored references
+
+Renders a few fixed frames from every create_*_scene with fixed inputs
+(synthetic product image, fixed product name and discount) and compares
+them with the PNGs in benchmarks/golden/<quality>/. A frame passes when
+at most --max-bad-pixels of its pixels differ by more than --tolerance
+levels in any channel and its perceptual hash (64-bit DCT hash) is within
+--max-hash-distance bits of the reference. Render time per frame is shown
+next to the time recorded with the references.
+
+References should come from a renderer known to be right, usually the
+baseline revision (--save --rev REV renders them there), not from the one
+being checked. A frame that differs from it on purpose is approved one at a
+time (--accept SCENE@FRAME --reason ...): its reference is replaced by the
+current render, and the difference from the baseline is kept in golden.json
+with the reason. Every frame is then compared at the default tolerance.
+
+Usage:
+    python benchmarks/golden_frames.py                    # compare with the references
+    python benchmarks/golden_frames.py --save --rev REV   # record references from revision REV
+    python benchmarks/golden_frames.py --diff-dir diffs   # also write images of failures
+    python benchmarks/golden_frames.py --accept closing@37 --reason "..."  # approve a change
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import PIL
+from PIL import Image
+
+from common import OfflineVideoGenerator, make_product_image
+from reference_frames import sample_scenes
+from run_benchmarks import checkout
+from text_renderer import DEFAULT_FONT
+from video_generator import RENDERER_VERSION, SCENES
+
+GOLDEN_DIR = Path(__file__).resolve().parent / "golden"
+SIZES = {"360p": (360, 640), "720p": (720, 1280), "1080p": (1080, 1920)}
+FPS = 30
+INPUTS = {"product_name": "Golden Brew", "discount_text": "30% OFF"}
+
+# Points in each scene to check, as fractions of its length: entry, mid-animation, end
+SAMPLES = (0.0, 0.1, 0.25, 0.5, 0.75, 0.99)
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    return np.cos(np.pi * (2 * x + 1) * k / (2 * n))
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def phash(pixels):
+    """64-bit perceptual hash: signs of the 8x8 lowest DCT frequencies of a 32x32 grey copy"""
+    grey = Image.fromarray(pixels).convert("L").resize((32, 32), Image.Resampling.LANCZOS)
+    coeffs = _DCT32 @ np.asarray(grey, dtype=np.float64) @ _DCT32.T
+    low = coeffs[:8, :8].ravel()
+    bits = low > np.median(low)
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def hash_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def render_frames(quality):
+    """{scene: [(frame number, RGB array, seconds to render)]} for the sampled frames"""
+    width, height = SIZES[quality]
+    with tempfile.TemporaryDirectory() as workdir:
+        product = Image.open(make_product_image(os.path.join(workdir, "product.png"))).convert("RGBA")
+        generator = OfflineVideoGenerator(hf_api_key=None, output_dir=workdir, temp_dir=workdir)
+        return sample_scenes(generator, product, width, height, FPS, SCENES, INPUTS, SAMPLES)
+
+
+def render_reference_frames(quality, rev):
+    """render_frames, but with the renderer of git revision `rev`"""
+    width, height = SIZES[quality]
+    with tempfile.TemporaryDirectory() as workdir, checkout(rev) as tree:
+        product_path = make_product_image(os.path.join(workdir, "product.png"))
+        spec_path = os.path.join(workdir, "spec.json")
+        with open(spec_path, "w") as f:
+            json.dump({"width": width, "height": height, "fps": FPS, "scenes": SCENES,
+                       "inputs": INPUTS, "samples": SAMPLES}, f)
+        out_path = os.path.join(workdir, "frames.npz")
+        script = Path(__file__).resolve().parent / "reference_frames.py"
+        proc = subprocess.run([sys.executable, str(script), str(tree), product_path,
+                               spec_path, out_path], capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"rendering {rev} failed:\n{proc.stderr}")
+        with np.load(out_path) as arrays:
+            frames = {}
+            for scene, duration in SCENES:
+                numbers = [min(int(fraction * duration * FPS), duration * FPS - 1)
+                           for fraction in SAMPLES]
+                frames[scene] = [(number, arrays[f"{scene}/{number}"],
+                                  float(arrays[f"{scene}/{number}/seconds"]))
+                                 for number in numbers]
+    return frames
+
+
+def save(quality, frames, rev=None):
+    directory = GOLDEN_DIR / quality
+    directory.mkdir(parents=True, exist_ok=True)
+    for stale in directory.glob("*.png"):
+        stale.unlink()
+    manifest = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "renderer_version": RENDERER_VERSION,
+            "rev": resolve_rev(rev) if rev else "working tree",
+            "size": SIZES[quality],
+            "fps": FPS,
+            "inputs": INPUTS,
+            "font": DEFAULT_FONT if os.path.exists(DEFAULT_FONT) else "PIL default",
+            "pillow": PIL.__version__,
+            "numpy": np.__version__,
+            "python": platform.python_version(),
+        },
+        "frames": {},
+    }
+    for scene, samples in frames.items():
+        manifest["frames"][scene] = []
+        for number, pixels, seconds in samples:
+            name = f"{scene}_{number:03d}.png"
+            Image.fromarray(pixels).save(directory / name, optimize=True)
+            manifest["frames"][scene].append({"frame": number, "file": name,
+                                              "phash": f"{phash(pixels):016x}",
+                                              "render_ms": round(seconds * 1000, 2)})
+    with open(directory / "golden.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    return directory
+
+
+def resolve_rev(rev):
+    proc = subprocess.run(["git", "-C", str(GOLDEN_DIR), "rev-parse", "--short", rev],
+                          capture_output=True, text=True, check=True)
+    return proc.stdout.strip()
+
+
+def compare(quality, frames, tolerance, max_bad_pixels, max_hash_distance, diff_dir=None,
+            accept=(), reason=None):
+    """Print one row per frame; returns the number of frames that failed
+
+    Failing frames whose scene@frame label is in `accept` are approved: the
+    current render becomes their reference, and their difference from the
+    old reference is recorded as "baseline_delta" with `reason`.
+    """
+    directory = GOLDEN_DIR / quality
+    with open(directory / "golden.json") as f:
+        manifest = json.load(f)
+    meta = manifest["meta"]
+    if meta["renderer_version"] != RENDERER_VERSION:
+        print(f"References are from RENDERER_VERSION {meta['renderer_version']}, "
+              f"renderer is {RENDERER_VERSION}: differences may be intended")
+    font = DEFAULT_FONT if os.path.exists(DEFAULT_FONT) else "PIL default"
+    if meta["font"] != font or meta["pillow"] != PIL.__version__:
+        print(f"References used {meta['font']} with Pillow {meta['pillow']}, this run "
+              f"{font} with Pillow {PIL.__version__}: text may differ slightly")
+
+    print(f"{'frame':<20} {'max diff':>8} {'bad px':>8} {'PSNR':>7} {'hash':>5} "
+          f"{'ms':>7} {'ref ms':>7}  result")
+    failures = 0
+    for scene, samples in frames.items():
+        references = {entry["frame"]: entry for entry in manifest["frames"].get(scene, [])}
+        for number, pixels, seconds in samples:
+            label = f"{scene}@{number}"
+            reference = references.get(number)
+            if reference is None:
+                print(f"{label:<20} no reference; run with --save")
+                failures += 1
+                continue
+            expected = np.asarray(Image.open(directory / reference["file"]).convert("RGB"))
+            if expected.shape != pixels.shape:
+                print(f"{label:<20} size {pixels.shape[1]}x{pixels.shape[0]} != reference "
+                      f"{expected.shape[1]}x{expected.shape[0]}")
+                failures += 1
+                continue
+
+            diff = np.abs(pixels.astype(np.int16) - expected.astype(np.int16))
+            bad = (diff.max(axis=2) > tolerance).mean()
+            mse = (diff.astype(np.float64) ** 2).mean()
+            psnr = 10 * np.log10(255 ** 2 / mse) if mse else float("inf")
+            distance = hash_distance(phash(pixels), int(reference["phash"], 16))
+            ok = bad <= max_bad_pixels and distance <= max_hash_distance
+            result = "ok" if ok else "FAIL"
+            if label in accept and not ok:
+                reference["baseline_delta"] = {
+                    "rev": meta["rev"], "max_diff": int(diff.max()),
+                    "bad_pixels": round(float(bad), 6), "hash_distance": distance,
+                    "reason": reason}
+                reference["renderer_version"] = RENDERER_VERSION
+                reference["phash"] = f"{phash(pixels):016x}"
+                reference["render_ms"] = round(seconds * 1000, 2)
+                Image.fromarray(pixels).save(directory / reference["file"], optimize=True)
+                ok, result = True, "approved"
+            failures += not ok
+            print(f"{label:<20} {int(diff.max()):>8} {bad:>8.3%} {psnr:>6.1f} {distance:>5} "
+                  f"{seconds * 1000:>7.2f} {reference['render_ms']:>7.2f}  {result}")
+
+            if diff_dir and result != "ok":
+                # Rendered, reference, and the difference amplified 8x side by side
+                amplified = np.clip(diff * 8, 0, 255).astype(np.uint8)
+                Path(diff_dir).mkdir(parents=True, exist_ok=True)
+                Image.fromarray(np.hstack([pixels, expected, amplified])).save(
+                    Path(diff_dir) / f"{quality}_{scene}_{number:03d}.png")
+
+    if accept:
+        with open(directory / "golden.json", "w") as f:
+            json.dump(manifest, f, indent=2)
+            f.write("\n")
+        for scene, entries in manifest["frames"].items():
+            for entry in entries:
+                if "baseline_delta" in entry:
+                    print(f"approved {scene}@{entry['frame']}: {entry['baseline_delta']['reason']}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quality", default="360p", choices=list(SIZES))
+    parser.add_argument("--save", action="store_true",
+                        help="record the rendered frames as the new references")
+    parser.add_argument("--rev", help="with --save, render the references with git revision REV")
+    parser.add_argument("--accept", action="append", default=[], metavar="SCENE@FRAME",
+                        help="approve the current render of this frame as its reference "
+                             "(repeatable, needs --reason)")
+    parser.add_argument("--reason", help="why the --accept frames differ from the references")
+    parser.add_argument("--tolerance", type=int, default=8,
+                        help="per-channel difference (0-255) a pixel may have and still match")
+    parser.add_argument("--max-bad-pixels", type=float, default=0.002,
+                        help="share of pixels allowed beyond --tolerance")
+    parser.add_argument("--max-hash-distance", type=int, default=4,
+                        help="perceptual hash bits (of 64) allowed to differ")
+    parser.add_argument("--diff-dir", help="write rendered|reference|difference images of failures")
+    args = parser.parse_args()
+    if args.accept and not args.reason:
+        parser.error("--accept needs --reason")
+    if any("@" not in label for label in args.accept):
+        parser.error("--accept takes single frames, like closing@37")
+
+    if args.save:
+        if args.rev:
+            frames = render_reference_frames(args.quality, args.rev)
+        else:
+            frames = render_frames(args.quality)
+        print(f"References written to {save(args.quality, frames, args.rev)}")
+        return 0
+
+    frames = render_frames(args.quality)
+
+    if not (GOLDEN_DIR / args.quality / "golden.json").exists():
+        print(f"No references for {args.quality}; run with --save first")
+        return 1
+    failures = compare(args.quality, frames, args.tolerance, args.max_bad_pixels,
+                       args.max_hash_distance, args.diff_dir, args.accept, args.reason)
+    total = sum(len(samples) for samples in frames.values())
+    print(f"{total - failures}/{total} frames match the references")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""Golden-frame samples from any revision's VideoGenerator
+
+golden_frames.py --save --rev REV runs this in a subprocess on a git
+worktree of REV, so the references can come from an older renderer (the
+baseline) rather than from the one they are meant to check. It only uses
+what every revision has: VideoGenerator(hf_api_key) and
+create_<scene>_scene(product_img, width, height, fps, <texts>) returning a
+clip with get_frame. The tree is imported before anything else, and no
+module of this tree is.
+
+Usage: python benchmarks/reference_frames.py TREE PRODUCT_PNG SPEC_JSON OUT_NPZ
+"""
+import inspect
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+
+def sample_scenes(generator, product, width, height, fps, scenes, inputs, samples):
+    """{scene: [(frame number, RGB array, seconds to render)]} at each sampled fraction
+
+    Render time includes the scene's share of building the clip, so
+    renderers that draw every frame up front compare fairly with lazy ones.
+    """
+    frames = {}
+    for scene, duration in scenes:
+        method = getattr(generator, f"create_{scene}_scene")
+        texts = {name: inputs[name] for name in inspect.signature(method).parameters
+                 if name in inputs}
+        start = time.perf_counter()
+        clip = method(product, width, height, fps, **texts)
+        setup = time.perf_counter() - start
+        total = duration * fps
+        frames[scene] = []
+        for fraction in samples:
+            number = min(int(fraction * total), total - 1)
+            start = time.perf_counter()
+            # Frames may be views of pooled buffers; keep a copy
+            pixels = np.array(clip.get_frame(number / fps))
+            frames[scene].append((number, pixels, setup / total + time.perf_counter() - start))
+    return frames
+
+
+def main():
+    tree, product_path, spec_path, out_path = sys.argv[1:5]
+    with open(spec_path) as f:
+        spec = json.load(f)
+    sys.path.insert(0, tree)
+    from video_generator import VideoGenerator
+
+    # Older generators create outputs/ and temp/ in the working directory
+    os.chdir(os.path.dirname(os.path.abspath(out_path)))
+    generator = VideoGenerator(None)
+    product = Image.open(product_path).convert("RGBA")
+    frames = sample_scenes(generator, product, spec["width"], spec["height"], spec["fps"],
+                           spec["scenes"], spec["inputs"], spec["samples"])
+    arrays = {}
+    for scene, samples in frames.items():
+        for number, pixels, seconds in samples:
+            arrays[f"{scene}/{number}"] = pixels
+            arrays[f"{scene}/{number}/seconds"] = np.float64(seconds)
+    np.savez(out_path, **arrays)
+
+
+if __name__ == "__main__":
+    main()
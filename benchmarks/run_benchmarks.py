@@ -0,0 +1,239 @@
+"""Rendering benchmark suite with baseline regression checks
+
+Runs fully offline: synthetic product image, no API keys, and the voiceover
+replaced by a local tone. Each resolution is measured in its own subprocess
+so peak RSS is not shared between them.
+
+Usage:
+    python benchmarks/run_benchmarks.py                      # compare with baseline.json
+    python benchmarks/run_benchmarks.py --save-baseline      # record a new baseline
+    python benchmarks/run_benchmarks.py --against HEAD~1     # compare with the parent commit
+    python benchmarks/run_benchmarks.py --threshold 0.25 --output results.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_BASELINE = HERE / "baseline.json"
+
+
+def use_tree(root):
+    """Child process: import the repo and its benchmark helpers from `root`
+
+    This script's own directory is sys.path[0], so without this a child for
+    another revision would quietly measure this checkout.
+    """
+    root = Path(root).resolve()
+    sys.path[:0] = [str(root / "benchmarks"), str(root)]
+    import video_generator
+    if not Path(video_generator.__file__).resolve().is_relative_to(root):
+        raise RuntimeError(f"imported {video_generator.__file__}, not the tree at {root}")
+
+
+def measure(quality, end_to_end=False):
+    """Child process: run every benchmark at one resolution and return the metrics"""
+    from PIL import Image
+
+    from common import OfflineVideoGenerator, RESOLUTIONS, make_product_image, peak_rss_mb
+    from ffmpeg_writer import FFmpegPipeWriter
+    from frame_pool import PIX_FMT
+    from video_generator import SCENES
+
+    width, height = RESOLUTIONS[quality]
+    fps = 30
+    image_path = make_product_image("product.png")
+    product_img = Image.open(image_path).convert("RGBA")
+    results = {"scene_fps": {}}
+
+    # Frames/sec per scene, each on a fresh generator so caches start cold
+    sample_frames = []
+    for scene, duration in SCENES:
+        generator = OfflineVideoGenerator(hf_api_key=None)
+        frames = 0
+        start = time.perf_counter()
+        for frame, _ in generator.iter_scene_frames(scene, product_img, width, height, fps,
+                                                    "Benchmark", "30% OFF"):
+            frames += 1
+            if len(sample_frames) < fps and frames % 5 == 0:
+                sample_frames.append(frame.copy())
+        results["scene_fps"][scene] = round(frames / (time.perf_counter() - start), 2)
+
+    generator = OfflineVideoGenerator(hf_api_key=None)
+
+    # add_text with a cached sprite, half of the calls fading
+    canvas = Image.fromarray(generator.backgrounds.linear(width, height, (40, 20, 60), (20, 40, 80)))
+    calls = 300
+    start = time.perf_counter()
+    for i in range(calls):
+        generator.add_text(canvas, "10,000+ Happy Customers", width // 2, height // 4,
+                           size=40, alpha=255 if i % 2 else 128)
+    results["add_text_us"] = round((time.perf_counter() - start) / calls * 1e6, 1)
+
+    calls = 100
+    start = time.perf_counter()
+    for _ in range(calls):
+        generator.create_gradient_bg(width, height, (30, 30, 50), (50, 30, 70))
+    results["gradient_bg_ms"] = round((time.perf_counter() - start) / calls * 1000, 3)
+
+    # Encoder throughput on already-rendered frames (no rendering in the loop)
+    encode_frames = 150
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        with FFmpegPipeWriter(Path(tmp) / "encode.mp4", width, height, fps,
+                              pix_fmt=PIX_FMT) as writer:
+            for i in range(encode_frames):
+                writer.write_frame(sample_frames[i % len(sample_frames)])
+        results["encode_fps"] = round(encode_frames / (time.perf_counter() - start), 2)
+
+    if end_to_end:
+        start = time.perf_counter()
+        generator.create_ad_video(image_path, "benchmark", quality=quality,
+                                  product_name="Benchmark", discount_text="30% OFF",
+                                  encoder="ffmpeg", use_cache=False)
+        results["end_to_end_seconds"] = round(time.perf_counter() - start, 2)
+
+    results["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return results
+
+
+def run_suite(qualities, end_to_end=False, root=None):
+    """Measure every quality in a subprocess, against the tree at `root` (default: this one)"""
+    results = {}
+    for quality in qualities:
+        with tempfile.TemporaryDirectory() as workdir:
+            cmd = [sys.executable, str(Path(__file__).resolve()), "--child", quality,
+                   "--root", str(root or HERE.parent)]
+            if end_to_end:
+                cmd.append("--end-to-end")
+            # A worktree is thrown away afterwards; this checkout gets a scratch directory
+            proc = subprocess.run(cmd, cwd=root or workdir, capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise RuntimeError(f"benchmark at {quality} failed:\n{proc.stderr}")
+            results[quality] = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+@contextmanager
+def checkout(rev):
+    """A temporary git worktree of `rev`, removed afterwards"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "tree"
+        subprocess.run(["git", "-C", str(HERE), "worktree", "add", "--detach", str(path), rev],
+                       check=True, capture_output=True)
+        try:
+            yield path
+        finally:
+            subprocess.run(["git", "-C", str(HERE), "worktree", "remove", "--force", str(path)],
+                           capture_output=True)
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def higher_is_better(metric):
+    return "_fps" in metric or ".scene_fps." in metric
+
+
+def compare(current, baseline, threshold):
+    """List of (metric, baseline, current, change) that regressed by more than threshold"""
+    regressions = []
+    base = flatten(baseline["results"])
+    for metric, value in flatten(current["results"]).items():
+        old = base.get(metric)
+        if not old:
+            continue
+        change = (value - old) / old
+        worse = -change if higher_is_better(metric) else change
+        if worse > threshold:
+            regressions.append((metric, old, value, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quality", action="append", choices=["720p", "1080p"],
+                        help="resolution to measure (repeatable, default: both)")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write the results to the baseline file instead of comparing")
+    parser.add_argument("--against", metavar="REV",
+                        help="measure git revision REV in the same run and compare with it "
+                             "instead of the baseline file")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="allowed relative slowdown before a metric counts as a regression")
+    parser.add_argument("--output", help="also write the results JSON here")
+    parser.add_argument("--end-to-end", action="store_true",
+                        help="include a full create_ad_video render per resolution")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--root", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        use_tree(args.root)
+        print(json.dumps(measure(args.child, args.end_to_end)))
+        return 0
+
+    qualities = args.quality or ["720p", "1080p"]
+    current = run_suite(qualities, args.end_to_end)
+    print(json.dumps(current["results"], indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if args.against:
+        # Same machine, same session: no stale numbers from another day or host
+        with checkout(args.against) as root:
+            baseline = run_suite(qualities, args.end_to_end, root=root)
+        reference = args.against
+    elif not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return 0
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        reference = args.baseline
+    regressions = compare(current, baseline, args.threshold)
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} against {reference}")
+        return 0
+
+    print(f"Regressions beyond {args.threshold:.0%}:")
+    for metric, old, new, change in regressions:
+        print(f"  {metric}: {old} -> {new} ({change:+.0%})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
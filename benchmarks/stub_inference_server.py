@@ -0,0 +1,140 @@
+"""Local stand-in for the Hugging Face Inference API
+
+Answers text-generation POSTs with a canned script after a fixed latency,
+and can be told to fail with 503 (model loading) or 429 (rate limited) plus
+a Retry-After header. Counts requests, TCP connections and the most
+requests handled at once, so connection reuse, retries, caching and
+concurrency limits can be checked without network access.
+
+Usage:
+    python benchmarks/stub_inference_server.py --port 8765 --fail-every 3
+    python batch.py catalog.csv --api-url http://127.0.0.1:8765/models/stub
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SCRIPT = ("Meet the product that changes everything. Built to last, designed to impress. "
+          "Thousands of happy customers agree. Order today before the offer ends!")
+
+
+class StubInferenceServer:
+    """Threaded stub server; use as a context manager or call start()/stop()
+
+    Every `fail_every`-th request is answered with `fail_status` and a
+    Retry-After of `retry_after` seconds instead of a script.
+    """
+
+    def __init__(self, port=0, latency=0.05, fail_every=0, fail_status=503, retry_after=0.1):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.requests = 0
+        self.failures = 0
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/models/stub"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def stats(self):
+        return {"requests": self.requests, "failures": self.failures,
+                "connections": self.connections, "max_in_flight": self.max_in_flight}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 so clients can keep the connection alive
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                json.loads(self.rfile.read(length) or b"{}")
+                with stub._lock:
+                    stub.requests += 1
+                    fail = stub.fail_every and stub.requests % stub.fail_every == 0
+                    if fail:
+                        stub.failures += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                time.sleep(stub.latency)
+                with stub._lock:
+                    stub.in_flight -= 1
+
+                if fail:
+                    body = {"error": "Model is currently loading",
+                            "estimated_time": stub.retry_after}
+                    self._reply(stub.fail_status, body, {"Retry-After": str(stub.retry_after)})
+                else:
+                    self._reply(200, [{"generated_text": SCRIPT}])
+
+            def _reply(self, status, body, headers=None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--fail-every", type=int, default=0)
+    parser.add_argument("--fail-status", type=int, default=503, choices=[429, 503])
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    args = parser.parse_args()
+
+    server = StubInferenceServer(args.port, args.latency, args.fail_every,
+                                 args.fail_status, args.retry_after)
+    print(f"Stub inference server on {server.url}")
+    server.start()
+    try:
+        while True:
+            time.sleep(5)
+            print(json.dumps(server.stats()))
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+# _MUL[a, b] = round(a * b / 255); a row is "scale by a/255" as a 256-entry table
+_MUL = np.round(np.outer(np.arange(256), np.arange(256)) / 255).astype(np.uint8)
+_MUL_FLAT = _MUL.ravel()
+# The same rows as lists, the form Image.point takes
+_FADE = [row.tolist() for row in _MUL]
+
+# Sprite rows are grouped in bands this tall when classifying pixels
+BAND_HEIGHT = 16
+
+
+def fade_table(opacity):
+    """Lookup table for Image.point that scales a mask by opacity/255"""
+    return _FADE[opacity]
+
+
+def premultiply(img):
+    """HxWx4 uint8 array of an RGBA image with its colour multiplied by alpha"""
+    return np.asarray(img.convert("RGBa"))
+
+
+class Sprite:
+    """Premultiplied-alpha pixels plus the layout `blit` uses to skip work
+
+    The layout splits the sprite into bands of BAND_HEIGHT rows. In each
+    band, columns that are transparent on every row are dropped, the
+    widest run that is opaque on every row is copied without blending, and
+    only the rest (anti-aliased edges, soft glows) goes through the blend.
+    It is built on the first blit and kept with the sprite.
+    """
+
+    def __init__(self, pixels, image=None):
+        self.pixels = pixels
+        self.height, self.width = pixels.shape[:2]
+        self._rects = None
+        self._image = image
+        self._alpha = None
+        self._faded = False
+
+    @classmethod
+    def from_image(cls, img):
+        img = img.convert("RGBA")
+        return cls(premultiply(img), image=img)
+
+    @property
+    def nbytes(self):
+        return self.pixels.nbytes
+
+    @property
+    def rects(self):
+        """[(top, bottom, left, right, opaque)] covering every visible pixel"""
+        if self._rects is None:
+            self._rects = self._layout()
+        return self._rects
+
+    def faded(self, opacity):
+        """(straight RGBA image, alpha mask scaled by opacity) for PIL's paste
+
+        None on the first fade of a sprite made from premultiplied pixels:
+        converting them costs more than one NumPy blend, so it is only
+        worth it once the sprite is faded again.
+        """
+        if self._image is None:
+            if not self._faded:
+                self._faded = True
+                return None
+            self._image = Image.fromarray(self.pixels, "RGBa").convert("RGBA")
+        if self._alpha is None:
+            self._alpha = self._image.getchannel("A")
+        return self._image, self._alpha.point(fade_table(opacity))
+
+    def _layout(self):
+        alpha = self.pixels[:, :, 3]
+        bands = -(-self.height // BAND_HEIGHT)
+        # Pad to whole bands with transparent rows, which are neither visible nor opaque
+        padded = np.zeros((bands * BAND_HEIGHT, self.width), dtype=np.uint8)
+        padded[:self.height] = alpha
+        padded = padded.reshape(bands, BAND_HEIGHT, self.width)
+        visible = padded.max(axis=1) > 0
+        opaque = padded.min(axis=1) == 255
+        if self.height % BAND_HEIGHT:
+            opaque[-1] = alpha[(bands - 1) * BAND_HEIGHT:].min(axis=0) == 255
+
+        rects = []
+        for band in range(bands):
+            columns = np.flatnonzero(visible[band])
+            if not len(columns):
+                continue
+            top, bottom = band * BAND_HEIGHT, min((band + 1) * BAND_HEIGHT, self.height)
+            left, right = int(columns[0]), int(columns[-1]) + 1
+            starts, ends = _runs(opaque[band])
+            if not len(starts):
+                rects.append((top, bottom, left, right, False))
+                continue
+            widest = np.argmax(ends - starts)
+            start, end = int(starts[widest]), int(ends[widest])
+            if left < start:
+                rects.append((top, bottom, left, start, False))
+            rects.append((top, bottom, start, end, True))
+            if end < right:
+                rects.append((top, bottom, end, right, False))
+        return rects
+
+
+def paste(dst, image, x, y, mask):
+    """PIL paste of `image` through `mask` onto HxWx4 frame `dst` with its corner at (x, y)
+
+    Only the part of the frame the image covers is copied into a PIL image
+    and back, so the frame stays a plain array and no PIL view of it is
+    kept. PIL's paste is a single C loop, which beats blending text and
+    faded sprites in NumPy by more than the two copies of the region cost.
+    """
+    region = _clip(dst, 0, image.height, 0, image.width, x, y)
+    if region is None:
+        return
+    out, rows, cols = region
+    img = Image.fromarray(out, "RGBA")
+    img.paste(image, (-cols.start, -rows.start), mask)
+    out[...] = np.asarray(img)
+
+
+def _runs(mask):
+    """(starts, ends) of the runs of True in a 1-D bool array"""
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def _clip(dst, top, bottom, left, right, x, y):
+    """(frame pixels, sprite rows, sprite columns) of a sprite rectangle placed at (x, y)"""
+    height, width = dst.shape[:2]
+    top, bottom = max(top, -y), min(bottom, height - y)
+    left, right = max(left, -x), min(right, width - x)
+    if top >= bottom or left >= right:
+        return None
+    return dst[y + top:y + bottom, x + left:x + right], slice(top, bottom), slice(left, right)
+
+
+def blit(dst, sprite, x, y, opacity=255):
+    """Composite `sprite` over frame `dst` with its top-left corner at (x, y)
+
+    `dst` is an HxWx4 uint8 frame (see frame_pool) and is only written
+    where the sprite overlaps it. Whole pixels are blended, which keeps
+    NumPy on contiguous memory; the padding byte ends up holding coverage
+    and is ignored by the encoders. `opacity` (0-255) fades the whole
+    sprite, which for premultiplied pixels is a single multiply of all
+    four channels.
+
+    Faded sprites go through PIL's paste when they can (see Sprite.faded
+    and paste), a single C loop over the straight-alpha pixels with the
+    faded alpha as mask, which beats the two table lookups per channel of a
+    NumPy fade.
+    """
+    if opacity <= 0:
+        return
+    if opacity < 255 and dst.shape[2] == 4:
+        faded = sprite.faded(opacity)
+        if faded is not None:
+            paste(dst, faded[0], x, y, faded[1])
+            return
+    fade = _MUL[opacity]
+    pixels = sprite.pixels
+    for top, bottom, left, right, opaque in sprite.rects:
+        region = _clip(dst, top, bottom, left, right, x, y)
+        if region is None:
+            continue
+        out, rows, cols = region
+        src = pixels[rows, cols]
+        if opaque:
+            if opacity == 255:
+                out[...] = src
+            else:
+                # Constant alpha: out = src * o + out * (1 - o)
+                np.add(fade.take(src), _MUL[255 - opacity].take(out), out=out)
+            continue
+        if opacity < 255:
+            src = fade.take(src)
+        # out = src + out * (1 - alpha), the product looked up in _MUL
+        index = out.astype(np.uint16)
+        index += (255 - src[:, :, 3:]).astype(np.uint16) << 8
+        np.add(src, _MUL_FLAT.take(index), out=out)
+
+
+def blit_mask(dst, mask, color, x, y, opacity=255):
+    """Composite a solid `color` through coverage `mask` (HxW uint8) over frame `dst` at (x, y)
+
+    `dst` may be HxWx4 or HxWx3; a 3-channel array has no alpha to update.
+    For HxWx4 frames PIL's paste (see paste) is faster, which is what
+    TextRenderer uses; this is the NumPy path for HxWx3 arrays.
+    """
+    if opacity <= 0:
+        return
+    region = _clip(dst, 0, mask.shape[0], 0, mask.shape[1], x, y)
+    if region is None:
+        return
+    out, rows, cols = region
+
+    coverage = mask[rows, cols]
+    if opacity < 255:
+        coverage = _MUL[opacity].take(coverage)
+    # Premultiplied source pixels, looked up whole from the coverage
+    src = _color_table(tuple(color)).take(coverage).view(np.uint8).reshape(coverage.shape + (4,))
+    index = out.astype(np.uint16)
+    index += ((255 - coverage).astype(np.uint16) << 8)[:, :, None]
+    np.add(src[:, :, :out.shape[2]], _MUL_FLAT.take(index), out=out)
+
+
+@lru_cache(maxsize=64)
+def _color_table(color):
+    """Premultiplied RGBA of `color` at each coverage 0-255, one uint32 per pixel"""
+    return np.ascontiguousarray(_MUL[:, list(color[:3]) + [255]]).view(np.uint32).ravel()
+
+
+def affine(src, size, angle=0, resample=Image.Resampling.BICUBIC):
+    """Premultiplied `src` (an "RGBa" image) scaled to size x size and rotated, in one pass
+
+    The rotation is counter-clockwise about the centre and keeps the square
+    canvas, like Image.rotate(angle, expand=False) after a resize, but the
+    source is only resampled once. Without rotation it is a plain LANCZOS
+    resize. Returns a Sprite.
+    """
+    if not angle % 360:
+        return Sprite(np.asarray(src.resize((size, size), Image.Resampling.LANCZOS)))
+
+    # Inverse map: output pixel -> rotate about the output centre -> scale into the source
+    theta = -math.radians(angle)
+    cos, sin = math.cos(theta), math.sin(theta)
+    scale_x, scale_y = src.width / size, src.height / size
+    a, b = scale_x * cos, scale_x * sin
+    d, e = -scale_y * sin, scale_y * cos
+    center = size / 2
+    c = src.width / 2 - (a + b) * center
+    f = src.height / 2 - (d + e) * center
+    return Sprite(np.asarray(src.transform((size, size), Image.Transform.AFFINE,
+                                           (a, b, c, d, e, f), resample=resample)))
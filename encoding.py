@@ -0,0 +1,136 @@
+import copy
+
+# Audio bitrate reserved in every profile, part of a target-size budget
+AUDIO_BITRATE = 128_000
+
+# Share of a byte budget set aside for the MP4 container and audio framing
+CONTAINER_OVERHEAD = 0.03
+
+# Never starve the video below this, whatever the budget
+MIN_VIDEO_BITRATE = 100_000
+
+# Share of a target size held back for x264's single-pass rate control error
+TARGET_MARGIN = 0.05
+
+# Peak rate allowed over the average when hitting a target size
+TARGET_PEAK = 4
+
+
+class EncodingProfile:
+    """x264 settings for one kind of destination
+
+    Rate control is constant quality (`crf`) unless an average `bitrate`
+    (bits per second) is given. `maxrate` caps the rate over any one-second
+    window. `target_bytes` is a file size to hit: resolve() turns it into
+    the average bitrate that spends the budget over the video's duration
+    (single-pass ABR, so `crf` no longer applies), with a maxrate that
+    keeps busy scenes from borrowing too far ahead.
+    `gop` is the maximum keyframe interval in frames (None: x264's 250),
+    `tune` an x264 tune such as "animation", `threads` the encoder thread
+    count (None: x264 picks one per core).
+    """
+
+    def __init__(self, name, preset="medium", crf=23, bitrate=None, maxrate=None,
+                 target_bytes=None, gop=None, tune=None, threads=None,
+                 audio_bitrate=AUDIO_BITRATE, description=""):
+        self.name = name
+        self.preset = preset
+        self.crf = crf
+        self.bitrate = bitrate
+        self.maxrate = maxrate
+        self.target_bytes = target_bytes
+        self.gop = gop
+        self.tune = tune
+        self.threads = threads
+        self.audio_bitrate = audio_bitrate
+        self.description = description
+
+    def resolve(self, duration):
+        """Copy with a target size turned into bitrates for `duration` seconds"""
+        if self.target_bytes is None:
+            return self
+        resolved = copy.copy(self)
+        video_bits = (self.target_bytes * 8 * (1 - CONTAINER_OVERHEAD - TARGET_MARGIN)
+                      - self.audio_bitrate * duration)
+        resolved.bitrate = max(MIN_VIDEO_BITRATE, int(video_bits / duration))
+        resolved.maxrate = resolved.bitrate * TARGET_PEAK
+        return resolved
+
+    def video_args(self):
+        """ffmpeg output arguments for the video stream"""
+        args = ['-c:v', 'libx264', '-preset', self.preset] + self.x264_args()
+        if self.threads:
+            args += ['-threads', str(self.threads)]
+        return args + ['-pix_fmt', 'yuv420p']
+
+    def x264_args(self):
+        """Rate control, tune and GOP arguments (what moviepy's ffmpeg_params takes)"""
+        if self.target_bytes is not None and self.bitrate is None:
+            raise ValueError(f"profile {self.name!r} has a target size; call resolve() first")
+        args = ['-tune', self.tune] if self.tune else []
+        if self.bitrate:
+            args += ['-b:v', str(self.bitrate)]
+        else:
+            args += ['-crf', str(self.crf)]
+        if self.maxrate:
+            args += ['-maxrate', str(self.maxrate), '-bufsize', str(self.maxrate)]
+        if self.gop:
+            args += ['-g', str(self.gop)]
+        return args
+
+    def audio_args(self):
+        return ['-c:a', 'aac', '-b:a', str(self.audio_bitrate)]
+
+    def key(self):
+        """Everything that changes the encoded output, for cache keys"""
+        key = {"preset": self.preset, "crf": self.crf, "bitrate": self.bitrate,
+               "maxrate": self.maxrate, "target_bytes": self.target_bytes, "gop": self.gop,
+               "tune": self.tune, "audio_bitrate": self.audio_bitrate}
+        if self.target_bytes is not None:
+            # How a budget becomes bitrates; files made under other settings differ
+            key["target"] = ("abr", TARGET_MARGIN, TARGET_PEAK)
+        return key
+
+    def __repr__(self):
+        return f"EncodingProfile({self.name!r})"
+
+
+PROFILES = {
+    "draft": EncodingProfile(
+        "draft", preset="ultrafast", crf=28, gop=30,
+        description="Layout previews: fastest encode, size and quality don't matter"),
+    "fast": EncodingProfile(
+        "fast", preset="veryfast", crf=23,
+        description="Quick final render, larger file than standard"),
+    "standard": EncodingProfile(
+        "standard", preset="medium", crf=23,
+        description="x264 defaults: balanced encode time and size"),
+    "social": EncodingProfile(
+        "social", preset="medium", target_bytes=8 * 1000 ** 2, gop=60,
+        description="Fills an 8 MB upload cap, keyframe every 2s"),
+    "archive": EncodingProfile(
+        "archive", preset="slow", crf=16, tune="animation",
+        description="Master copy: near-transparent quality, slowest encode"),
+}
+
+DEFAULT_PROFILE = "standard"
+
+# Used for draft previews (see video_generator.DRAFT_SCALE)
+DRAFT_PROFILE = "draft"
+
+
+def get_profile(profile=None):
+    """EncodingProfile for a name in PROFILES, or the profile itself"""
+    if isinstance(profile, EncodingProfile):
+        return profile
+    name = profile or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown encoding profile: {name} (choose from {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+
+def target_size(megabytes, name=None, preset="medium", gop=60):
+    """Profile whose files come out at about `megabytes` (10^6 bytes), just under it"""
+    return EncodingProfile(name or f"{megabytes:g}MB", preset=preset,
+                           target_bytes=int(megabytes * 1000 ** 2), gop=gop,
+                           description=f"About {megabytes:g} MB, for a {megabytes:g} MB upload cap")
@@ -0,0 +1,205 @@
+import os
+import subprocess
+import tempfile
+import numpy as np
+
+from encoding import get_profile
+
+
+def get_ffmpeg_exe():
+    """Locate the ffmpeg binary, preferring the one bundled with imageio-ffmpeg"""
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return "ffmpeg"
+
+
+class AudioInput:
+    """ffmpeg input for a soundtrack: an in-memory AudioTrack streamed through a pipe, or a file
+
+    `args` go into the ffmpeg command and `pass_fds` to Popen; call close()
+    once the process has exited (or failed to start).
+    """
+
+    def __init__(self, audio):
+        self.args = []
+        self.pass_fds = ()
+        self._fd = None
+        self._thread = None
+        if hasattr(audio, "open_pipe"):
+            self._fd, self._thread = audio.open_pipe()
+            self.args = audio.input_args(self._fd)
+            self.pass_fds = (self._fd,)
+        elif audio:
+            self.args = ['-i', str(audio)]
+
+    def close(self):
+        if self._fd is not None:
+            # Closing the read end unblocks the feeder if ffmpeg stopped early
+            os.close(self._fd)
+            self._fd = None
+            self._thread.join()
+
+
+class FFmpegPipeWriter:
+    """Encode raw RGB frames by piping them straight into an ffmpeg subprocess
+
+    Frames are written to ffmpeg's stdin as rgb24, or as rgb0 (HxWx4, the
+    fourth byte ignored) for frames straight from a FramePool. `audio` (a
+    file path or an in-memory AudioTrack, which is streamed through a pipe)
+    is muxed by the same ffmpeg process, padded with silence or cut to the
+    video duration. `profile` is an EncodingProfile or a name in
+    encoding.PROFILES; a target-size profile needs `duration`, or must be
+    resolved beforehand (e.g. for a segment of a longer video).
+    """
+
+    def __init__(self, output_path, width, height, fps, audio=None, duration=None,
+                 profile=None, pix_fmt='rgb24'):
+        self.output_path = str(output_path)
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.audio = audio
+        self.duration = duration
+        self.profile = get_profile(profile)
+        if self.profile.target_bytes is not None and duration is not None:
+            self.profile = self.profile.resolve(duration)
+        self.pix_fmt = pix_fmt
+        self.frames_written = 0
+        self.frames_repeated = 0
+
+        # Frames not already in the input layout are copied in here
+        channels = 3 if pix_fmt == 'rgb24' else 4
+        self._buffer = np.empty((height, width, channels), dtype=np.uint8)
+        self._last = None
+        self._proc = None
+        self._log = None
+        self._audio_input = None
+
+    def build_command(self):
+        return self._input_args() + self._output_args(self.output_path)
+
+    def _input_args(self):
+        cmd = [
+            get_ffmpeg_exe(), '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-vcodec', 'rawvideo',
+            '-pix_fmt', self.pix_fmt, '-s', f'{self.width}x{self.height}',
+            '-r', str(self.fps), '-i', '-',
+        ]
+        if self._audio_input is not None:
+            cmd += self._audio_input.args
+        return cmd
+
+    def _output_args(self, path, video_map='0:v'):
+        args = []
+        if self.audio:
+            args += ['-map', video_map, '-map', '1:a'] + self.profile.audio_args() + ['-af', 'apad']
+            if self.duration is None:
+                args += ['-shortest']
+        elif video_map != '0:v':
+            args += ['-map', video_map]
+        if self.duration is not None:
+            args += ['-t', f'{self.duration:.3f}']
+        args += self.profile.video_args() + [str(path)]
+        return args
+
+    def open(self):
+        # stderr goes to a file so a chatty ffmpeg can never block on a full pipe
+        self._log = tempfile.TemporaryFile()
+        self._audio_input = AudioInput(self.audio)
+        try:
+            self._proc = subprocess.Popen(self.build_command(), stdin=subprocess.PIPE,
+                                          stdout=subprocess.DEVNULL, stderr=self._log,
+                                          pass_fds=self._audio_input.pass_fds)
+        except OSError:
+            self._audio_input.close()
+            raise
+        return self
+
+    def write_frame(self, frame, repeat=False):
+        """Send one HxWxC uint8 frame to the encoder (C=3 for rgb24, 4 for rgb0)
+
+        repeat=True marks a frame identical to the previous one; the bytes
+        that were sent last time are written again without any conversion.
+        """
+        if repeat and self._last is not None:
+            self._send(self._last)
+            self.frames_repeated += 1
+            return
+        if (frame.dtype != np.uint8 or frame.shape != self._buffer.shape
+                or not frame.flags['C_CONTIGUOUS']):
+            np.copyto(self._buffer, frame, casting='unsafe')
+            frame = self._buffer
+        self._last = frame
+        self._send(frame)
+
+    def _send(self, frame):
+        try:
+            self._proc.stdin.write(memoryview(frame).cast('B'))
+        except BrokenPipeError:
+            self._proc.wait()
+            raise IOError(f"ffmpeg exited early: {self._read_log()}")
+        self.frames_written += 1
+
+    def close(self):
+        if self._proc is None:
+            return
+        self._proc.stdin.close()
+        returncode = self._proc.wait()
+        self._proc = None
+        self._audio_input.close()
+        if returncode != 0:
+            raise IOError(f"ffmpeg failed ({returncode}): {self._read_log()}")
+        self._log.close()
+
+    def abort(self):
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.wait()
+            self._proc = None
+        if self._audio_input is not None:
+            self._audio_input.close()
+        if self._log is not None:
+            self._log.close()
+
+    def _read_log(self):
+        self._log.seek(0)
+        return self._log.read().decode(errors='replace').strip()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class MultiOutputWriter(FFmpegPipeWriter):
+    """Encode one stream of master frames into several outputs in a single ffmpeg run
+
+    `outputs` is a list of (path, crop, size): crop=(w, h, x, y) on the
+    master frame and size=(w, h) of the encoded video. ffmpeg splits the
+    input once and crops/scales each branch, so every frame is rendered and
+    piped only once however many variants are produced.
+    """
+
+    def __init__(self, outputs, width, height, fps, **kwargs):
+        super().__init__(outputs[0][0], width, height, fps, **kwargs)
+        self.outputs = outputs
+
+    def build_command(self):
+        graph = [f"[0:v]split={len(self.outputs)}"
+                 + "".join(f"[s{i}]" for i in range(len(self.outputs)))]
+        for i, (_, (crop_w, crop_h, x, y), (width, height)) in enumerate(self.outputs):
+            chain = f"[s{i}]crop={crop_w}:{crop_h}:{x}:{y}"
+            if (width, height) != (crop_w, crop_h):
+                chain += f",scale={width}:{height}:flags=lanczos"
+            graph.append(chain + f"[v{i}]")
+
+        cmd = self._input_args() + ['-filter_complex', ";".join(graph)]
+        for i, (path, _, _) in enumerate(self.outputs):
+            cmd += self._output_args(path, video_map=f'[v{i}]')
+        return cmd
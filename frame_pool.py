@@ -0,0 +1,55 @@
+import numpy as np
+
+# Pixel layout of pooled frames: RGB plus one unused byte, so rows of
+# 4-byte pixels go to ffmpeg ("rgb0") without repacking
+CHANNELS = 4
+PIX_FMT = "rgb0"
+
+
+class FramePool:
+    """Ring of preallocated frame buffers that scenes render into in place
+
+    `acquire()` hands out the next buffer in the ring together with a lease
+    number; the buffer stays untouched until the ring comes back round to
+    it, `size` acquisitions later. Consumers that hold on to a frame longer
+    than that (e.g. a list of frames for ImageSequenceClip) must copy it.
+    Buffers are allocated lazily, so a pool that is never used costs nothing.
+    """
+
+    def __init__(self, width, height, size=3):
+        self.width = width
+        self.height = height
+        self.size = size
+        self.allocations = 0
+        self.acquired = 0
+
+        self._buffers = []
+        self._leases = [0] * size
+        self._next = 0
+
+    def acquire(self):
+        """(slot, lease, array) for the next buffer in the ring"""
+        slot = self._next
+        self._next = (slot + 1) % self.size
+        if slot == len(self._buffers):
+            self._buffers.append(self.allocate())
+        self._leases[slot] += 1
+        self.acquired += 1
+        return slot, self._leases[slot], self._buffers[slot]
+
+    def is_current(self, slot, lease):
+        """True while the buffer handed out as (slot, lease) has not been reused"""
+        return self._leases[slot] == lease
+
+    def allocate(self):
+        """A new frame-sized buffer, counted in `allocations`"""
+        self.allocations += 1
+        return np.zeros((self.height, self.width, CHANNELS), dtype=np.uint8)
+
+    def stats(self):
+        return {
+            "buffers": len(self._buffers),
+            "allocations": self.allocations,
+            "acquired": self.acquired,
+            "reused": self.acquired - len(self._buffers),
+        }
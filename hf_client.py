@@ -0,0 +1,179 @@
+import email.utils
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Statuses worth retrying: rate limited, model still loading, gateway hiccups
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# One pooled session per process, shared by every client
+_session = None
+_session_lock = threading.Lock()
+
+# Concurrency limit per API URL, shared by every client in the process
+_semaphores = {}
+
+
+def get_session(pool_size=16):
+    """Process-wide requests.Session with a keep-alive connection pool"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def _semaphore_for(api_url, max_concurrent):
+    # The first client created for a URL sets its limit
+    with _session_lock:
+        if api_url not in _semaphores:
+            _semaphores[api_url] = threading.BoundedSemaphore(max_concurrent)
+        return _semaphores[api_url]
+
+
+def retry_after_seconds(response):
+    """Delay requested by the server, from Retry-After or HF's estimated_time"""
+    header = response.headers.get("Retry-After")
+    if header:
+        try:
+            return max(0.0, float(header))
+        except ValueError:
+            pass
+        try:
+            # Retry-After may also be an HTTP date
+            parsed = email.utils.parsedate_to_datetime(header)
+            return max(0.0, parsed.timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    if response.status_code == 503:
+        # The model-loading response carries {"estimated_time": seconds}
+        try:
+            return max(0.0, float(response.json().get("estimated_time")))
+        except (ValueError, TypeError, AttributeError):
+            pass
+    return None
+
+
+class InferenceClient:
+    """Pooled, retrying and caching client for the Hugging Face Inference API
+
+    Requests go through the shared keep-alive session, at most
+    `max_concurrent` at a time per API URL. 429/5xx responses and connection
+    errors are retried with exponential backoff and jitter, waiting at least
+    as long as the server's Retry-After. Successful responses are cached by
+    payload for `cache_ttl` seconds so repeated prompts cost nothing.
+    """
+
+    def __init__(self, api_url, headers=None, timeout=30, max_retries=4, backoff=1.0,
+                 max_backoff=30.0, max_concurrent=4, cache_ttl=3600, cache_size=256,
+                 session=None, sleep=time.sleep):
+        self.api_url = api_url
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.session = session or get_session()
+        self._semaphore = _semaphore_for(api_url, max_concurrent)
+        self._sleep = sleep
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "hits": 0, "misses": 0}
+
+    def post(self, payload):
+        """JSON response for `payload`, from the cache when still fresh"""
+        key = self.cache_key(payload)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        result = self._post_with_retries(payload)
+        self._cache_put(key, result)
+        return result
+
+    def cache_key(self, payload):
+        body = json.dumps(payload, sort_keys=True)
+        return hashlib.sha256(f"{self.api_url}\n{body}".encode()).hexdigest()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            stats["cached"] = len(self._cache)
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _post_with_retries(self, payload):
+        attempt = 0
+        while True:
+            error = None
+            response = None
+            with self._semaphore:
+                self._count("requests")
+                try:
+                    response = self.session.post(self.api_url, headers=self.headers,
+                                                 json=payload, timeout=self.timeout)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+
+            if response is not None and response.status_code == 200:
+                return response.json()
+            retryable = error is not None or response.status_code in RETRY_STATUSES
+            if not retryable or attempt >= self.max_retries:
+                if error is not None:
+                    raise error
+                raise Exception(f"API error: {response.status_code} - {response.text}")
+
+            # Sleep outside the semaphore so waiting requests don't hold a slot
+            self._sleep(self._delay(attempt, response))
+            self._count("retries")
+            attempt += 1
+
+    def _delay(self, attempt, response=None):
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        delay *= random.uniform(0.5, 1.0)
+        requested = retry_after_seconds(response) if response is not None else None
+        if requested is not None:
+            delay = max(delay, min(requested, self.max_backoff))
+        return delay
+
+    def _cache_get(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1]
+            if entry is not None:
+                del self._cache[key]
+            self._stats["misses"] += 1
+            return None
+
+    def _cache_put(self, key, value):
+        if not self.cache_ttl:
+            return
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, value)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
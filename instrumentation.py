@@ -0,0 +1,127 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Upper bounds (ms) of the per-frame render time histogram buckets
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class RenderReport:
+    """Timing report for one generation run
+
+    Collects timed spans for each pipeline stage, per-frame render times
+    grouped by scene, and optionally a cProfile capture of the whole run.
+    to_dict() gives a JSON-friendly summary for logs or the Streamlit app.
+    """
+
+    def __init__(self, profile=False):
+        self.spans = []
+        self.frames = {}
+        self.repeated = {}
+        self.counters = {}
+        self._local = threading.local()
+        self._created = time.perf_counter()
+        self._profiler = cProfile.Profile() if profile else None
+        self._profile_text = None
+        self._profiling = False
+
+    @property
+    def _stack(self):
+        # Per thread, so spans from background work (e.g. TTS) nest correctly
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name):
+        """Time a stage; nested spans are recorded as parent/child"""
+        stack = self._stack
+        full_name = "/".join(stack + [name])
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stack.pop()
+            self.spans.append({
+                "name": full_name,
+                "start": round(start - self._created, 4),
+                "seconds": round(time.perf_counter() - start, 4),
+            })
+
+    def record_frame(self, scene, seconds, repeated=False):
+        if repeated:
+            self.repeated[scene] = self.repeated.get(scene, 0) + 1
+        self.frames.setdefault(scene, []).append(seconds)
+
+    def record_frames(self, scene, seconds_list, repeated=0):
+        self.frames.setdefault(scene, []).extend(seconds_list)
+        if repeated:
+            self.repeated[scene] = self.repeated.get(scene, 0) + repeated
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def start_profile(self):
+        if self._profiler is not None:
+            # Raises ValueError if another profiler is active (Python 3.12+)
+            self._profiler.enable()
+            self._profiling = True
+
+    def stop_profile(self, limit=30):
+        if not self._profiling:
+            return
+        self._profiling = False
+        self._profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+        self._profile_text = out.getvalue()
+
+    def dump_profile(self, path):
+        """Write the raw cProfile data, e.g. for snakeviz"""
+        if self._profiler is not None:
+            self._profiler.dump_stats(str(path))
+
+    def frame_stats(self, scene):
+        times = sorted(self.frames.get(scene, []))
+        if not times:
+            return None
+        ms = [t * 1000 for t in times]
+        histogram = {}
+        for bound in HISTOGRAM_BUCKETS_MS:
+            histogram[f"<{bound}ms"] = 0
+        histogram[f">={HISTOGRAM_BUCKETS_MS[-1]}ms"] = 0
+        for value in ms:
+            for bound in HISTOGRAM_BUCKETS_MS:
+                if value < bound:
+                    histogram[f"<{bound}ms"] += 1
+                    break
+            else:
+                histogram[f">={HISTOGRAM_BUCKETS_MS[-1]}ms"] += 1
+        return {
+            "frames": len(ms),
+            "repeated": self.repeated.get(scene, 0),
+            "total_seconds": round(sum(times), 4),
+            "mean_ms": round(sum(ms) / len(ms), 3),
+            "p50_ms": round(ms[len(ms) // 2], 3),
+            "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+            "max_ms": round(ms[-1], 3),
+            "histogram": histogram,
+        }
+
+    def to_dict(self):
+        return {
+            "total_seconds": round(time.perf_counter() - self._created, 4),
+            "spans": sorted(self.spans, key=lambda span: span["start"]),
+            "frames": {scene: self.frame_stats(scene) for scene in self.frames},
+            "counters": dict(self.counters),
+            "profile": self._profile_text,
+        }
+
+
+def span(report, name):
+    """report.span(name), or a no-op when no report is being collected"""
+    return report.span(name) if report is not None else nullcontext()
@@ -0,0 +1,136 @@
+import numpy as np
+
+from frame_pool import FramePool
+
+
+class Layer:
+    """One element of a scene, drawn bottom-up in the order given to LayeredScene
+
+    `draw(frame, state)` paints the layer in place into the frame, an HxWx4
+    uint8 array, usually through the compositor module. `state(t)` maps
+    scene progress (0-1) to a hashable description of what the layer looks
+    like at that moment, or None when it is hidden. A layer without a state
+    function is static: it looks the same on every frame.
+    """
+
+    def __init__(self, draw, state=None, name=None):
+        self.draw = draw
+        self.state_fn = state
+        self.name = name
+
+    @property
+    def static(self):
+        return self.state_fn is None
+
+    def state(self, t):
+        return True if self.state_fn is None else self.state_fn(t)
+
+
+class LayeredScene:
+    """A scene built from static and animated layers
+
+    The longest run of bottom layers that are static, or have not changed for
+    the last `bake_after` frames, is composited once and reused, so only the
+    layers above it are redrawn. When no layer changed at all the previous
+    frame buffer is returned as-is and `last_repeated` is set, letting the
+    caller skip work for the duplicate.
+
+    Frames are drawn in place into buffers from `pool` (shared between
+    scenes of the same size) and the baked base is copied over them, so a
+    rendered frame allocates no frame-sized memory.
+    """
+
+    def __init__(self, width, height, duration, layers, bake_after=2, pool=None):
+        self.width = width
+        self.height = height
+        self.duration = duration
+        self.layers = list(layers)
+        self.bake_after = bake_after
+        self.last_repeated = False
+        self.frames_rendered = 0
+        self.frames_repeated = 0
+        self.base_builds = 0
+        self.pool = pool or FramePool(width, height)
+
+        self._last_states = None
+        self._last_frame = None
+        self._unchanged = [0] * len(self.layers)
+        self._base_key = None
+        self._base = None
+        self._lease = None
+
+    def render(self, t):
+        """Frame at progress t as an HxWx4 uint8 pool buffer (RGB + unused byte)
+
+        The buffer belongs to the pool and is overwritten once the ring
+        wraps around; copy it to keep it.
+        """
+        states = tuple(layer.state(t) for layer in self.layers)
+
+        if states == self._last_states and self.pool.is_current(*self._lease):
+            self.frames_repeated += 1
+            self.last_repeated = True
+            return self._last_frame
+
+        self._track_changes(states)
+        prefix = self._stable_prefix()
+        slot, lease, frame = self.pool.acquire()
+        if prefix == 0:
+            frame.fill(0)
+        else:
+            base_key = (prefix, states[:prefix])
+            if base_key != self._base_key:
+                self._build_base(states, prefix)
+                self._base_key = base_key
+            np.copyto(frame, self._base)
+
+        self._composite(frame, states, prefix, len(self.layers))
+
+        self._last_states = states
+        self._last_frame = frame
+        self._lease = (slot, lease)
+        self.last_repeated = False
+        self.frames_rendered += 1
+        return frame
+
+    def render_rgb(self, t):
+        """Independent HxWx3 RGB copy of the frame at progress t"""
+        return np.ascontiguousarray(self.render(t)[:, :, :3])
+
+    def stats(self):
+        return {
+            "rendered": self.frames_rendered,
+            "repeated": self.frames_repeated,
+            "base_builds": self.base_builds,
+            "pool": self.pool.stats(),
+        }
+
+    def _build_base(self, states, prefix):
+        # The base buffer is allocated once and redrawn in place
+        if self._base is None:
+            self._base = self.pool.allocate()
+        self._base.fill(0)
+        self._composite(self._base, states, 0, prefix)
+        self.base_builds += 1
+
+    def _track_changes(self, states):
+        for i, state in enumerate(states):
+            if self._last_states is not None and state == self._last_states[i]:
+                self._unchanged[i] += 1
+            else:
+                self._unchanged[i] = 0
+
+    def _stable_prefix(self):
+        # Bottom layers worth baking: static, or settled for a few frames
+        prefix = 0
+        for layer, unchanged in zip(self.layers, self._unchanged):
+            if not (layer.static or unchanged >= self.bake_after):
+                break
+            prefix += 1
+        return prefix
+
+    def _composite(self, frame, states, start, end):
+        for layer, state in zip(self.layers[start:end], states[start:end]):
+            if state is not None:
+                layer.draw(frame, state)
+        return frame
@@ -0,0 +1,344 @@
+import json
+import mimetypes
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+try:
+    import fcntl
+except ImportError:  # Windows: the index is only guarded between threads
+    fcntl = None
+
+# Bytes read per chunk when streaming a file; a viewer holds at most one
+CHUNK_SIZE = 256 * 1024
+
+
+def read_chunks(path, start=0, end=None, chunk_size=CHUNK_SIZE):
+    """Yield the bytes of `path` from `start` to `end` (inclusive) chunk by chunk"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def parse_range(header, size):
+    """(start, end) of a single "bytes=a-b" Range header, None for the whole file
+
+    Raises ValueError when the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # "bytes=-N" is the last N bytes
+        start = max(0, size - int(last))
+        end = size - 1
+    if start > end or start >= size:
+        raise ValueError(f"unsatisfiable range {header!r} for {size} bytes")
+    return start, end
+
+
+class OutputStore:
+    """Bounded directory of finished videos with an index and retention policy
+
+    Artifacts are the files directly under `root`; `index.json` records
+    their size, creation and last access time and free-form metadata
+    (aspect, quality, ...). After every add, artifacts not accessed for
+    `max_age` seconds are deleted, then the least recently accessed ones
+    until the store fits in `max_bytes`. The artifact just added is never
+    evicted. Pass None to disable either limit.
+
+    MP4s in `root` missing from the index (written by an older version, or
+    left behind by a crash) are adopted once they are `grace` seconds old,
+    so they count against the quota too; younger ones may be renders in
+    progress and are left alone.
+    """
+
+    def __init__(self, root, max_bytes=5 * 1024 ** 3, max_age=3 * 24 * 3600, grace=3600):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.grace = grace
+        self._index_path = self.root / "index.json"
+        self._lock_path = self.root / "index.lock"
+        self._lock = threading.Lock()
+
+    def add(self, path, name=None, **meta):
+        """Register a finished file and return its path in the store
+
+        Files outside `root` are hard-linked (or copied) in under `name`,
+        by default their own file name. Adding an existing name again only
+        refreshes its access time.
+        """
+        path = Path(path)
+        target = self.root / (name or path.name)
+        if path.resolve() != target.resolve() and not target.exists():
+            tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+            try:
+                os.link(path, tmp)
+            except OSError:
+                shutil.copyfile(path, tmp)
+            os.replace(tmp, target)
+
+        now = time.time()
+        with self._locked():
+            index = self._load()
+            entry = index["artifacts"].get(target.name, {"created": now, "meta": {}})
+            entry["size"] = target.stat().st_size
+            entry["accessed"] = now
+            entry["meta"].update(meta)
+            index["artifacts"][target.name] = entry
+            self._evict(index, keep=target.name)
+            self._save(index)
+        return str(target)
+
+    def lookup(self, name):
+        """Path of an indexed artifact, marking it as accessed; None when unknown or evicted"""
+        with self._locked():
+            index = self._load()
+            entry = index["artifacts"].get(name)
+            path = self.root / name
+            if entry is None or not path.is_file():
+                return None
+            entry["accessed"] = time.time()
+            self._save(index)
+        return path
+
+    def artifacts(self):
+        """Index entries, newest first, each with its name"""
+        with self._locked():
+            index = self._load()
+        entries = [{"name": name, **entry} for name, entry in index["artifacts"].items()]
+        return sorted(entries, key=lambda entry: entry["created"], reverse=True)
+
+    def evict(self):
+        """Apply the retention policy now"""
+        with self._locked():
+            index = self._load()
+            self._evict(index)
+            self._save(index)
+
+    def remove(self, name):
+        with self._locked():
+            index = self._load()
+            if index["artifacts"].pop(name, None) is not None:
+                (self.root / name).unlink(missing_ok=True)
+                self._save(index)
+
+    def stats(self):
+        with self._locked():
+            index = self._load()
+        return {
+            "artifacts": len(index["artifacts"]),
+            "bytes": sum(entry["size"] for entry in index["artifacts"].values()),
+            "max_bytes": self.max_bytes,
+            "evictions": index["evictions"],
+        }
+
+    def _evict(self, index, keep=None):
+        artifacts = index["artifacts"]
+        now = time.time()
+
+        # Forget artifacts deleted behind our back, adopt settled unindexed files
+        for name in list(artifacts):
+            if not (self.root / name).is_file():
+                del artifacts[name]
+        for path in self.root.glob("*.mp4"):
+            if path.name in artifacts:
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime >= self.grace:
+                artifacts[path.name] = {"created": stat.st_mtime, "accessed": stat.st_mtime,
+                                        "size": stat.st_size, "meta": {}}
+
+        by_access = sorted((entry["accessed"], name) for name, entry in artifacts.items()
+                           if name != keep)
+        total = sum(entry["size"] for entry in artifacts.values())
+        for accessed, name in by_access:
+            expired = self.max_age is not None and now - accessed > self.max_age
+            over_quota = self.max_bytes is not None and total > self.max_bytes
+            if not (expired or over_quota):
+                continue
+            (self.root / name).unlink(missing_ok=True)
+            total -= artifacts.pop(name)["size"]
+            index["evictions"] += 1
+
+    @contextmanager
+    def _locked(self):
+        """Hold the index for a read-modify-write, against other threads and processes"""
+        with self._lock, open(self._lock_path, "a") as lock_file:
+            if fcntl is not None:
+                # Render workers in other processes add to the same store
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _load(self):
+        try:
+            with open(self._index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        return {"artifacts": index.get("artifacts", {}), "evictions": index.get("evictions", 0)}
+
+    def _save(self, index):
+        tmp = self._index_path.with_name(f"index.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp, self._index_path)
+
+
+def send_file(handler, path, download_name=None, content_type=None):
+    """Stream `path` as the response to `handler`, honouring a Range header
+
+    Memory per request is one chunk whatever the file size. Browsers seek
+    in videos with Range requests, which get 206 partial responses.
+    """
+    size = os.path.getsize(path)
+    try:
+        byte_range = parse_range(handler.headers.get("Range"), size)
+    except ValueError:
+        handler.send_response(416)
+        handler.send_header("Content-Range", f"bytes */{size}")
+        handler.end_headers()
+        return
+
+    start, end = byte_range or (0, size - 1)
+    handler.send_response(206 if byte_range else 200)
+    handler.send_header("Content-Type", content_type or mimetypes.guess_type(str(path))[0]
+                        or "application/octet-stream")
+    handler.send_header("Content-Length", str(end - start + 1))
+    handler.send_header("Accept-Ranges", "bytes")
+    if byte_range:
+        handler.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+    if download_name:
+        handler.send_header("Content-Disposition",
+                            f"attachment; filename*=UTF-8''{quote(download_name)}")
+    handler.end_headers()
+    if handler.command == "HEAD" or size == 0:
+        return
+    try:
+        for chunk in read_chunks(path, start, end):
+            handler.wfile.write(chunk)
+    except (BrokenPipeError, ConnectionResetError):
+        # The viewer seeked elsewhere or closed the tab
+        pass
+
+
+def send_json(handler, data, status=200, headers=None):
+    """Respond to `handler` with `data` as JSON"""
+    body = json.dumps(data).encode()
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/json")
+    handler.send_header("Content-Length", str(len(body)))
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    handler.end_headers()
+    if handler.command != "HEAD":
+        handler.wfile.write(body)
+
+
+class FileServer:
+    """Background HTTP server that streams a store's artifacts
+
+    GET /files/<name> serves an artifact (add ?download=<file name> to
+    make browsers save it), GET /index lists the artifacts as JSON. Only
+    indexed names are served, so nothing else on disk is reachable.
+    `public_url` is the address browsers use. Without it there is no
+    browser URL: the bind address (127.0.0.1 by default) is the viewer's own
+    machine on any remote deployment, so callers serve the bytes themselves.
+    """
+
+    def __init__(self, store, host="127.0.0.1", port=0, public_url=None):
+        self.store = store
+        self.host = host
+        self.port = port
+        self.public_url = public_url
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle(self, urlparse(self.path))
+
+            do_HEAD = do_POST = do_DELETE = do_GET
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True,
+                                        name="file-server")
+        self._thread.start()
+        return self
+
+    def handle(self, handler, url):
+        """Answer one request; subclasses add routes and fall back to this"""
+        if handler.command not in ("GET", "HEAD"):
+            handler.send_error(405)
+            return
+        if url.path == "/index":
+            send_json(handler, self.store.artifacts())
+            return
+        if url.path.startswith("/files/"):
+            path = self.store.lookup(unquote(url.path[len("/files/"):]))
+            if path is not None:
+                download = parse_qs(url.query).get("download", [None])[0]
+                send_file(handler, path, download_name=download)
+                return
+        handler.send_error(404)
+
+    @property
+    def url(self):
+        return (self.public_url or f"http://{self.host}:{self.port}").rstrip("/")
+
+    def url_for(self, path, download_name=None):
+        """URL of an artifact given its path or name, for clients on this machine"""
+        url = f"{self.url}/files/{quote(Path(path).name)}"
+        if download_name:
+            url += f"?download={quote(download_name)}"
+        return url
+
+    def browser_url_for(self, path, download_name=None):
+        """URL of an artifact for a viewer's browser, None when no public_url is set"""
+        if not self.public_url:
+            return None
+        return self.url_for(path, download_name)
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,187 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+
+from encoding import get_profile
+from ffmpeg_writer import AudioInput, FFmpegPipeWriter, get_ffmpeg_exe
+from frame_pool import PIX_FMT
+from instrumentation import span
+from product_image import ProductImage
+
+# Per-process state so a worker reuses its generators (and their caches) across jobs
+_worker_generators = {}
+_worker_images = {}
+
+
+def plan_segments(scenes, fps, chunk_frames=None):
+    """Split the scenes into (scene, start_frame, end_frame) jobs in playback order"""
+    jobs = []
+    for scene, duration in scenes:
+        total = duration * fps
+        step = chunk_frames or total
+        for start in range(0, total, step):
+            jobs.append((scene, start, min(start + step, total)))
+    return jobs
+
+
+def segment_job(image_path, scene, start, end, width, height, fps, segment_path,
+                product_name=None, discount_text=None, profile=None, text_scale=1.0,
+                output_dir="outputs", temp_dir="temp"):
+    """Job dict describing one segment for render_segment/encode_segment
+
+    A target-size `profile` must already be resolved for the whole video's
+    duration, so every segment gets the same bitrate. `output_dir` and
+    `temp_dir` are the caller's, for the worker's generator and its caches.
+    """
+    return {
+        "image_path": str(image_path),
+        "scene": scene,
+        "start": start,
+        "end": end,
+        "width": width,
+        "height": height,
+        "fps": fps,
+        "product_name": product_name,
+        "discount_text": discount_text,
+        "profile": get_profile(profile),
+        "text_scale": text_scale,
+        "segment_path": str(segment_path),
+        "output_dir": str(output_dir),
+        "temp_dir": str(temp_dir),
+    }
+
+
+def render_segment(job):
+    """Worker entry point: render a frame range of one scene and encode it to a segment"""
+    from video_generator import VideoGenerator
+
+    dirs = (job["output_dir"], job["temp_dir"])
+    if dirs not in _worker_generators:
+        _worker_generators[dirs] = VideoGenerator(hf_api_key=None, output_dir=dirs[0],
+                                                  temp_dir=dirs[1])
+    image_path = job["image_path"]
+    if image_path not in _worker_images:
+        _worker_images[image_path] = ProductImage.open(image_path).rgba
+    return encode_segment(_worker_generators[dirs], _worker_images[image_path], job)
+
+
+def encode_segment(generator, product_img, job):
+    """Render a job's frame range with `generator` and encode it to job["segment_path"]
+
+    Returns the per-frame render times alongside the segment path so the
+    parent can fold them into its RenderReport.
+    """
+    from video_generator import SCENE_DURATIONS
+
+    scene = job["scene"]
+    fps = job["fps"]
+    total = SCENE_DURATIONS[scene] * fps
+
+    layered = generator.build_scene(scene, product_img, job["width"], job["height"],
+                                    job["product_name"], job["discount_text"],
+                                    job["text_scale"])
+
+    frame_seconds = []
+    repeated = 0
+    with FFmpegPipeWriter(job["segment_path"], job["width"], job["height"], fps,
+                          profile=job["profile"], pix_fmt=PIX_FMT) as writer:
+        for frame_num in range(job["start"], job["end"]):
+            start = time.perf_counter()
+            frame = layered.render(frame_num / total)
+            frame_seconds.append(time.perf_counter() - start)
+            repeated += layered.last_repeated
+            writer.write_frame(frame, repeat=layered.last_repeated)
+
+    return {"segment_path": job["segment_path"], "scene": scene,
+            "frame_seconds": frame_seconds, "repeated": repeated}
+
+
+def render_jobs(jobs, workers, report=None):
+    """Encode segment jobs in a process pool and fold their frame times into `report`"""
+    # Start the longest jobs first so they do not end up last on a busy pool
+    by_length = sorted(jobs, key=lambda job: job["end"] - job["start"], reverse=True)
+    with span(report, "render_segments"):
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            results = list(pool.map(render_segment, by_length))
+    if report is not None:
+        for result in results:
+            report.record_frames(result["scene"], result["frame_seconds"], result["repeated"])
+    return results
+
+
+def concat_segments(segment_paths, output_path, audio=None, duration=None, profile=None,
+                    temp_dir=None):
+    """Join encoded segments with ffmpeg's concat demuxer without re-encoding the video
+
+    `audio` is a file path or an in-memory AudioTrack, streamed in through a
+    pipe, and encoded at the bitrate of `profile`. The segment list is a
+    uniquely named file in `temp_dir` (the system's by default).
+    """
+    output_path = Path(output_path)
+    fd, list_path = tempfile.mkstemp(suffix=".concat.txt", dir=temp_dir)
+    list_path = Path(list_path)
+    with os.fdopen(fd, "w") as f:
+        for path in segment_paths:
+            escaped = str(Path(path).resolve()).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    audio_input = AudioInput(audio)
+    cmd = [get_ffmpeg_exe(), '-y', '-loglevel', 'error',
+           '-f', 'concat', '-safe', '0', '-i', str(list_path)]
+    if audio:
+        cmd += audio_input.args + ['-map', '0:v', '-map', '1:a']
+        cmd += get_profile(profile).audio_args() + ['-af', 'apad']
+        if duration is None:
+            cmd += ['-shortest']
+    if duration is not None:
+        cmd += ['-t', f'{duration:.3f}']
+    cmd += ['-c:v', 'copy', str(output_path)]
+
+    try:
+        result = subprocess.run(cmd, capture_output=True, pass_fds=audio_input.pass_fds)
+    finally:
+        audio_input.close()
+        list_path.unlink(missing_ok=True)
+    if result.returncode != 0:
+        raise IOError(f"ffmpeg concat failed: {result.stderr.decode(errors='replace').strip()}")
+    return str(output_path)
+
+
+def render_parallel(image_path, output_path, scenes, width, height, fps, workers=None,
+                    chunk_frames=None, audio=None, product_name=None,
+                    discount_text=None, temp_dir="temp", profile=None, text_scale=1.0,
+                    report=None, output_dir="outputs"):
+    """Render scenes (or fixed-size frame chunks) in a process pool and stitch them losslessly
+
+    audio (a path or AudioTrack) may be a Future, e.g. a soundtrack still
+    being built; it is only waited for once the segments are done.
+    """
+    workers = workers or os.cpu_count() or 1
+    duration = sum(d for _, d in scenes)
+    profile = get_profile(profile).resolve(duration)
+    segment_dir = Path(tempfile.mkdtemp(prefix="segments_", dir=temp_dir))
+
+    jobs = []
+    for index, (scene, start, end) in enumerate(plan_segments(scenes, fps, chunk_frames)):
+        jobs.append(segment_job(image_path, scene, start, end, width, height, fps,
+                                segment_dir / f"{index:04d}_{scene}.mp4", product_name,
+                                discount_text, profile, text_scale, output_dir, temp_dir))
+
+    try:
+        render_jobs(jobs, workers, report)
+
+        if isinstance(audio, Future):
+            with span(report, "wait_voiceover"):
+                audio = audio.result()
+
+        with span(report, "concat_segments"):
+            return concat_segments([job["segment_path"] for job in jobs], output_path,
+                                   audio=audio, duration=duration, profile=profile,
+                                   temp_dir=segment_dir)
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
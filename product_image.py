@@ -0,0 +1,119 @@
+import hashlib
+import io
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# Largest side kept for rendering; the biggest product sprite is ~650px at 1080p
+MAX_RENDER_SIDE = 2048
+# Side of the thumbnail used for product-type detection and colour statistics
+THUMBNAIL_SIDE = 128
+# Largest side of the PNG shown back to the user after an upload
+PREVIEW_SIDE = 640
+
+
+class ProductImage:
+    """A product photo decoded once and shared by the script and video pipelines
+
+    Holds the original file bytes (for hashing and saving without
+    re-encoding), an RGBA copy capped at MAX_RENDER_SIDE for rendering and a
+    small thumbnail for analysis. JPEGs are decoded at reduced scale straight
+    from the DCT, so a 24MP photo never materializes at full size.
+    """
+
+    def __init__(self, data, path=None, name=None):
+        self.data = data
+        self.path = str(path) if path else None
+        self.name = name or (Path(path).name if path else "product.png")
+        self._rgba = None
+        self._thumbnail = None
+        self._preview = None
+        self._stats = None
+        self._digest = None
+
+        with Image.open(io.BytesIO(data)) as img:
+            self.format = img.format
+            self.size = img.size
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            return cls(f.read(), path=path)
+
+    @classmethod
+    def load(cls, source):
+        """Pass a ProductImage through, open a path otherwise"""
+        if isinstance(source, cls):
+            return source
+        return cls.open(source)
+
+    @property
+    def rgba(self):
+        """RGBA image for rendering, no larger than MAX_RENDER_SIDE"""
+        if self._rgba is None:
+            self._rgba = self._decode(MAX_RENDER_SIDE).convert("RGBA")
+        return self._rgba
+
+    @property
+    def thumbnail(self):
+        """Small RGB copy for analysis"""
+        if self._thumbnail is None:
+            # Reuse the render copy when it is already decoded
+            source = self._rgba if self._rgba is not None else self._decode(THUMBNAIL_SIDE)
+            img = source.convert("RGB")
+            img.thumbnail((THUMBNAIL_SIDE, THUMBNAIL_SIDE), Image.Resampling.BILINEAR)
+            self._thumbnail = img
+        return self._thumbnail
+
+    @property
+    def preview(self):
+        """PNG bytes no larger than PREVIEW_SIDE, for displaying the upload"""
+        if self._preview is None:
+            img = self._decode(PREVIEW_SIDE)
+            if img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+                img = img.convert("RGBA")  # e.g. CMYK JPEGs, which PNG cannot hold
+            buffer = io.BytesIO()
+            img.save(buffer, "PNG")
+            self._preview = buffer.getvalue()
+        return self._preview
+
+    @property
+    def digest(self):
+        """sha256 of the file bytes, the image part of render cache keys"""
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.data).hexdigest()
+        return self._digest
+
+    @property
+    def aspect_ratio(self):
+        width, height = self.size
+        return width / height
+
+    def stats(self):
+        """Colour statistics from the thumbnail"""
+        if self._stats is None:
+            pixels = np.asarray(self.thumbnail, dtype=np.float32).reshape(-1, 3)
+            mean = pixels.mean(axis=0)
+            self._stats = {
+                "avg_color": tuple(int(c) for c in mean),
+                "brightness": float(pixels.mean() / 255),
+                "saturation": float((pixels.max(axis=1) - pixels.min(axis=1)).mean() / 255),
+            }
+        return self._stats
+
+    def save(self, path):
+        """Write the original bytes to `path` and remember it"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(self.data)
+        self.path = str(path)
+        return self.path
+
+    def _decode(self, max_side):
+        img = Image.open(io.BytesIO(self.data))
+        # JPEG can decode at 1/2, 1/4 or 1/8 scale directly
+        img.draft("RGB", (max_side, max_side))
+        if max(img.size) > max_side:
+            img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        return img
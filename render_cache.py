@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import util
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: stats are only guarded between threads
+    fcntl = None
+
+# Seconds between writes of the hit/miss counters to stats.json
+STATS_FLUSH_INTERVAL = 10
+
+
+class RenderCache:
+    """Content-addressed on-disk cache of finished videos
+
+    Entries are keyed by a hash of everything that affects the output, so a
+    repeated request returns the existing MP4 without rendering. Least
+    recently used entries are evicted once the cache exceeds `max_bytes`, and
+    anything not used for `max_age` seconds is dropped. Hit/miss counters are
+    kept in memory and added to stats.json under a lock file at most every
+    STATS_FLUSH_INTERVAL seconds, on stats() and at exit, so they survive
+    across app reruns and render workers sharing the cache don't lose counts.
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3, max_age=7 * 24 * 3600):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._counters = StatsCounters(self.cache_dir / "stats.json", self.cache_dir / "stats.lock")
+        # Runs when the cache is collected, at interpreter exit and when a
+        # worker process exits (which skips atexit handlers). It only holds
+        # the counters, so the cache itself can still be collected.
+        util.Finalize(self, self._counters.flush, exitpriority=10)
+
+    @staticmethod
+    def make_key(image_path, **inputs):
+        """Hash the image bytes plus every other render input
+
+        `image_path` may be a path or anything with a precomputed sha256
+        `digest` of the image bytes (a ProductImage).
+        """
+        if hasattr(image_path, "digest"):
+            image_digest = image_path.digest
+        else:
+            image_hash = hashlib.sha256()
+            with open(image_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    image_hash.update(chunk)
+            image_digest = image_hash.hexdigest()
+        digest = hashlib.sha256(bytes.fromhex(image_digest))
+        digest.update(json.dumps(inputs, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def path_for(self, key):
+        return self.cache_dir / f"{key}.mp4"
+
+    def get(self, key):
+        """Path of the cached video for `key`, or None on a miss"""
+        path = self.path_for(key)
+        if path.exists() and not self._expired(path):
+            # Bump mtime so eviction treats the entry as recently used
+            os.utime(path)
+            self._count("hits")
+            return str(path)
+        self._count("misses")
+        return None
+
+    def put(self, key, video_path):
+        """Store a finished video under `key` and return the cached path"""
+        path = self.path_for(key)
+        tmp = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            os.link(video_path, tmp)
+        except OSError:
+            shutil.copyfile(video_path, tmp)
+        os.replace(tmp, path)
+        self.evict()
+        return str(path)
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under quota"""
+        entries = []
+        for path in self.cache_dir.glob("*.mp4"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if self._expired(path, stat):
+                path.unlink(missing_ok=True)
+                self._count("evictions")
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        # Never evict the newest entry, it was just written or used
+        for _, size, path in sorted(entries)[:-1]:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self._count("evictions")
+
+    def stats(self):
+        self._counters.flush()
+        stats = self._counters.load()
+        lookups = stats["hits"] + stats["misses"]
+        entries = list(self.cache_dir.glob("*.mp4"))
+        stats.update({
+            "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+            "entries": len(entries),
+            "bytes": sum(p.stat().st_size for p in entries if p.exists()),
+        })
+        return stats
+
+    def clear(self):
+        for path in self.cache_dir.glob("*.mp4"):
+            path.unlink(missing_ok=True)
+
+    def _expired(self, path, stat=None):
+        if not self.max_age:
+            return False
+        stat = stat or path.stat()
+        return time.time() - stat.st_mtime > self.max_age
+
+    def flush(self):
+        """Add the counts since the last flush to stats.json"""
+        self._counters.flush()
+
+    def _count(self, name):
+        self._counters.add(name)
+
+
+class StatsCounters:
+    """Cache counters kept in memory and added to a shared JSON file
+
+    Counts are added to `path` under an flock on `lock_path` when flush() is
+    called, or on add() once STATS_FLUSH_INTERVAL seconds have passed since
+    the last flush, so processes sharing the file don't lose counts.
+    """
+
+    NAMES = ("hits", "misses", "evictions")
+
+    def __init__(self, path, lock_path):
+        self.path = Path(path)
+        self.lock_path = Path(lock_path)
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flushed = time.monotonic()
+
+    def add(self, name):
+        with self._lock:
+            self._pending[name] = self._pending.get(name, 0) + 1
+            due = time.monotonic() - self._flushed >= STATS_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def load(self):
+        """Counts in the file, without the ones not flushed yet"""
+        try:
+            with open(self.path) as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            stats = {}
+        return {name: stats.get(name, 0) for name in self.NAMES}
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed = time.monotonic()
+        if not pending:
+            return
+        with self._locked():
+            stats = self.load()
+            for name, count in pending.items():
+                stats[name] += count
+            tmp = self.path.with_name(f"{self.path.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "w") as f:
+                json.dump(stats, f)
+            os.replace(tmp, self.path)
+
+    @contextmanager
+    def _locked(self):
+        """Hold the file for a read-modify-write, against other processes"""
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
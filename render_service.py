@@ -0,0 +1,647 @@
+"""Local render service: a bounded, prioritized job queue in front of worker processes
+
+Run it on its own (when AD_RENDER_SERVICE_URL is not set the app starts one
+with start_service(), or uses the one already on its port):
+
+    python render_service.py --port 8766 --workers 4
+
+The server has no authentication: keep it on 127.0.0.1 or a private network.
+
+HTTP API (JSON):
+    POST   /jobs               submit a job; 202 with its status, 429 when full
+    GET    /jobs/<id>          status: queued (with position), running, done, failed
+    DELETE /jobs/<id>          cancel a queued job
+    GET    /jobs/<id>/result   the finished video (add ?download=<file name>)
+    GET    /stats              queue depth, running jobs, workers
+    GET    /files/<name>       any finished video, as served by FileServer
+"""
+import argparse
+import atexit
+import base64
+import heapq
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.parse import parse_qs, quote, unquote
+from urllib.request import Request, urlopen
+
+from output_store import FileServer, OutputStore, send_file, send_json
+
+try:
+    import fcntl
+except ImportError:  # Windows: directories of exited services are left behind
+    fcntl = None
+
+# Lower runs first; ties run in submission order
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+# Keyword arguments a job may pass through to create_ad_video / create_ad_videos
+VIDEO_OPTIONS = {"duration", "quality", "include_voiceover", "include_music", "product_name",
+                 "discount_text", "draft", "encoding", "aspect", "profile"}
+VARIANT_OPTIONS = {"outputs", "include_voiceover", "include_music", "product_name",
+                   "discount_text", "encoding", "profile"}
+SCRIPT_OPTIONS = {"tagline"}
+
+# Largest POST /jobs body (the image travels base64-encoded inside it)
+MAX_REQUEST_BYTES = 64 * 1024 ** 2
+
+
+class QueueFull(Exception):
+    """The service is not taking the job now; retry after `retry_after` seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Job:
+    def __init__(self, kind, priority, client, sequence):
+        self.id = uuid.uuid4().hex[:16]
+        self.kind = kind
+        self.priority = priority
+        self.client = client
+        self.sequence = sequence
+        # Set on submit: the job's working directory and what the worker needs
+        self.directory = None
+        self.request = None
+        self.state = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.result = None
+
+    @property
+    def active(self):
+        return self.state in ("queued", "running")
+
+    @property
+    def order(self):
+        """Queue order: priority, then submission"""
+        return PRIORITIES[self.priority], self.sequence
+
+    def status(self):
+        status = {"id": self.id, "kind": self.kind, "state": self.state,
+                  "priority": self.priority, "created": self.created,
+                  "started": self.started, "finished": self.finished}
+        if self.error:
+            status["error"] = self.error
+        if self.result is not None:
+            status["result"] = self.result
+        return status
+
+
+class RenderService:
+    """Prioritized job queue with admission control, run by a pool of worker processes
+
+    At most `workers` jobs render at once, each in a process of its own
+    that keeps its generators (and their caches) between jobs, so
+    throughput follows the number of cores, not the number of clients.
+    Up to `max_queued` jobs wait, highest priority first; beyond that, or
+    beyond `max_per_client` active jobs for one client, submit() raises
+    QueueFull with an estimate of when to retry. Every job gets its own
+    directory for its upload and scratch files, removed when it finishes,
+    inside a directory of this service instance under `work_dir`; another
+    service starting on the same `work_dir` only removes the directories of
+    instances that are gone. Finished jobs are forgotten after `job_ttl` seconds;
+    their videos stay in the output store.
+    """
+
+    def __init__(self, output_dir="outputs", work_dir="temp/jobs", workers=None, max_queued=None,
+                 max_per_client=2, job_ttl=3600):
+        self.output_dir = Path(output_dir)
+        self.work_dir, self._work_lock = self._claim_work_dir(Path(work_dir))
+        self.store = OutputStore(self.output_dir)
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queued = max_queued if max_queued is not None else 4 * self.workers
+        self.max_per_client = max_per_client
+        self.job_ttl = job_ttl
+
+        self._jobs = {}
+        self._queue = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        # Average render time, for Retry-After estimates
+        self._job_seconds = 30.0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._pool = self._new_pool()
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True,
+                                            name="render-dispatch")
+        self._dispatcher.start()
+
+    def _new_pool(self):
+        # Spawned, not forked: the service usually lives in a threaded web server
+        return ProcessPoolExecutor(max_workers=self.workers,
+                                   mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(self, kind, image, image_name="product.png", hf_key=None, pexels_key=None,
+               script=None, priority="normal", client=None, **options):
+        """Queue a job and return its status
+
+        kind "video" renders one ad (create_ad_video options), "variants"
+        every requested aspect and quality from one render (create_ad_videos
+        options). `image` is the product photo's bytes. Without `script`
+        the job generates one first; `tagline` is then passed to it.
+        """
+        allowed = (VIDEO_OPTIONS if kind == "video" else VARIANT_OPTIONS) | SCRIPT_OPTIONS
+        if kind not in ("video", "variants"):
+            raise ValueError(f"Unknown job kind: {kind}")
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority} (choose from {', '.join(PRIORITIES)})")
+        unknown = set(options) - allowed
+        if unknown:
+            raise ValueError(f"Unknown options for a {kind} job: {', '.join(sorted(unknown))}")
+
+        with self._cond:
+            if self._closed:
+                raise QueueFull("The render service is shutting down", retry_after=60)
+            self._prune()
+            queued = sum(1 for job in self._jobs.values() if job.state == "queued")
+            if queued >= self.max_queued:
+                self._rejected += 1
+                raise QueueFull(f"{queued} jobs are already waiting",
+                                retry_after=self._retry_after(queued))
+            if client is not None and self.max_per_client:
+                active = sum(1 for job in self._jobs.values()
+                             if job.client == client and job.active)
+                if active >= self.max_per_client:
+                    self._rejected += 1
+                    raise QueueFull(f"{active} of your jobs are still queued or running",
+                                    retry_after=self._retry_after(queued))
+
+            job = Job(kind, priority, client, next(self._sequence))
+            job.directory = self.work_dir / job.id
+            job.directory.mkdir()
+            # Uploads are named per job, so equal file names never collide
+            image_path = job.directory / f"input{Path(image_name).suffix or '.png'}"
+            image_path.write_bytes(image)
+            job.request = {"kind": kind, "image_path": str(image_path), "hf_key": hf_key,
+                           "pexels_key": pexels_key, "script": script, "options": options,
+                           "job_dir": str(job.directory), "work_dir": str(self.work_dir),
+                           "output_dir": str(self.output_dir)}
+            self._jobs[job.id] = job
+            heapq.heappush(self._queue, (job.order, job))
+            self._cond.notify_all()
+            return self._status(job)
+
+    def status(self, job_id):
+        """Status dict of a job, None when unknown or forgotten"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return self._status(job) if job else None
+
+    def cancel(self, job_id):
+        """Cancel a queued job; returns its status (running jobs are left to finish)"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.state == "queued":
+                job.state = "cancelled"
+                job.finished = time.time()
+                shutil.rmtree(job.directory, ignore_errors=True)
+            return self._status(job)
+
+    def result_path(self, job_id):
+        """Path of a finished video job's output, None otherwise"""
+        status = self.status(job_id)
+        if not status or status["state"] != "done" or "video" not in status["result"]:
+            return None
+        return self.store.lookup(status["result"]["video"])
+
+    def stats(self):
+        with self._cond:
+            self._prune()
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queued": sum(1 for job in self._jobs.values() if job.state == "queued"),
+                "max_queued": self.max_queued,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "average_job_seconds": round(self._job_seconds, 2),
+            }
+
+    def close(self):
+        """Stop taking jobs, cancel the queued ones and shut the workers down"""
+        with self._cond:
+            self._closed = True
+            for job in self._jobs.values():
+                if job.state == "queued":
+                    job.state = "cancelled"
+            self._cond.notify_all()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        self._work_lock.close()
+
+    @staticmethod
+    def _claim_work_dir(root):
+        """A new directory for this instance under `root`, and the open file that locks it
+
+        Instance directories whose lock nobody holds belong to services that
+        have exited; their jobs have no one waiting, so they are removed.
+        """
+        root.mkdir(parents=True, exist_ok=True)
+        if fcntl is not None:
+            for stale in root.glob("service_*"):
+                try:
+                    with open(stale / "service.lock", "a") as lock_file:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        shutil.rmtree(stale, ignore_errors=True)
+                except OSError:
+                    # Held by a running service (or already gone)
+                    continue
+        # Locked under a name the sweep above ignores, then renamed into place
+        name = uuid.uuid4().hex
+        claim = root / f"claim_{name}"
+        claim.mkdir()
+        lock_file = open(claim / "service.lock", "a")
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        work_dir = root / f"service_{name}"
+        claim.rename(work_dir)
+        return work_dir, lock_file
+
+    def _status(self, job):
+        status = job.status()
+        if job.state == "queued":
+            # Jobs that will start before this one
+            status["position"] = sum(1 for other in self._jobs.values()
+                                     if other.state == "queued" and other.order < job.order)
+        return status
+
+    def _retry_after(self, queued):
+        """Seconds until about one queue slot's worth of jobs has finished"""
+        return max(1, round(self._job_seconds * max(1, queued) / self.workers))
+
+    def _prune(self):
+        cutoff = time.time() - self.job_ttl
+        for job_id, job in list(self._jobs.items()):
+            if not job.active and job.finished and job.finished < cutoff:
+                del self._jobs[job_id]
+
+    def _dispatch(self):
+        """Start the best queued job whenever a worker is free"""
+        while True:
+            with self._cond:
+                while not self._closed and (self._running >= self.workers or not self._queue):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                _, job = heapq.heappop(self._queue)
+                if job.state != "queued":
+                    continue  # cancelled while waiting
+                job.state = "running"
+                job.started = time.time()
+                self._running += 1
+                pool = self._pool
+            try:
+                future = pool.submit(run_job, job.request)
+            except (BrokenProcessPool, RuntimeError) as e:
+                self._finished(job, pool, error=e)
+                continue
+            future.add_done_callback(lambda future, job=job, pool=pool:
+                                     self._finished(job, pool, future=future))
+
+    def _finished(self, job, pool, future=None, error=None):
+        if future is not None:
+            try:
+                outcome = future.result()
+            except Exception as e:
+                error = e
+        if error is not None:
+            outcome = {"status": "failed", "error": f"{type(error).__name__}: {error}"}
+
+        with self._cond:
+            job.finished = time.time()
+            if outcome["status"] == "ok":
+                job.state = "done"
+                job.result = outcome["result"]
+                self._completed += 1
+                seconds = job.finished - job.started
+                # The first job replaces the initial guess outright
+                self._job_seconds = (seconds if self._completed == 1
+                                     else 0.8 * self._job_seconds + 0.2 * seconds)
+            else:
+                job.state = "failed"
+                job.error = outcome["error"]
+                self._failed += 1
+            job.request = None
+            self._running -= 1
+            if isinstance(error, BrokenProcessPool) and pool is self._pool and not self._closed:
+                # A worker died (e.g. out of memory); later jobs get fresh processes
+                self._pool = self._new_pool()
+            self._cond.notify_all()
+        shutil.rmtree(job.directory, ignore_errors=True)
+
+
+# Script generators kept per HF key in each worker process
+MAX_SCRIPT_GENERATORS = 4
+
+# This worker process's VideoGenerator (it needs no API key), kept with its
+# caches between jobs, and its most recently used ScriptGenerators
+_video_generator = None
+_script_generators = OrderedDict()
+
+
+def _worker_generators(request):
+    global _video_generator
+    from script_generator import ScriptGenerator
+    from video_generator import VideoGenerator
+
+    if _video_generator is None:
+        worker_dir = Path(request["work_dir"]) / f"worker_{os.getpid()}"
+        _video_generator = VideoGenerator(None, output_dir=request["output_dir"],
+                                          temp_dir=worker_dir)
+    key = request["hf_key"]
+    script_gen = _script_generators.pop(key, None) or ScriptGenerator(key)
+    _script_generators[key] = script_gen
+    while len(_script_generators) > MAX_SCRIPT_GENERATORS:
+        _script_generators.popitem(last=False)
+    return script_gen, _video_generator
+
+
+def run_job(request):
+    """Worker entry point: script and video(s) for one job, inside the job's directory"""
+    from instrumentation import RenderReport
+    from product_image import ProductImage
+
+    script_gen, video_gen = _worker_generators(request)
+    # Segment directories and any saved copies go to the job's own directory
+    video_gen.temp_dir = Path(request["job_dir"])
+
+    options = dict(request["options"])
+    try:
+        product = ProductImage.open(request["image_path"])
+        report = RenderReport(profile=options.pop("profile", False))
+        tagline = options.pop("tagline", None)
+        script = request["script"]
+        if not script:
+            script = script_gen.generate_script(product, options.get("product_name"), tagline,
+                                                options.get("discount_text"), report=report)
+
+        if request["kind"] == "variants":
+            if options.get("outputs"):
+                options["outputs"] = [tuple(variant) for variant in options["outputs"]]
+            paths, report_data = video_gen.create_ad_videos(product, script, report=report,
+                                                           return_report=True, **options)
+            result = {"script": script, "report": report_data,
+                      "variants": [{"aspect": aspect, "quality": quality, "video": Path(path).name}
+                                   for (aspect, quality), path in paths.items()]}
+        else:
+            path, report_data = video_gen.create_ad_video(product, script, encoder="ffmpeg",
+                                                          report=report, return_report=True,
+                                                          **options)
+            result = {"script": script, "report": report_data, "video": Path(path).name}
+        return {"status": "ok", "result": result}
+    except Exception as e:
+        print(traceback.format_exc())
+        return {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+
+
+class RenderServer(FileServer):
+    """HTTP front of a RenderService; also serves the finished videos like FileServer"""
+
+    def __init__(self, service, host="127.0.0.1", port=0, public_url=None):
+        super().__init__(service.store, host=host, port=port, public_url=public_url)
+        self.service = service
+
+    def handle(self, handler, url):
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        method = handler.command
+        if parts == ["jobs"] and method == "POST":
+            self._submit(handler)
+        elif parts == ["stats"] and method in ("GET", "HEAD"):
+            send_json(handler, self.service.stats())
+        elif len(parts) == 2 and parts[0] == "jobs" and method in ("GET", "HEAD", "DELETE"):
+            status = (self.service.cancel(parts[1]) if method == "DELETE"
+                      else self.service.status(parts[1]))
+            if status is None:
+                send_json(handler, {"error": "Unknown job"}, status=404)
+            else:
+                send_json(handler, status)
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result":
+            path = self.service.result_path(parts[1])
+            if path is None:
+                send_json(handler, {"error": "No finished video for this job"}, status=404)
+            else:
+                download = parse_qs(url.query).get("download", [None])[0]
+                send_file(handler, path, download_name=download)
+        else:
+            super().handle(handler, url)
+
+    def _submit(self, handler):
+        length = int(handler.headers.get("Content-Length") or 0)
+        if length > MAX_REQUEST_BYTES:
+            send_json(handler, {"error": "Request too large"}, status=413)
+            return
+        try:
+            request = json.loads(handler.rfile.read(length))
+            image = base64.b64decode(request.pop("image"))
+            status = self.service.submit(image=image, **request)
+        except QueueFull as e:
+            send_json(handler, {"error": str(e), "retry_after": e.retry_after}, status=429,
+                      headers={"Retry-After": str(e.retry_after)})
+        except (KeyError, TypeError, ValueError) as e:
+            send_json(handler, {"error": f"Bad job request: {e}"}, status=400)
+        else:
+            send_json(handler, status, status=202)
+
+
+class RenderError(Exception):
+    """The render service rejected a request or could not be reached"""
+
+
+class RenderClient:
+    """Submits jobs to a render service over HTTP and fetches or links to its videos
+
+    `public_url` is the service address browsers use (e.g. behind a reverse
+    proxy). Without it there are no browser links, since `url` is usually
+    loopback and would point at the viewer's own machine; copy the videos
+    with save_file() (or read them with file_bytes()) and serve them yourself.
+    """
+
+    def __init__(self, url, public_url=None, timeout=30):
+        self.url = url.rstrip("/")
+        self.public_url = public_url.rstrip("/") if public_url else None
+        self.timeout = timeout
+
+    def submit(self, kind, image, image_name="product.png", **fields):
+        """Queue a job (see RenderService.submit); raises QueueFull when the service is busy"""
+        body = dict(fields, kind=kind, image_name=image_name,
+                    image=base64.b64encode(image).decode("ascii"))
+        return self._request("POST", "/jobs", body)
+
+    def status(self, job_id):
+        return self._request("GET", f"/jobs/{quote(job_id)}")
+
+    def cancel(self, job_id):
+        return self._request("DELETE", f"/jobs/{quote(job_id)}")
+
+    def stats(self):
+        return self._request("GET", "/stats")
+
+    def wait(self, job_id, poll=0.5, timeout=None, on_status=None):
+        """Poll until the job is done, failed or cancelled; returns its last status"""
+        deadline = time.time() + timeout if timeout else None
+        while True:
+            status = self.status(job_id)
+            if on_status:
+                on_status(status)
+            if status["state"] not in ("queued", "running"):
+                return status
+            if deadline and time.time() > deadline:
+                raise TimeoutError(f"Job {job_id} still {status['state']} after {timeout}s")
+            time.sleep(poll)
+
+    def file_url(self, name, download_name=None):
+        """Browser URL of a finished video by its name, None without public_url"""
+        if not self.public_url:
+            return None
+        url = f"{self.public_url}/files/{quote(name)}"
+        if download_name:
+            url += f"?download={quote(download_name)}"
+        return url
+
+    def file_size(self, name):
+        """Size in bytes of a finished video, None once it has been evicted"""
+        request = Request(f"{self.url}/files/{quote(name)}", method="HEAD")
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return int(response.headers["Content-Length"])
+        except HTTPError:
+            return None
+
+    def file_bytes(self, name):
+        """Contents of a finished video, None once it has been evicted"""
+        try:
+            with urlopen(f"{self.url}/files/{quote(name)}", timeout=self.timeout) as response:
+                return response.read()
+        except HTTPError:
+            return None
+
+    def save_file(self, name, path):
+        """Copy a finished video to `path` in 256 KB chunks; False once it has been evicted"""
+        path = Path(path)
+        partial = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+        try:
+            with urlopen(f"{self.url}/files/{quote(name)}", timeout=self.timeout) as response, \
+                    open(partial, "wb") as f:
+                shutil.copyfileobj(response, f, 256 * 1024)
+        except HTTPError:
+            partial.unlink(missing_ok=True)
+            return False
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        os.replace(partial, path)
+        return True
+
+    def _request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        request = Request(self.url + path, data=data, method=method,
+                          headers={"Content-Type": "application/json"} if data else {})
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except HTTPError as e:
+            try:
+                detail = json.loads(e.read())
+            except ValueError:
+                detail = {"error": e.reason}
+            if e.code == 429:
+                raise QueueFull(detail.get("error", "Render queue full"),
+                                retry_after=int(e.headers.get("Retry-After") or 5)) from None
+            raise RenderError(f"{method} {path}: {e.code} {detail.get('error')}") from None
+        except OSError as e:
+            raise RenderError(f"Render service unreachable at {self.url}: {e}") from None
+
+
+def start_service(host="127.0.0.1", port=8766, workers=None, public_url=None, timeout=30):
+    """Client of the service on host:port, first starting one in a subprocess if none answers
+
+    The service gets its own process rather than a thread of the caller:
+    worker processes are spawned and re-import the parent's __main__, which
+    under Streamlit is the app script. The subprocess is stopped when the
+    caller exits; a service that was already running is left alone.
+    """
+    local_host = "127.0.0.1" if host in ("0.0.0.0", "") else host
+    client = RenderClient(f"http://{local_host}:{port}", public_url=public_url)
+    try:
+        client.stats()
+        return client
+    except RenderError:
+        pass
+
+    command = [sys.executable, str(Path(__file__).resolve()), "--host", host, "--port", str(port)]
+    if workers:
+        command += ["--workers", str(workers)]
+    if public_url:
+        command += ["--public-url", public_url]
+    process = subprocess.Popen(command)
+    atexit.register(process.terminate)
+    deadline = time.time() + timeout
+    while True:
+        time.sleep(0.05)
+        try:
+            client.stats()
+            return client
+        except RenderError:
+            if process.poll() is not None:
+                raise RenderError(f"Render service exited with code {process.returncode}") from None
+            if time.time() > deadline:
+                process.terminate()
+                raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--public-url", help="address browsers use to reach this server")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="render processes, i.e. jobs rendering at once")
+    parser.add_argument("--max-queued", type=int, help="waiting jobs before 429 (default 4x workers)")
+    parser.add_argument("--max-per-client", type=int, default=2,
+                        help="queued + running jobs per client (0: no limit)")
+    parser.add_argument("--output-dir", default="outputs")
+    parser.add_argument("--work-dir", default="temp/jobs")
+    args = parser.parse_args()
+    # Stopped like Ctrl-C, so the workers are shut down too
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    service = RenderService(args.output_dir, args.work_dir, workers=args.workers,
+                            max_queued=args.max_queued, max_per_client=args.max_per_client)
+    server = RenderServer(service, args.host, args.port, args.public_url).start()
+    print(f"Render service on {server.url} with {service.workers} worker(s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
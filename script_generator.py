@@ -1,26 +1,40 @@
-import requests
-from PIL import Image
 import base64
 import io
 
+from hf_client import InferenceClient
+from product_image import ProductImage
+from instrumentation import span
+
+DEFAULT_API_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2"
+
 class ScriptGenerator:
-    def __init__(self, hf_api_key):
+    def __init__(self, hf_api_key, api_url=None, client=None):
         self.hf_api_key = hf_api_key
-        self.api_url = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2"
+        self.api_url = api_url or DEFAULT_API_URL
         self.headers = {"Authorization": f"Bearer {hf_api_key}"}
+        # Pooled session, retries with backoff and a prompt cache; pass a
+        # configured InferenceClient to change limits or point at a stub server
+        self.client = client or InferenceClient(self.api_url, headers=self.headers)
     
-    def generate_script(self, image_path, product_name=None, tagline=None, discount=None):
-        """Generate advertisement script using Hugging Face"""
+    def generate_script(self, image_path, product_name=None, tagline=None, discount=None,
+                        report=None):
+        """Generate advertisement script using Hugging Face
+        
+        `image_path` may also be an already decoded ProductImage.
+        Pass a RenderReport as `report` to time the detection and API stages.
+        """
         
         # Analyze image to detect product type
-        product_type = self.detect_product_type(image_path)
+        with span(report, "detect_product_type"):
+            product_type = self.detect_product_type(image_path)
         
         # Build prompt
         prompt = self.build_prompt(product_type, product_name, tagline, discount)
         
         # Call Hugging Face API
         try:
-            script = self.call_hf_api(prompt)
+            with span(report, "call_hf_api"):
+                script = self.call_hf_api(prompt)
             return script
         except Exception as e:
             print(f"Error generating script: {e}")
@@ -30,16 +44,13 @@ class ScriptGenerator:
     def detect_product_type(self, image_path):
         """Simple product type detection based on image characteristics"""
         try:
-            img = Image.open(image_path)
+            product = ProductImage.load(image_path)
             
             # Basic heuristics (can be improved with actual image classification)
-            width, height = img.size
-            aspect_ratio = width / height
+            aspect_ratio = product.aspect_ratio
             
-            # Analyze dominant colors
-            img_rgb = img.convert('RGB')
-            pixels = list(img_rgb.getdata())
-            avg_color = tuple(sum(c) // len(pixels) for c in zip(*pixels))
+            # Analyze dominant colors on a thumbnail
+            avg_color = product.stats()["avg_color"]
             
             # Simple classification logic
             if aspect_ratio > 1.5:
@@ -92,21 +103,17 @@ Write ONLY the voiceover script, no other text. [/INST]"""
             }
         }
         
-        response = requests.post(self.api_url, headers=self.headers, json=payload, timeout=30)
+        result = self.client.post(payload)
         
-        if response.status_code == 200:
-            result = response.json()
-            if isinstance(result, list) and len(result) > 0:
-                script = result[0].get('generated_text', '')
-                # Clean up the script
-                script = script.strip()
-                # Remove any [INST] tags if present
-                script = script.replace('[INST]', '').replace('[/INST]', '').strip()
-                return script
-            else:
-                raise Exception("Unexpected API response format")
+        if isinstance(result, list) and len(result) > 0:
+            script = result[0].get('generated_text', '')
+            # Clean up the script
+            script = script.strip()
+            # Remove any [INST] tags if present
+            script = script.replace('[INST]', '').replace('[/INST]', '').strip()
+            return script
         else:
-            raise Exception(f"API error: {response.status_code} - {response.text}")
+            raise Exception("Unexpected API response format")
     
     def generate_fallback_script(self, product_name):
         """Generate a basic fallback script if API fails"""
@@ -0,0 +1,128 @@
+from collections import OrderedDict
+
+from PIL import Image, ImageFilter, ImageEnhance
+
+from compositor import affine
+
+
+class SpriteCache:
+    """LRU cache of resized, rotated and glowing product sprites
+
+    Sprites are premultiplied-alpha HxWx4 uint8 arrays, ready for
+    compositor.blit. Requests are quantized to `size_step` pixels and
+    `angle_step` degrees so neighbouring frames share sprites. Effects are
+    applied once at source resolution; each frame's variant is then scaled
+    and rotated in one pass from the nearest level of a halving chain
+    (mipmap) of the filtered, premultiplied source, never from the full-size
+    original.
+    """
+
+    # Glow radius in pixels at the sprite's reference display size
+    GLOW_RADIUS = 20
+    GLOW_BRIGHTNESS = 1.5
+
+    # Filtered sources kept around for deriving new sizes
+    MAX_SOURCES = 8
+
+    def __init__(self, max_bytes=128 * 1024 * 1024, size_step=4, angle_step=2):
+        self.max_bytes = max_bytes
+        self.size_step = size_step
+        self.angle_step = angle_step
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._sprites = OrderedDict()
+        # (id(source), effect, reference_size) -> (source, [mip levels, largest first])
+        self._mips = OrderedDict()
+
+    def get(self, source, size, angle=0, effect=None, reference_size=None, animated=False):
+        """Square sprite of `size` pixels, rotated by `angle` with an optional effect
+
+        effect="glow" puts a blurred, brightened copy under the sprite, so the
+        product and its glow are placed with a single blit. The blur radius
+        is GLOW_RADIUS at `reference_size` and scales with the sprite from
+        there. Unrotated sprites are resized from a mip level twice their
+        size, which matches a resize of the original; animated=True, for
+        sizes that change every few frames, takes the nearest larger level
+        instead, about three times cheaper and slightly softer.
+        """
+        size = max(self.size_step, int(round(size / self.size_step)) * self.size_step)
+        angle = int(round(angle / self.angle_step)) * self.angle_step % 360
+        reference_size = (reference_size or size) if effect else None
+        key = (id(source), size, angle, effect, reference_size, animated)
+
+        entry = self._sprites.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._sprites.move_to_end(key)
+            return entry[1]
+
+        self.misses += 1
+        levels = self._levels(source, effect, reference_size)
+        # The rotating transform samples the level directly
+        sharp = not (angle or animated)
+        sprite = affine(self._pick_level(levels, 2 * size if sharp else size), size, angle)
+
+        # Keep a reference to the source so its id cannot be reused while cached
+        self._sprites[key] = (source, sprite)
+        self._bytes += sprite.nbytes
+        self._evict()
+        return sprite
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._sprites),
+            "bytes": self._bytes,
+        }
+
+    def clear(self):
+        self._sprites.clear()
+        self._mips.clear()
+        self._bytes = 0
+
+    def _levels(self, source, effect, reference_size):
+        key = (id(source), effect, reference_size)
+        cached = self._mips.get(key)
+        if cached is not None:
+            self._mips.move_to_end(key)
+            return cached[1]
+
+        base = source
+        if effect == "glow":
+            # Blur at source resolution with the radius scaled to the display size
+            radius = self.GLOW_RADIUS * max(source.size) / reference_size
+            glow = source.filter(ImageFilter.GaussianBlur(radius=radius))
+            glow = ImageEnhance.Brightness(glow).enhance(self.GLOW_BRIGHTNESS)
+            base = Image.alpha_composite(glow, source)
+        elif effect is not None:
+            raise ValueError(f"Unknown sprite effect: {effect}")
+
+        # Mip levels are premultiplied so filtering never bleeds transparent colour in
+        levels = [base.convert("RGBa")]
+        while max(levels[-1].size) >= 128:
+            w, h = levels[-1].size
+            levels.append(levels[-1].resize((max(1, w // 2), max(1, h // 2)), Image.Resampling.BOX))
+        self._mips[key] = (source, levels)
+        while len(self._mips) > self.MAX_SOURCES:
+            self._mips.popitem(last=False)
+        return levels
+
+    @staticmethod
+    def _pick_level(levels, size):
+        # Smallest level that is still at least as large as the requested sprite
+        for level in reversed(levels):
+            if min(level.size) >= size:
+                return level
+        return levels[0]
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._sprites) > 1:
+            _, (_, sprite) = self._sprites.popitem(last=False)
+            self._bytes -= sprite.nbytes
+            self.evictions += 1
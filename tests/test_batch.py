@@ -0,0 +1,47 @@
+import json
+
+from batch import append_checkpoint, load_checkpoint, load_manifest, run_batch
+
+
+def options(tmp_path):
+    return {"hf_key": None, "offline": True, "quality": "720p", "voiceover": False,
+            "output_dir": str(tmp_path / "outputs"), "temp_dir": str(tmp_path / "temp")}
+
+
+def test_manifest_paths_are_relative_to_it(tmp_path):
+    manifest = tmp_path / "catalog.csv"
+    manifest.write_text("image_path,product_name\nmug.png,Mug\n/abs/cup.png,\n")
+    items = load_manifest(manifest)
+    assert [item["id"] for item in items] == ["1", "2"]
+    assert items[0]["image_path"] == str(tmp_path / "mug.png")
+    assert items[1]["image_path"] == "/abs/cup.png"
+    assert items[1]["product_name"] is None
+
+
+def test_checkpoint_skips_a_line_cut_short(tmp_path):
+    checkpoint = tmp_path / "catalog.checkpoint.jsonl"
+    append_checkpoint(checkpoint, {"id": "1", "status": "failed", "error": "boom"})
+    append_checkpoint(checkpoint, {"id": "1", "status": "ok", "output": "a.mp4"})
+    with open(checkpoint, "a") as f:
+        f.write('{"id": "2", "sta')
+    # The last result of an item wins
+    assert load_checkpoint(checkpoint) == {"1": {"id": "1", "status": "ok", "output": "a.mp4"}}
+
+
+def test_resume_skips_finished_items(tmp_path):
+    checkpoint = tmp_path / "catalog.checkpoint.jsonl"
+    items = [{"id": str(i), "image_path": str(tmp_path / f"missing_{i}.png"),
+              "product_name": None, "tagline": None, "discount": None} for i in range(3)]
+    for item in items[:2]:
+        append_checkpoint(checkpoint, {"id": item["id"], "status": "ok", "output": "done.mp4"})
+
+    summary = run_batch(items, options(tmp_path), checkpoint, log=lambda message: None)
+    assert (summary["total"], summary["skipped"], summary["processed"]) == (3, 2, 1)
+    assert list(summary["failed"]) == ["2"]
+    results = [json.loads(line) for line in checkpoint.read_text().splitlines()]
+    assert [(r["id"], r["status"]) for r in results] == [("0", "ok"), ("1", "ok"), ("2", "failed")]
+
+    # Failed items are retried unless asked not to
+    summary = run_batch(items, options(tmp_path), checkpoint, retry_failed=False,
+                        log=lambda message: None)
+    assert (summary["skipped"], summary["processed"]) == (3, 0)
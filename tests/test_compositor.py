@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from compositor import paste
+
+
+@pytest.mark.parametrize("x, y", [(10, 5), (-20, -8), (50, 30), (200, 5)])
+def test_paste_matches_pil_and_clips_at_the_edges(x, y):
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (40, 64, 4), dtype=np.uint8)
+    image = Image.fromarray(rng.integers(0, 256, (24, 32, 4), dtype=np.uint8), "RGBA")
+    mask = Image.fromarray(rng.integers(0, 256, (24, 32), dtype=np.uint8), "L")
+
+    expected = Image.fromarray(frame, "RGBA")
+    expected.paste(image, (x, y), mask)
+    paste(frame, image, x, y, mask)
+    assert np.array_equal(frame, np.asarray(expected))
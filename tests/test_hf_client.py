@@ -0,0 +1,145 @@
+import threading
+import time
+from email.utils import formatdate
+
+import pytest
+import requests
+
+from hf_client import InferenceClient, retry_after_seconds
+from script_generator import ScriptGenerator
+from stub_inference_server import SCRIPT, StubInferenceServer
+
+
+@pytest.fixture
+def stub():
+    with StubInferenceServer(latency=0.01) as server:
+        yield server
+
+
+def make_client(stub, **kwargs):
+    """Client of the stub whose sleeps are recorded instead of waited for"""
+    delays = []
+    kwargs.setdefault("backoff", 0.01)
+    client = InferenceClient(stub.url, sleep=delays.append, **kwargs)
+    return client, delays
+
+
+def response(status, headers=None, body=b""):
+    r = requests.Response()
+    r.status_code = status
+    r.headers.update(headers or {})
+    r._content = body
+    return r
+
+
+def test_retries_until_success(stub):
+    stub.fail_every = 2
+    stub.retry_after = 0.5
+    client, delays = make_client(stub)
+
+    assert client.post({"inputs": "a"}) == [{"generated_text": SCRIPT}]
+    assert client.post({"inputs": "b"}) == [{"generated_text": SCRIPT}]
+    # The second request failed once and was retried after the server's Retry-After
+    assert stub.stats()["requests"] == 3
+    assert client.stats()["retries"] == 1
+    assert delays == [pytest.approx(0.5)]
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_gives_up_after_max_retries(stub, status):
+    stub.fail_every = 1
+    stub.fail_status = status
+    client, delays = make_client(stub, max_retries=2)
+
+    with pytest.raises(Exception, match=f"API error: {status}"):
+        client.post({"inputs": "a"})
+    assert stub.stats()["requests"] == 3
+    assert len(delays) == 2
+
+
+def test_backoff_grows_and_is_capped(stub):
+    stub.fail_every = 1
+    stub.retry_after = 0
+    client, delays = make_client(stub, max_retries=4, backoff=1.0, max_backoff=4.0)
+
+    with pytest.raises(Exception):
+        client.post({"inputs": "a"})
+    # Jitter keeps each delay within half to all of 1, 2, 4, 4 seconds
+    for delay, nominal in zip(delays, [1.0, 2.0, 4.0, 4.0]):
+        assert nominal / 2 <= delay <= nominal
+
+
+def test_retry_after_sources():
+    assert retry_after_seconds(response(429, {"Retry-After": "7"})) == 7.0
+    date = formatdate(time.time() + 60, usegmt=True)
+    assert 55 <= retry_after_seconds(response(429, {"Retry-After": date})) <= 60
+    loading = response(503, body=b'{"error": "loading", "estimated_time": 12.5}')
+    assert retry_after_seconds(loading) == 12.5
+    # estimated_time only means something on the model-loading 503
+    assert retry_after_seconds(response(429, body=b'{"estimated_time": 12.5}')) is None
+    assert retry_after_seconds(response(503, body=b"not json")) is None
+
+
+def test_retry_after_is_capped_by_max_backoff(stub):
+    stub.fail_every = 2
+    stub.retry_after = 120
+    client, delays = make_client(stub, max_backoff=5.0)
+
+    client.post({"inputs": "a"})
+    client.post({"inputs": "b"})
+    assert delays == [5.0]
+
+
+def test_cache_hits_and_ttl_expiry(stub):
+    client, _ = make_client(stub, cache_ttl=0.2)
+
+    client.post({"inputs": "a"})
+    client.post({"inputs": "a"})
+    client.post({"inputs": "b"})
+    assert stub.stats()["requests"] == 2
+    assert client.stats()["hits"] == 1
+
+    time.sleep(0.3)
+    client.post({"inputs": "a"})
+    assert stub.stats()["requests"] == 3
+    assert client.stats()["misses"] == 3
+
+
+def test_cache_is_bounded_and_failures_are_not_cached(stub):
+    client, _ = make_client(stub, cache_size=2, max_retries=0)
+
+    for prompt in ("a", "b", "c"):
+        client.post({"inputs": prompt})
+    assert client.stats()["cached"] == 2
+    client.post({"inputs": "a"})
+    assert stub.stats()["requests"] == 4
+
+    stub.fail_every = 1
+    for _ in range(2):
+        with pytest.raises(Exception):
+            client.post({"inputs": "d"})
+    assert stub.stats()["requests"] == 6
+
+
+def test_concurrency_limit_per_url(stub):
+    stub.latency = 0.1
+    client, _ = make_client(stub, max_concurrent=2)
+    threads = [threading.Thread(target=client.post, args=({"inputs": str(i)},)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert stub.stats()["requests"] == 6
+    assert stub.stats()["max_in_flight"] == 2
+
+
+def test_script_falls_back_when_retries_are_exhausted(stub, tmp_path):
+    stub.fail_every = 1
+    client, delays = make_client(stub, max_retries=1)
+    generator = ScriptGenerator("hf_test", api_url=stub.url, client=client)
+
+    script = generator.generate_script(tmp_path / "missing.png", product_name="Widget")
+    assert script == generator.generate_fallback_script("Widget")
+    assert stub.stats()["requests"] == 2
+    assert len(delays) == 1
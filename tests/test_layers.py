@@ -0,0 +1,72 @@
+import numpy as np
+
+from frame_pool import FramePool
+from layers import Layer, LayeredScene
+
+
+class Recorder:
+    """Layer draw function that fills a band of rows and counts its calls"""
+
+    def __init__(self, row, value=None):
+        self.row = row
+        self.value = value
+        self.calls = 0
+
+    def __call__(self, frame, state):
+        self.calls += 1
+        frame[self.row, :, :3] = self.value if self.value is not None else state
+
+
+def scene(states, pool=None):
+    background = Recorder(0, 10)
+    animated = Recorder(1)
+    layers = [Layer(background, name="background"),
+              Layer(animated, state=lambda t: states[int(t * len(states))], name="animated")]
+    return LayeredScene(8, 4, 1, layers, pool=pool or FramePool(8, 4)), background, animated
+
+
+def test_unchanged_frames_are_repeated_without_drawing():
+    layered, background, animated = scene([50, 50, 50, 80])
+
+    first = layered.render(0.0)
+    assert not layered.last_repeated
+    for t in (0.25, 0.5):
+        assert layered.render(t) is first
+        assert layered.last_repeated
+    changed = layered.render(0.75)
+    assert not layered.last_repeated
+    assert changed[1, 0, 0] == 80 and changed[0, 0, 0] == 10
+
+    assert animated.calls == 2
+    assert layered.stats()["rendered"] == 2
+    assert layered.stats()["repeated"] == 2
+
+
+def test_static_base_is_baked_once():
+    layered, background, animated = scene(list(range(20, 40)))
+    frames = [layered.render(n / 20).copy() for n in range(20)]
+
+    assert background.calls == 1
+    assert animated.calls == 20
+    assert layered.stats()["base_builds"] == 1
+    assert all(frame[0, 0, 0] == 10 and frame[1, 0, 0] == 20 + n for n, frame in enumerate(frames))
+
+
+def test_hidden_layer_is_not_drawn():
+    layered, _, animated = scene([None, 60])
+    assert np.all(layered.render(0.0)[1] == 0)
+    assert animated.calls == 0
+
+
+def test_repeat_needs_the_buffer_to_be_unchanged():
+    pool = FramePool(8, 4, size=2)
+    layered, _, animated = scene([50, 50], pool)
+
+    layered.render(0.0)
+    # Another scene on the same pool comes round to the last frame's buffer
+    pool.acquire()
+    pool.acquire()[2].fill(90)
+    frame = layered.render(0.5)
+    assert not layered.last_repeated
+    assert frame[1, 0, 0] == 50
+    assert animated.calls == 2
@@ -0,0 +1,123 @@
+import json
+import multiprocessing
+import os
+import time
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from output_store import FileServer, OutputStore, fcntl, parse_range
+
+
+def write(path, size):
+    path.write_bytes(bytes(range(256)) * (size // 256) + bytes(size % 256))
+    return path
+
+
+def test_evicts_least_recently_accessed_over_quota(tmp_path):
+    store = OutputStore(tmp_path / "store", max_bytes=3000, max_age=None)
+    for name in ("a", "b", "c"):
+        store.add(write(tmp_path / f"{name}.mp4", 1000))
+    # a was added first but viewed since, so b is the least recently accessed
+    assert store.lookup("a.mp4") is not None
+
+    store.add(write(tmp_path / "d.mp4", 1000))
+    names = {entry["name"] for entry in store.artifacts()}
+    assert names == {"a.mp4", "c.mp4", "d.mp4"}
+    assert not (tmp_path / "store" / "b.mp4").exists()
+    assert store.stats()["evictions"] == 1
+
+
+def test_evicts_expired_but_never_the_new_artifact(tmp_path):
+    store = OutputStore(tmp_path / "store", max_bytes=500, max_age=60)
+    store.add(write(tmp_path / "old.mp4", 100))
+    index = json.loads((tmp_path / "store" / "index.json").read_text())
+    index["artifacts"]["old.mp4"]["accessed"] -= 120
+    (tmp_path / "store" / "index.json").write_text(json.dumps(index))
+
+    # Over quota on its own, but just added
+    path = store.add(write(tmp_path / "big.mp4", 1000))
+    assert [entry["name"] for entry in store.artifacts()] == ["big.mp4"]
+    assert os.path.exists(path)
+
+
+def test_adopts_settled_unindexed_files(tmp_path):
+    store = OutputStore(tmp_path, max_bytes=None, max_age=None, grace=60)
+    settled = write(tmp_path / "settled.mp4", 100)
+    os.utime(settled, (time.time() - 120,) * 2)
+    write(tmp_path / "rendering.mp4", 100)
+
+    store.evict()
+    assert [entry["name"] for entry in store.artifacts()] == ["settled.mp4"]
+
+
+def add_from_other_process(root, path):
+    OutputStore(root).add(path)
+
+
+@pytest.mark.skipif(fcntl is None, reason="index is only locked between threads")
+def test_index_is_locked_across_processes(tmp_path):
+    store = OutputStore(tmp_path / "store")
+    store.add(write(tmp_path / "mine.mp4", 100))
+    theirs = write(tmp_path / "theirs.mp4", 100)
+
+    with open(tmp_path / "store" / "index.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        process = multiprocessing.Process(target=add_from_other_process,
+                                          args=(tmp_path / "store", theirs))
+        process.start()
+        process.join(0.5)
+        # Blocked on the index lock, not lost as a concurrent write
+        assert process.is_alive()
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    process.join(10)
+    assert process.exitcode == 0
+    assert {entry["name"] for entry in store.artifacts()} == {"mine.mp4", "theirs.mp4"}
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=-", None),
+    ("items=0-1", None),
+    ("bytes=0-1,5-6", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=500-100"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+def test_file_server_ranges(tmp_path):
+    store = OutputStore(tmp_path)
+    data = write(tmp_path / "video.mp4", 1000).read_bytes()
+    store.add(tmp_path / "video.mp4")
+
+    with FileServer(store) as server:
+        url = server.url_for("video.mp4")
+        with urlopen(Request(url, headers={"Range": "bytes=100-199"})) as response:
+            assert response.status == 206
+            assert response.headers["Content-Range"] == "bytes 100-199/1000"
+            assert response.read() == data[100:200]
+        with urlopen(url) as response:
+            assert response.status == 200
+            assert response.headers["Accept-Ranges"] == "bytes"
+            assert response.read() == data
+
+        with pytest.raises(HTTPError) as error:
+            urlopen(Request(url, headers={"Range": "bytes=2000-"}))
+        assert error.value.code == 416
+        assert error.value.headers["Content-Range"] == "bytes */1000"
+        with pytest.raises(HTTPError) as error:
+            urlopen(server.url_for("index.json"))
+        assert error.value.code == 404
@@ -0,0 +1,122 @@
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from compositor import blit_mask, fade_table, paste
+
+DEFAULT_FONT = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+
+
+class TextSprite:
+    """A rasterized string: glyph coverage mask plus its offset from the text origin"""
+
+    def __init__(self, mask, offset, box_size, color):
+        self.mask = mask                    # PIL "L" image, full-opacity coverage
+        self.coverage = np.asarray(mask)    # read-only view for HxWx3 frames
+        self.offset = offset                # (dx, dy) of the ink from the draw origin
+        self.box_size = box_size            # (width, height) used for centering
+        self.color = color
+        self._fills = {}
+
+    def fill(self, mode="RGB"):
+        """Solid image of the text colour in the destination's mode, so paste never converts"""
+        fill = self._fills.get(mode)
+        if fill is None:
+            fill = self._fills[mode] = Image.new(mode, self.mask.size, tuple(self.color) + (255,))
+        return fill
+
+
+class TextRenderer:
+    """Font cache and pre-rasterized text sprites for add_text
+
+    Sprites are keyed by (text, font, size, color) and rasterized once; alpha
+    fades scale the cached coverage mask instead of redrawing the glyphs.
+    Animated sizes are snapped to multiples of `size_step` so pop-in effects
+    only ever touch a bounded set of sprites.
+    """
+
+    def __init__(self, font_path=DEFAULT_FONT, max_sprites=512, size_step=2):
+        self.font_path = font_path
+        self.max_sprites = max_sprites
+        self.size_step = size_step
+        self.hits = 0
+        self.misses = 0
+        self._fonts = {}
+        self._sprites = OrderedDict()
+
+    def font(self, size):
+        font = self._fonts.get(size)
+        if font is None:
+            try:
+                font = ImageFont.truetype(self.font_path, size)
+            except Exception:
+                font = ImageFont.load_default()
+            self._fonts[size] = font
+        return font
+
+    def quantize_size(self, size):
+        return int(round(size / self.size_step)) * self.size_step
+
+    def sprite(self, text, size, color=(255, 255, 255)):
+        key = (text, self.font_path, size, tuple(color))
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self.hits += 1
+            self._sprites.move_to_end(key)
+            return sprite
+
+        self.misses += 1
+        sprite = self._rasterize(text, size, tuple(color))
+        self._sprites[key] = sprite
+        while len(self._sprites) > self.max_sprites:
+            self._sprites.popitem(last=False)
+        return sprite
+
+    def draw(self, img, text, x, y, size=50, color=(255, 255, 255), alpha=255, quantize=False):
+        """Draw `text` centered on (x, y) into a frame array or an RGB PIL image
+
+        Frames (HxWx3 or HxWx4 uint8 arrays) are composited in place through
+        the cached coverage mask with `alpha` as its opacity. HxWx4 frames are
+        drawn by PIL, like PIL images, on a copy of the covered region.
+        """
+        if quantize:
+            size = self.quantize_size(size)
+        if size <= 0 or alpha <= 0 or not text:
+            return
+
+        sprite = self.sprite(text, size, color)
+        box_w, box_h = sprite.box_size
+        left = x - box_w // 2 + sprite.offset[0]
+        top = y - box_h // 2 + sprite.offset[1]
+
+        if isinstance(img, np.ndarray) and img.shape[2] != 4:
+            blit_mask(img, sprite.coverage, color, left, top, alpha)
+            return
+
+        mask = sprite.mask
+        if alpha < 255:
+            mask = mask.point(fade_table(alpha))
+        if isinstance(img, np.ndarray):
+            paste(img, sprite.fill("RGBA"), left, top, mask)
+        else:
+            img.paste(sprite.fill(img.mode), (left, top), mask)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "sprites": len(self._sprites),
+            "fonts": len(self._fonts),
+        }
+
+    def _rasterize(self, text, size, color):
+        font = self.font(size)
+        probe = ImageDraw.Draw(Image.new("L", (1, 1)))
+        left, top, right, bottom = probe.textbbox((0, 0), text, font=font)
+
+        mask = Image.new("L", (max(1, right - left), max(1, bottom - top)), 0)
+        ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=255)
+        return TextSprite(mask, (left, top), (right - left, bottom - top), color)
@@ -1,139 +1,732 @@
-from moviepy.editor import *
-from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance
+from PIL import Image
 import numpy as np
-from gtts import gTTS
 import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
 from pathlib import Path
-import requests
-import io
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from audio_track import build_soundtrack
+from backgrounds import BackgroundCache
+from compositor import blit
+from encoding import DRAFT_PROFILE, get_profile
+from frame_pool import PIX_FMT, FramePool
+from instrumentation import RenderReport, span
+from layers import Layer, LayeredScene
+from output_store import OutputStore
+from product_image import ProductImage
+from ffmpeg_writer import FFmpegPipeWriter, MultiOutputWriter
+from parallel_render import (concat_segments, encode_segment, plan_segments, render_jobs,
+                             render_parallel, segment_job)
+from render_cache import RenderCache
+from sprite_cache import SpriteCache
+from text_renderer import TextRenderer
+from voiceover import GTTSBackend, VoiceoverCache
+
+# Scene order and length in seconds
+SCENES = [
+    ("hook", 5),
+    ("benefits", 10),
+    ("social_proof", 5),
+    ("urgency", 5),
+    ("closing", 5),
+]
+SCENE_DURATIONS = dict(SCENES)
+
+# Text inputs each scene draws; segment cache keys include only these
+SCENE_INPUTS = {
+    "hook": ("product_name",),
+    "benefits": (),
+    "social_proof": (),
+    "urgency": ("discount_text",),
+    "closing": ("product_name",),
+}
+
+# Output size of each aspect ratio at 1080p; 720p is two thirds of it
+ASPECTS = {
+    "9:16": (1080, 1920),
+    "1:1": (1080, 1080),
+    "16:9": (1920, 1080),
+}
+QUALITIES = {"1080p": 1.0, "720p": 2 / 3}
+
+# Draft previews: a third of the resolution, half the frame rate, fastest encoding profile
+DRAFT_SCALE = 1 / 3
+DRAFT_FPS = 15
+
+# Bump whenever a change alters rendered output, so cached videos are not reused
+RENDERER_VERSION = "5"
+
+
+def output_size(aspect="9:16", quality="1080p"):
+    """(width, height) of an output; unknown qualities fall back to 720p"""
+    width, height = ASPECTS[aspect]
+    scale = QUALITIES.get(quality, QUALITIES["720p"])
+    return int(width * scale) // 2 * 2, int(height * scale) // 2 * 2
 
 class VideoGenerator:
-    def __init__(self, hf_api_key, pexels_api_key=None):
+    def __init__(self, hf_api_key, pexels_api_key=None, output_dir="outputs", temp_dir="temp",
+                 tts_backend=None, overlap_voiceover=True, output_max_bytes=5 * 1024 ** 3,
+                 output_max_age=3 * 24 * 3600, music_path=None):
         self.hf_api_key = hf_api_key
         self.pexels_api_key = pexels_api_key
-        self.output_dir = Path("outputs")
-        self.output_dir.mkdir(exist_ok=True)
-        self.temp_dir = Path("temp")
-        self.temp_dir.mkdir(exist_ok=True)
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.temp_dir = Path(temp_dir)
+        self.temp_dir.mkdir(parents=True, exist_ok=True)
+        self.backgrounds = BackgroundCache()
+        self.sprites = SpriteCache()
+        self.text = TextRenderer()
+        self._scenes = OrderedDict()
+        self._frame_pools = OrderedDict()
+        # Finished videos; old ones are evicted beyond the quota or age limit
+        self.outputs = OutputStore(self.output_dir, max_bytes=output_max_bytes,
+                                   max_age=output_max_age)
+        self.render_cache = RenderCache(self.output_dir / "cache")
+        self.segment_cache = RenderCache(self.output_dir / "cache" / "segments",
+                                         max_bytes=1024 ** 3)
+        # Voiceovers are cached per (script, language, voice) and, with
+        # overlap_voiceover, synthesized while the scenes render
+        self.tts = tts_backend or GTTSBackend()
+        self.voiceovers = VoiceoverCache(self.temp_dir / "voiceovers")
+        self.overlap_voiceover = overlap_voiceover
+        # include_music loops this file under the voice, or synthesizes a bed
+        self.music_path = music_path
+        self._tts_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+        # Timing report of the run in progress, and of the last finished one
+        self.report = None
+        self.last_report = None
+        # Renders share the caches, frame pools and self.report, so they take turns
+        self._render_lock = threading.Lock()
         
     def create_ad_video(self, image_path, script, duration=30, quality="1080p",
                        include_voiceover=True, include_music=False,
-                       product_name=None, discount_text=None):
-        """Main function to create advertisement video"""
+                       product_name=None, discount_text=None, streaming=True,
+                       encoder="moviepy", workers=1, chunk_frames=None, use_cache=True,
+                       draft=False, report=None, profile=False, return_report=False,
+                       aspect="9:16", encoding=None):
+        """Main function to create advertisement video
+        
+        `image_path` is a path or a ProductImage that was already decoded
+        (e.g. by the script generator); either way it is decoded only once.
+        
+        With streaming=True (default) every scene renders its frames on demand
+        while the video is being encoded, so memory stays flat regardless of
+        duration. streaming=False renders each scene into memory first.
+        
+        encoder="ffmpeg" pipes rendered frames straight into an ffmpeg
+        subprocess instead of going through moviepy's compositing.
+        
+        workers > 1 renders scenes in a process pool (always via ffmpeg), each
+        scene - or each chunk of `chunk_frames` frames - into its own segment,
+        and joins the segments with a stream copy.
+        
+        With use_cache=True a request identical to an earlier one (same image
+        bytes, script, settings and RENDERER_VERSION) returns the cached MP4.
+        Otherwise the ffmpeg and parallel backends reuse every cached scene
+        segment whose own inputs are unchanged and render only the rest.
+        
+        The returned path is an artifact of `self.outputs`, which deletes
+        videos older than output_max_age or beyond output_max_bytes.
+        
+        draft=True renders a quick layout preview: a third of the resolution,
+        half the frame rate and the "draft" encoding profile, always through
+        the ffmpeg backend. Render again with draft=False for the final video.
+        
+        encoding is an encoding.EncodingProfile or the name of one in
+        encoding.PROFILES ("standard" by default): x264 preset, CRF or
+        bitrate, GOP, tune and threads. "social" aims just under an 8 MB
+        upload cap; encoding.target_size() makes other budgets.
+        
+        aspect picks one of ASPECTS; the layout adapts to it. Use
+        create_ad_videos() to get several aspects and qualities in one call.
+        
+        Every run records stage timings and per-frame render times in a
+        RenderReport (pass `report` to add to an existing one, e.g. with the
+        script generation spans). profile=True also captures cProfile data.
+        return_report=True returns (output_path, report dict) instead of
+        just the path; the report object is kept as `self.last_report`.
+        
+        A generator can be shared between threads (the app keeps one for
+        every session); renders on it run one at a time.
+        """
+        
+        if encoder not in ("moviepy", "ffmpeg"):
+            raise ValueError(f"Unknown encoder: {encoder}")
+        encoding = get_profile(encoding or (DRAFT_PROFILE if draft else None))
+        
+        report = report if report is not None else RenderReport(profile=profile)
+        with self._render_lock:
+            self.report = self.last_report = report
+            
+            try:
+                report.start_profile()
+                with report.span("load_image"):
+                    product = ProductImage.load(image_path)
+                
+                # Identical requests return the video rendered last time
+                cache_key = None
+                cached_path = None
+                if use_cache:
+                    with report.span("render_cache_lookup"):
+                        cache_key = RenderCache.make_key(
+                            product, script=script, duration=duration, quality=quality,
+                            include_voiceover=include_voiceover, include_music=include_music,
+                            music=self._music_key(include_music),
+                            product_name=product_name, discount_text=discount_text,
+                            draft=draft, aspect=aspect, encoding=encoding.key(),
+                            renderer_version=RENDERER_VERSION,
+                            voice=self._voice_key(include_voiceover))
+                        cached_path = self.render_cache.get(cache_key)
+                
+                if cached_path:
+                    report.count("render_cache_hits")
+                    # Link it into the store so cache eviction never pulls it from a viewer
+                    output_path = self.outputs.add(cached_path, name=f"ad_video_{cache_key[:16]}.mp4",
+                                                   aspect=aspect, quality=quality, draft=draft,
+                                                   encoding=encoding.name)
+                else:
+                    pools = self.frame_pool_stats()
+                    with report.span("render_video"):
+                        output_path = self.render_video(product, script, quality, include_voiceover,
+                                                        product_name, discount_text, streaming,
+                                                        encoder, workers, chunk_frames, draft,
+                                                        use_segment_cache=use_cache, aspect=aspect,
+                                                        include_music=include_music, encoding=encoding)
+                    self._count_frame_buffers(pools)
+                    if cache_key:
+                        with report.span("render_cache_store"):
+                            self.render_cache.put(cache_key, output_path)
+                    output_path = self.outputs.add(output_path, aspect=aspect, quality=quality,
+                                                   draft=draft, encoding=encoding.name)
+            finally:
+                report.stop_profile()
+                self.report = None
+        
+        if return_report:
+            return output_path, report.to_dict()
+        return output_path
+    
+    def create_ad_videos(self, image_path, script, outputs=None, include_voiceover=True,
+                         product_name=None, discount_text=None, use_cache=True,
+                         report=None, profile=False, return_report=False, include_music=False,
+                         encoding=None):
+        """Several (aspect, quality) variants, each aspect rendered once for all its qualities
+        
+        outputs is a list of (aspect, quality) pairs, by default every
+        combination of ASPECTS and QUALITIES. Returns {(aspect, quality): path},
+        or (that dict, report dict) with return_report=True. Variants found in
+        the render cache are not rendered again. Every variant is encoded with
+        the `encoding` profile (see create_ad_video).
+        """
+        outputs = list(outputs or [(aspect, quality) for aspect in ASPECTS for quality in QUALITIES])
+        encoding = get_profile(encoding)
+        report = report if report is not None else RenderReport(profile=profile)
+        with self._render_lock:
+            self.report = self.last_report = report
+            
+            try:
+                report.start_profile()
+                with report.span("load_image"):
+                    product = ProductImage.load(image_path)
+                
+                paths = {}
+                keys = {}
+                if use_cache:
+                    with report.span("render_cache_lookup"):
+                        for aspect, quality in outputs:
+                            keys[aspect, quality] = RenderCache.make_key(
+                                product, script=script, quality=quality, aspect=aspect,
+                                layout="per_aspect", include_voiceover=include_voiceover,
+                                include_music=include_music, music=self._music_key(include_music),
+                                product_name=product_name, discount_text=discount_text,
+                                encoding=encoding.key(), renderer_version=RENDERER_VERSION,
+                                voice=self._voice_key(include_voiceover))
+                            paths[aspect, quality] = self.render_cache.get(keys[aspect, quality])
+                
+                missing = [variant for variant in outputs if not paths.get(variant)]
+                report.count("render_cache_hits", len(outputs) - len(missing))
+                if missing:
+                    pools = self.frame_pool_stats()
+                    with report.span("render_video"):
+                        paths.update(self.render_multi(product, script, missing, include_voiceover,
+                                                       product_name, discount_text, include_music,
+                                                       encoding))
+                    self._count_frame_buffers(pools)
+                    if keys:
+                        with report.span("render_cache_store"):
+                            for variant in missing:
+                                self.render_cache.put(keys[variant], paths[variant])
+                for (aspect, quality), path in paths.items():
+                    # Cache hits are linked in under a name derived from their key
+                    name = None
+                    if (aspect, quality) not in missing:
+                        key = keys[aspect, quality]
+                        name = f"ad_{aspect.replace(':', 'x')}_{quality}_{key[:16]}.mp4"
+                    paths[aspect, quality] = self.outputs.add(path, name=name, aspect=aspect,
+                                                              quality=quality, encoding=encoding.name)
+            finally:
+                report.stop_profile()
+                self.report = None
+        
+        if return_report:
+            return paths, report.to_dict()
+        return paths
+    
+    def render_multi(self, image_path, script, outputs, include_voiceover=True,
+                     product_name=None, discount_text=None, include_music=False, encoding=None):
+        """Render one master per aspect and encode each of its qualities from it
+        
+        The master of an aspect has the size of its largest requested
+        quality and the same layout create_ad_video gives that size, so a
+        1080p variant matches the single render; smaller qualities are scaled
+        from it. A single ffmpeg process per aspect encodes all its qualities.
+        """
+        fps = 30
+        by_aspect = {}
+        for aspect, quality in outputs:
+            by_aspect.setdefault(aspect, []).append(quality)
+        
+        with span(self.report, "decode_image"):
+            product = ProductImage.load(image_path)
+            product_img = product.rgba
+        
+        duration = sum(SCENE_DURATIONS.values())
+        soundtrack = self.start_soundtrack(script, include_voiceover, include_music, duration)
+        audio, pending_audio = self._split_audio(soundtrack)
+        encoding = get_profile(encoding).resolve(duration)
+        
+        stamp = uuid.uuid4().hex
+        output_paths = {}
+        video_paths = []
+        for aspect, qualities in by_aspect.items():
+            sizes = {quality: output_size(aspect, quality) for quality in qualities}
+            width, height = max(sizes.values())
+            targets = []
+            for quality, size in sizes.items():
+                path = self.output_dir / f"ad_{aspect.replace(':', 'x')}_{quality}_{stamp}.mp4"
+                output_paths[aspect, quality] = path
+                video_paths.append(path if pending_audio is None else self._video_only_path(path))
+                targets.append((video_paths[-1], (width, height, 0, 0), size))
+            
+            with MultiOutputWriter(targets, width, height, fps, audio=audio, duration=duration,
+                                   profile=encoding, pix_fmt=PIX_FMT) as writer:
+                for scene, _ in SCENES:
+                    with span(self.report, f"scene:{scene}"):
+                        for frame, repeated in self.iter_scene_frames(scene, product_img, width,
+                                                                      height, fps, product_name,
+                                                                      discount_text):
+                            writer.write_frame(frame, repeat=repeated)
+        
+        if pending_audio is not None:
+            self._mux_audio(pending_audio, video_paths, list(output_paths.values()), duration,
+                            encoding)
+        return {variant: str(path) for variant, path in output_paths.items()}
+    
+    def render_video(self, image_path, script, quality="1080p", include_voiceover=True,
+                     product_name=None, discount_text=None, streaming=True,
+                     encoder="moviepy", workers=1, chunk_frames=None, draft=False,
+                     use_segment_cache=False, aspect="9:16", include_music=False, encoding=None):
+        """Render and encode a new video, bypassing the render cache"""
         
         # Set resolution
-        width, height = (1080, 1920) if quality == "1080p" else (720, 1280)
+        width, height = output_size(aspect, quality)
         fps = 30
+        encoding = get_profile(encoding or (DRAFT_PROFILE if draft else None))
+        text_scale = 1.0
+        prefix = "ad_video"
+        
+        if draft:
+            # Same layout, scaled down; x264 needs even dimensions
+            text_scale = DRAFT_SCALE
+            width = int(width * DRAFT_SCALE) // 2 * 2
+            height = int(height * DRAFT_SCALE) // 2 * 2
+            fps = DRAFT_FPS
+            encoder = "ffmpeg"
+            prefix = "ad_draft"
+        
+        # Load product image (a no-op when create_ad_video already decoded it)
+        with span(self.report, "decode_image"):
+            product = ProductImage.load(image_path)
+            product_img = product.rgba
+        
+        # Start TTS and the audio mix now; each path waits only when it needs the audio
+        duration = sum(SCENE_DURATIONS.values())
+        soundtrack = self.start_soundtrack(script, include_voiceover, include_music, duration)
+        # A target size becomes one bitrate for the whole video, however it is split up
+        encoding = encoding.resolve(duration)
+        
+        # Unique across processes: render service workers and batch runs share outputs/
+        output_path = self.output_dir / f"{prefix}_{uuid.uuid4().hex}.mp4"
         
-        # Load product image
-        product_img = Image.open(image_path).convert("RGBA")
+        if use_segment_cache and (encoder == "ffmpeg" or (workers and workers > 1)):
+            return self.render_cached_segments(product, output_path, width, height, fps,
+                                               soundtrack, product_name, discount_text,
+                                               encoding=encoding, text_scale=text_scale,
+                                               workers=workers, chunk_frames=chunk_frames)
+        
+        if workers and workers > 1:
+            # Workers decode the image themselves and need it on disk
+            if product.path is None:
+                product.save(self.temp_dir / product.name)
+            return render_parallel(product.path, output_path, SCENES, width, height, fps,
+                                   workers=workers, chunk_frames=chunk_frames,
+                                   audio=soundtrack, product_name=product_name,
+                                   discount_text=discount_text, temp_dir=self.temp_dir,
+                                   profile=encoding, text_scale=text_scale, report=self.report,
+                                   output_dir=self.output_dir)
+        
+        if encoder == "ffmpeg":
+            self.write_with_ffmpeg(output_path, product_img, width, height, fps,
+                                   soundtrack, product_name, discount_text,
+                                   encoding=encoding, text_scale=text_scale)
+            return str(output_path)
         
         # Create video clips
         clips = []
         
         # Scene 1: Hook & Reveal (0-5s)
-        clips.append(self.create_hook_scene(product_img, width, height, fps, product_name))
+        clips.append(self.create_hook_scene(product_img, width, height, fps, product_name, streaming))
         
         # Scene 2: Benefits Explosion (5-15s)
-        clips.append(self.create_benefits_scene(product_img, width, height, fps))
+        clips.append(self.create_benefits_scene(product_img, width, height, fps, streaming))
         
         # Scene 3: Social Proof (15-20s)
-        clips.append(self.create_social_proof_scene(product_img, width, height, fps))
+        clips.append(self.create_social_proof_scene(product_img, width, height, fps, streaming))
         
         # Scene 4: Urgency & CTA (20-25s)
-        clips.append(self.create_urgency_scene(product_img, width, height, fps, discount_text))
+        clips.append(self.create_urgency_scene(product_img, width, height, fps, discount_text, streaming))
         
         # Scene 5: Epic Close (25-30s)
-        clips.append(self.create_closing_scene(product_img, width, height, fps, product_name))
+        clips.append(self.create_closing_scene(product_img, width, height, fps, product_name, streaming))
         
         # Concatenate all scenes
+        from moviepy.video.compositing.concatenate import concatenate_videoclips
         final_video = concatenate_videoclips(clips, method="compose")
         
-        # Add voiceover if requested
-        if include_voiceover:
-            audio_path = self.generate_voiceover(script)
-            if audio_path and os.path.exists(audio_path):
-                audio = AudioFileClip(audio_path)
-                # Trim or loop audio to match video duration
-                if audio.duration < final_video.duration:
-                    audio = audio.set_duration(final_video.duration)
-                else:
-                    audio = audio.subclip(0, final_video.duration)
-                final_video = final_video.set_audio(audio)
-        
-        # Export video
-        output_path = self.output_dir / f"ad_video_{int(os.times().elapsed * 1000)}.mp4"
-        final_video.write_videofile(
-            str(output_path),
-            fps=fps,
-            codec='libx264',
-            audio_codec='aac',
-            temp_audiofile=str(self.temp_dir / 'temp-audio.m4a'),
-            remove_temp=True,
-            preset='medium'
-        )
+        # Export the video alone; the in-memory soundtrack is piped in afterwards,
+        # so no audio file is written or shared between renders
+        video_path = self._video_only_path(output_path)
+        with span(self.report, "write_videofile"):
+            final_video.write_videofile(
+                str(video_path),
+                fps=fps,
+                codec='libx264',
+                audio=False,
+                preset=encoding.preset,
+                threads=encoding.threads,
+                ffmpeg_params=encoding.x264_args()
+            )
         
+        self._mux_audio(soundtrack, [video_path], [output_path], duration, encoding)
         return str(output_path)
     
-    def create_hook_scene(self, product_img, width, height, fps, product_name):
+    def write_with_ffmpeg(self, output_path, product_img, width, height, fps,
+                          audio=None, product_name=None, discount_text=None,
+                          encoding=None, text_scale=1.0):
+        """Render every scene in order and pipe the frames into ffmpeg
+        
+        audio may be a Future from start_soundtrack(). If it is still
+        running when rendering starts, the video is encoded on its own and
+        the audio muxed in afterwards with a stream copy of the video.
+        """
+        audio, pending_audio = self._split_audio(audio)
+        duration = sum(SCENE_DURATIONS.values())
+        video_path = output_path if pending_audio is None else self._video_only_path(output_path)
+        
+        with FFmpegPipeWriter(video_path, width, height, fps, audio=audio, duration=duration,
+                              profile=encoding, pix_fmt=PIX_FMT) as writer:
+            for scene, _ in SCENES:
+                with span(self.report, f"scene:{scene}"):
+                    for frame, repeated in self.iter_scene_frames(scene, product_img, width, height,
+                                                                  fps, product_name, discount_text,
+                                                                  text_scale):
+                        writer.write_frame(frame, repeat=repeated)
+        
+        if pending_audio is not None:
+            self._mux_audio(pending_audio, [video_path], [output_path], duration, encoding)
+        
+        return str(output_path)
+    
+    @staticmethod
+    def _split_audio(audio):
+        """(soundtrack ready to use or None, soundtrack Future still running or None)"""
+        if isinstance(audio, Future):
+            if not audio.done():
+                return None, audio
+            audio = audio.result()
+        return audio, None
+    
+    def _video_only_path(self, output_path):
+        """Where the video stream waits for its audio: next to the other scratch files"""
+        return self.temp_dir / f"{Path(output_path).stem}.video.mp4"
+    
+    def _mux_audio(self, audio, video_paths, output_paths, duration, encoding=None):
+        """Wait for the soundtrack, then stream-copy each video-only file into its output"""
+        if isinstance(audio, Future):
+            with span(self.report, "wait_voiceover"):
+                audio = audio.result()
+        with span(self.report, "mux_voiceover"):
+            for video_path, output_path in zip(video_paths, output_paths):
+                concat_segments([video_path], output_path, audio=audio, duration=duration,
+                                profile=encoding, temp_dir=self.temp_dir)
+                Path(video_path).unlink(missing_ok=True)
+    
+    def render_cached_segments(self, product, output_path, width, height, fps, audio=None,
+                               product_name=None, discount_text=None, encoding=None,
+                               text_scale=1.0, workers=1, chunk_frames=None):
+        """Assemble the video from encoded scene segments, rendering only uncached ones
+        
+        A segment's key covers the image, its frame range, the output
+        settings and just the text its scene shows (SCENE_INPUTS), so editing
+        the discount re-renders the urgency scene alone. Segments are joined
+        with a stream copy; audio may be a soundtrack Future. A target-size
+        `encoding` must already be resolved for the whole video.
+        """
+        encoding = get_profile(encoding)
+        texts = {"product_name": product_name, "discount_text": discount_text}
+        segment_dir = Path(tempfile.mkdtemp(prefix="segments_", dir=self.temp_dir))
+        keys = []
+        paths = {}
+        jobs = []
+        
+        try:
+            for index, (scene, start, end) in enumerate(plan_segments(SCENES, fps, chunk_frames)):
+                key = RenderCache.make_key(
+                    product, scene=scene, start=start, end=end, width=width, height=height,
+                    fps=fps, encoding=encoding.key(), text_scale=text_scale,
+                    renderer_version=RENDERER_VERSION,
+                    **{name: texts[name] for name in SCENE_INPUTS[scene]})
+                keys.append(key)
+                paths[key] = self.segment_cache.get(key)
+                if paths[key]:
+                    self._count("segment_cache_hits")
+                    continue
+                self._count("segment_cache_misses")
+                jobs.append((key, segment_job(product.path, scene, start, end, width, height, fps,
+                                              segment_dir / f"{index:04d}_{scene}.mp4",
+                                              product_name, discount_text, encoding, text_scale,
+                                              self.output_dir, self.temp_dir)))
+            
+            if jobs and workers and workers > 1:
+                # Workers decode the image themselves and need it on disk
+                if product.path is None:
+                    product.save(self.temp_dir / product.name)
+                for _, job in jobs:
+                    job["image_path"] = product.path
+                render_jobs([job for _, job in jobs], workers, self.report)
+            else:
+                for _, job in jobs:
+                    with span(self.report, f"scene:{job['scene']}"):
+                        result = encode_segment(self, product.rgba, job)
+                    if self.report is not None:
+                        self.report.record_frames(job["scene"], result["frame_seconds"],
+                                                  result["repeated"])
+            
+            for key, job in jobs:
+                paths[key] = self.segment_cache.put(key, job["segment_path"])
+            
+            if isinstance(audio, Future):
+                with span(self.report, "wait_voiceover"):
+                    audio = audio.result()
+            
+            with span(self.report, "concat_segments"):
+                return concat_segments([paths[key] for key in keys], output_path, audio=audio,
+                                       duration=sum(SCENE_DURATIONS.values()), profile=encoding,
+                                       temp_dir=segment_dir)
+        finally:
+            shutil.rmtree(segment_dir, ignore_errors=True)
+    
+    def _count(self, name, value=1):
+        if self.report is not None:
+            self.report.count(name, value)
+    
+    def _count_frame_buffers(self, before):
+        """Add frame pool allocations and reuses since `before` to the report"""
+        after = self.frame_pool_stats()
+        self._count("frame_buffers_allocated", after["allocations"] - before["allocations"])
+        self._count("frame_buffers_reused", after["reused"] - before["reused"])
+    
+    def render_frame(self, scene, product_img, width, height, t,
+                     product_name=None, discount_text=None, text_scale=1.0):
+        """Render one frame of the named scene at progress t (0-1)"""
+        return self.build_scene(scene, product_img, width, height,
+                                product_name, discount_text, text_scale).render_rgb(t)
+    
+    def frame_pool(self, width, height):
+        """Frame buffers shared by every scene rendered at this size"""
+        pool = self._frame_pools.get((width, height))
+        if pool is None:
+            pool = self._frame_pools[width, height] = FramePool(width, height)
+            while len(self._frame_pools) > 4:
+                self._frame_pools.popitem(last=False)
+        self._frame_pools.move_to_end((width, height))
+        return pool
+    
+    def frame_pool_stats(self):
+        """Allocation counters of the frame pools, summed over sizes"""
+        totals = {"buffers": 0, "allocations": 0, "acquired": 0, "reused": 0}
+        for pool in self._frame_pools.values():
+            for name, value in pool.stats().items():
+                totals[name] += value
+        return totals
+    
+    def build_scene(self, scene, product_img, width, height, product_name=None, discount_text=None,
+                    text_scale=1.0):
+        """Layered model of one scene, reused while its inputs stay the same
+        
+        text_scale shrinks or grows text sizes and spacing, e.g. for draft
+        renders at a fraction of the full resolution.
+        """
+        key = (scene, id(product_img), width, height, product_name, discount_text, text_scale)
+        cached = self._scenes.get(key)
+        if cached is not None:
+            self._scenes.move_to_end(key)
+            return cached[1]
+        
+        if scene == "hook":
+            layered = self.build_hook_scene(product_img, width, height, product_name, text_scale)
+        elif scene == "benefits":
+            layered = self.build_benefits_scene(product_img, width, height, text_scale)
+        elif scene == "social_proof":
+            layered = self.build_social_proof_scene(product_img, width, height, text_scale)
+        elif scene == "urgency":
+            layered = self.build_urgency_scene(product_img, width, height, discount_text, text_scale)
+        elif scene == "closing":
+            layered = self.build_closing_scene(product_img, width, height, product_name, text_scale)
+        else:
+            raise ValueError(f"Unknown scene: {scene}")
+        
+        # Keep the product image alive so its id stays unique while cached
+        self._scenes[key] = (product_img, layered)
+        while len(self._scenes) > len(SCENES) * 2:
+            self._scenes.popitem(last=False)
+        return layered
+    
+    def iter_scene_frames(self, scene, product_img, width, height, fps,
+                          product_name=None, discount_text=None, text_scale=1.0):
+        """Lazily yield (frame, repeated) for one scene in order
+        
+        repeated is True when the frame is identical to the previous one and
+        was not re-rendered.
+        """
+        layered = self.build_scene(scene, product_img, width, height, product_name, discount_text,
+                                   text_scale)
+        total = SCENE_DURATIONS[scene] * fps
+        for frame_num in range(total):
+            start = time.perf_counter()
+            frame = layered.render(frame_num / total)
+            if self.report is not None:
+                self.report.record_frame(scene, time.perf_counter() - start, layered.last_repeated)
+            yield frame, layered.last_repeated
+    
+    def _scene_clip(self, layered, fps, streaming=True, scene=None):
+        """Wrap a layered scene in a moviepy clip"""
+        # Imported here so only the moviepy backend pays for it
+        from moviepy.video.VideoClip import VideoClip
+        from moviepy.video.io.ImageSequenceClip import ImageSequenceClip
+        
+        total = layered.duration * fps
+        
+        def render(frame_num):
+            start = time.perf_counter()
+            frame = layered.render(frame_num / total)
+            if self.report is not None:
+                self.report.record_frame(scene, time.perf_counter() - start, layered.last_repeated)
+            # moviepy expects RGB; the view drops the padding byte without a copy
+            return frame[:, :, :3]
+        
+        if not streaming:
+            # Pool buffers are reused, so frames kept for the whole clip are copied
+            return ImageSequenceClip([render(n).copy() for n in range(total)], fps=fps)
+        
+        def make_frame(t):
+            # moviepy asks for frames by timestamp; map back to the frame index
+            return render(min(max(int(round(t * fps)), 0), total - 1))
+        
+        return VideoClip(make_frame, duration=layered.duration).set_fps(fps)
+    
+    @staticmethod
+    def _scaler(text_scale):
+        """Scale a nominal pixel size (text sizes, spacing) by text_scale"""
+        return lambda value: max(1, int(round(value * text_scale)))
+    
+    @staticmethod
+    def _layout_unit(width, height):
+        """Reference size for products: the width of the largest 9:16 area that fits
+        
+        Equal to the width in portrait; square and landscape layouts shrink the
+        product so the text bands above and below it stay clear.
+        """
+        return min(width, round(height * 9 / 16))
+    
+    def _background_layer(self, array):
+        """Static layer that copies a cached background array into the frame"""
+        return Layer(lambda frame, state: np.copyto(frame[:, :, :3], array), name="background")
+    
+    def _product_layer(self, product_img, size, x, y):
+        """Static layer with the product at a fixed size and position"""
+        def draw(frame, state):
+            blit(frame, self.sprites.get(product_img, size), x, y)
+        return Layer(draw, name="product")
+    
+    def _text_layer(self, text, x, y, size, color=(255, 255, 255), alpha=None, name=None):
+        """Text layer; `alpha(t)` returns None to hide it, omit it for static text"""
+        if alpha is None:
+            return Layer(lambda frame, state: self.add_text(frame, text, x, y, size=size, color=color),
+                         name=name)
+        return Layer(lambda frame, a: self.add_text(frame, text, x, y, size=size, color=color,
+                                                    alpha=a),
+                     state=alpha, name=name)
+    
+    def create_hook_scene(self, product_img, width, height, fps, product_name, streaming=True):
         """0-5s: Dramatic reveal with zoom and glow"""
-        duration = 5
-        frames = []
+        return self._scene_clip(self.build_scene("hook", product_img, width, height, product_name),
+                                fps, streaming, "hook")
+    
+    def build_hook_scene(self, product_img, width, height, product_name, text_scale=1.0):
+        px = self._scaler(text_scale)
+        full_size = int(self._layout_unit(width, height) * 0.6)
         
-        for frame_num in range(duration * fps):
-            t = frame_num / (duration * fps)
-            
-            # Create background with gradient
-            bg = Image.new('RGB', (width, height), (20, 20, 30))
-            draw = ImageDraw.Draw(bg)
-            
-            # Add radial gradient effect
-            for y in range(height):
-                for x in range(width):
-                    dist = ((x - width/2)**2 + (y - height/2)**2)**0.5
-                    max_dist = ((width/2)**2 + (height/2)**2)**0.5
-                    brightness = int(50 * (1 - dist/max_dist))
-                    draw.point((x, y), (20 + brightness, 20 + brightness, 30 + brightness))
-            
-            # Zoom effect: start small, zoom in
+        def product_state(t):
+            # Zoom effect: start small, zoom in while rotating
             scale = 0.3 + (t * 0.7)
-            
-            # Rotate product
-            rotation = t * 360
-            
-            # Resize and rotate product
-            prod_size = int(min(width, height) * 0.6 * scale)
-            product_resized = product_img.resize((prod_size, prod_size), Image.Resampling.LANCZOS)
-            product_rotated = product_resized.rotate(rotation, expand=False)
-            
-            # Add glow effect
-            glow = product_rotated.copy()
-            glow = glow.filter(ImageFilter.GaussianBlur(radius=20))
-            enhancer = ImageEnhance.Brightness(glow)
-            glow = enhancer.enhance(1.5)
-            
-            # Composite images
-            x_pos = (width - product_rotated.width) // 2
-            y_pos = (height - product_rotated.height) // 2
-            
-            bg.paste(glow, (x_pos, y_pos), glow)
-            bg.paste(product_rotated, (x_pos, y_pos), product_rotated)
-            
-            # Add text overlay
+            return int(full_size * scale), t * 360
+        
+        def draw_product(frame, state):
+            prod_size, rotation = state
+            # Product over its glow, blurred once at source resolution and
+            # scaled and rotated per frame in a single pass
+            sprite = self.sprites.get(product_img, prod_size, rotation, effect="glow", animated=True,
+                                      reference_size=full_size)
+            blit(frame, sprite, (width - sprite.width) // 2, (height - sprite.height) // 2)
+        
+        def title_alpha(t):
             if product_name and t > 0.5:
-                alpha = min((t - 0.5) * 2, 1)
-                self.add_text(bg, product_name.upper(), width//2, height//4, 
-                            size=80, alpha=int(alpha * 255))
-            
-            frames.append(np.array(bg))
+                return int(min((t - 0.5) * 2, 1) * 255)
+            return None
         
-        return ImageSequenceClip(frames, fps=fps)
+        layers = [
+            # Radial gradient background (built once per resolution)
+            self._background_layer(self.backgrounds.radial(width, height, (20, 20, 30), 50)),
+            Layer(draw_product, state=product_state, name="product"),
+            self._text_layer((product_name or "").upper(), width//2, height//4, px(80),
+                             alpha=title_alpha, name="title"),
+        ]
+        return LayeredScene(width, height, SCENE_DURATIONS["hook"], layers,
+                            pool=self.frame_pool(width, height))
     
-    def create_benefits_scene(self, product_img, width, height, fps):
+    def create_benefits_scene(self, product_img, width, height, fps, streaming=True):
         """5-15s: Benefits with pop-in animations"""
-        duration = 10
-        frames = []
-        
+        return self._scene_clip(self.build_scene("benefits", product_img, width, height),
+                                fps, streaming, "benefits")
+    
+    def build_benefits_scene(self, product_img, width, height, text_scale=1.0):
+        px = self._scaler(text_scale)
         benefits = [
             "Premium Quality",
             "Innovative Design",
@@ -141,203 +734,216 @@ class VideoGenerator:
             "Best Value"
         ]
         
-        for frame_num in range(duration * fps):
-            t = frame_num / (duration * fps)
-            
+        # Show product (smaller, to the side)
+        prod_size = int(self._layout_unit(width, height) * 0.4)
+        layers = [
             # Dark gradient background
-            bg = self.create_gradient_bg(width, height, (30, 30, 50), (50, 30, 70))
-            
-            # Show product (smaller, to the side)
-            prod_size = int(min(width, height) * 0.4)
-            product_resized = product_img.resize((prod_size, prod_size), Image.Resampling.LANCZOS)
-            
-            x_prod = width // 4
-            y_prod = (height - product_resized.height) // 2
-            bg.paste(product_resized, (x_prod, y_prod), product_resized)
-            
-            # Animate benefits one by one
-            benefit_index = int(t * len(benefits))
-            
-            for i, benefit in enumerate(benefits[:benefit_index + 1]):
-                if i == benefit_index:
-                    # Current benefit: pop-in animation
-                    progress = (t * len(benefits)) - benefit_index
-                    scale = min(progress * 2, 1)
-                    alpha = int(scale * 255)
-                else:
+            self._background_layer(self.backgrounds.linear(width, height, (30, 30, 50), (50, 30, 70))),
+            self._product_layer(product_img, prod_size, width // 4, (height - prod_size) // 2),
+        ]
+        
+        # Animate benefits one by one
+        for i, benefit in enumerate(benefits):
+            def benefit_state(t, i=i):
+                benefit_index = int(t * len(benefits))
+                if i > benefit_index:
+                    return None
+                if i < benefit_index:
                     # Previous benefits: fully visible
-                    scale = 1
-                    alpha = 255
-                
-                y_offset = height // 3 + (i * 120)
-                self.add_text(bg, f"✓ {benefit}", width * 3 // 4, y_offset, 
-                            size=int(50 * scale), alpha=alpha, color=(255, 215, 0))
-            
-            frames.append(np.array(bg))
+                    return px(50), 255
+                # Current benefit: pop-in animation
+                progress = (t * len(benefits)) - benefit_index
+                scale = min(progress * 2, 1)
+                return self.text.quantize_size(int(px(50) * scale)), int(scale * 255)
+            
+            def draw_benefit(frame, state, text=f"✓ {benefit}", y_offset=height // 3 + (i * px(120))):
+                size, alpha = state
+                self.add_text(frame, text, width * 3 // 4, y_offset,
+                              size=size, alpha=alpha, color=(255, 215, 0))
+            
+            layers.append(Layer(draw_benefit, state=benefit_state, name=f"benefit_{i}"))
         
-        return ImageSequenceClip(frames, fps=fps)
+        return LayeredScene(width, height, SCENE_DURATIONS["benefits"], layers,
+                            pool=self.frame_pool(width, height))
     
-    def create_social_proof_scene(self, product_img, width, height, fps):
+    def create_social_proof_scene(self, product_img, width, height, fps, streaming=True):
         """15-20s: Social proof with reviews"""
-        duration = 5
-        frames = []
+        return self._scene_clip(self.build_scene("social_proof", product_img, width, height),
+                                fps, streaming, "social_proof")
+    
+    def build_social_proof_scene(self, product_img, width, height, text_scale=1.0):
+        px = self._scaler(text_scale)
+        # Show product in center
+        prod_size = int(self._layout_unit(width, height) * 0.5)
         
-        for frame_num in range(duration * fps):
-            t = frame_num / (duration * fps)
-            
-            bg = self.create_gradient_bg(width, height, (40, 20, 60), (20, 40, 80))
-            
-            # Show product in center
-            prod_size = int(min(width, height) * 0.5)
-            product_resized = product_img.resize((prod_size, prod_size), Image.Resampling.LANCZOS)
-            
-            x_prod = (width - product_resized.width) // 2
-            y_prod = (height - product_resized.height) // 2
-            bg.paste(product_resized, (x_prod, y_prod), product_resized)
-            
-            # Add 5-star rating
-            stars = "★★★★★"
-            self.add_text(bg, stars, width//2, height//4, size=60, color=(255, 215, 0))
-            
-            # Add review count
-            self.add_text(bg, "10,000+ Happy Customers", width//2, height//4 + 80, 
-                        size=40, color=(255, 255, 255))
-            
-            # Add trust badge
+        def badge_alpha(t):
             if t > 0.3:
-                alpha = min((t - 0.3) * 2, 1)
-                self.add_text(bg, "🏆 #1 CHOICE", width//2, height * 3 // 4, 
-                            size=50, alpha=int(alpha * 255), color=(255, 215, 0))
-            
-            frames.append(np.array(bg))
+                return int(min((t - 0.3) * 2, 1) * 255)
+            return None
         
-        return ImageSequenceClip(frames, fps=fps)
+        layers = [
+            self._background_layer(self.backgrounds.linear(width, height, (40, 20, 60), (20, 40, 80))),
+            self._product_layer(product_img, prod_size, (width - prod_size) // 2, (height - prod_size) // 2),
+            # 5-star rating and review count
+            self._text_layer("★★★★★", width//2, height//4, px(60), color=(255, 215, 0), name="stars"),
+            self._text_layer("10,000+ Happy Customers", width//2, height//4 + px(80), px(40),
+                             color=(255, 255, 255), name="reviews"),
+            # Trust badge
+            self._text_layer("🏆 #1 CHOICE", width//2, height * 3 // 4, px(50), color=(255, 215, 0),
+                             alpha=badge_alpha, name="badge"),
+        ]
+        return LayeredScene(width, height, SCENE_DURATIONS["social_proof"], layers,
+                            pool=self.frame_pool(width, height))
     
-    def create_urgency_scene(self, product_img, width, height, fps, discount_text):
+    def create_urgency_scene(self, product_img, width, height, fps, discount_text, streaming=True):
         """20-25s: Urgency with discount badge"""
-        duration = 5
-        frames = []
-        
-        for frame_num in range(duration * fps):
-            t = frame_num / (duration * fps)
-            
-            # Red gradient for urgency
-            bg = self.create_gradient_bg(width, height, (80, 20, 20), (120, 30, 30))
-            
+        return self._scene_clip(self.build_scene("urgency", product_img, width, height,
+                                                 discount_text=discount_text),
+                                fps, streaming, "urgency")
+    
+    def build_urgency_scene(self, product_img, width, height, discount_text, text_scale=1.0):
+        px = self._scaler(text_scale)
+        unit = self._layout_unit(width, height)
+        def product_state(t):
             # Pulsing product
             pulse = 1 + (np.sin(t * 10) * 0.1)
-            prod_size = int(min(width, height) * 0.5 * pulse)
-            product_resized = product_img.resize((prod_size, prod_size), Image.Resampling.LANCZOS)
-            
-            x_prod = (width - product_resized.width) // 2
-            y_prod = (height - product_resized.height) // 2
-            bg.paste(product_resized, (x_prod, y_prod), product_resized)
-            
+            return int(unit * 0.5 * pulse)
+        
+        def draw_product(frame, prod_size):
+            sprite = self.sprites.get(product_img, prod_size, animated=True)
+            blit(frame, sprite, (width - sprite.width) // 2, (height - sprite.height) // 2)
+        
+        layers = [
+            # Red gradient for urgency
+            self._background_layer(self.backgrounds.linear(width, height, (80, 20, 20), (120, 30, 30))),
+            Layer(draw_product, state=product_state, name="product"),
             # Discount badge
-            discount = discount_text or "50% OFF"
-            self.add_text(bg, discount, width//2, height//4, size=90, 
-                        color=(255, 255, 0), alpha=int((1 + np.sin(t * 8)) / 2 * 255))
-            
+            self._text_layer(discount_text or "50% OFF", width//2, height//4, px(90), color=(255, 255, 0),
+                             alpha=lambda t: int((1 + np.sin(t * 8)) / 2 * 255), name="discount"),
             # Urgency text
-            self.add_text(bg, "LIMITED TIME ONLY!", width//2, height * 3 // 4, 
-                        size=50, color=(255, 255, 255))
-            
+            self._text_layer("LIMITED TIME ONLY!", width//2, height * 3 // 4, px(50),
+                             color=(255, 255, 255), name="urgency"),
             # CTA button
-            if t > 0.5:
-                self.add_text(bg, "👉 SHOP NOW 👈", width//2, height * 7 // 8, 
-                            size=60, color=(0, 255, 0))
-            
-            frames.append(np.array(bg))
-        
-        return ImageSequenceClip(frames, fps=fps)
+            self._text_layer("👉 SHOP NOW 👈", width//2, height * 7 // 8, px(60), color=(0, 255, 0),
+                             alpha=lambda t: 255 if t > 0.5 else None, name="cta"),
+        ]
+        return LayeredScene(width, height, SCENE_DURATIONS["urgency"], layers,
+                            pool=self.frame_pool(width, height))
     
-    def create_closing_scene(self, product_img, width, height, fps, product_name):
+    def create_closing_scene(self, product_img, width, height, fps, product_name, streaming=True):
         """25-30s: Epic closing with brand"""
-        duration = 5
-        frames = []
+        return self._scene_clip(self.build_scene("closing", product_img, width, height, product_name),
+                                fps, streaming, "closing")
+    
+    def build_closing_scene(self, product_img, width, height, product_name, text_scale=1.0):
+        px = self._scaler(text_scale)
+        unit = self._layout_unit(width, height)
+        def fill_background(frame, level):
+            frame.fill(level)
         
-        for frame_num in range(duration * fps):
-            t = frame_num / (duration * fps)
-            
-            # Fade to black
-            brightness = int(255 * (1 - t))
-            bg = Image.new('RGB', (width, height), (brightness//5, brightness//5, brightness//5))
-            
-            if t < 0.6:
-                # Product explosion effect
-                scale = 1 + (t * 2)
-                alpha = int(255 * (1 - t / 0.6))
-                
-                prod_size = int(min(width, height) * 0.6 * scale)
-                product_resized = product_img.resize((prod_size, prod_size), Image.Resampling.LANCZOS)
-                
-                # Apply fade
-                product_faded = Image.new('RGBA', product_resized.size, (0, 0, 0, 0))
-                product_faded.paste(product_resized, (0, 0))
-                product_faded.putalpha(alpha)
-                
-                x_prod = (width - product_resized.width) // 2
-                y_prod = (height - product_resized.height) // 2
-                bg.paste(product_faded, (x_prod, y_prod), product_faded)
-            
-            # Final CTA
+        def product_state(t):
+            if t >= 0.6:
+                return None
+            # Product explosion effect
+            scale = 1 + (t * 2)
+            return int(unit * 0.6 * scale), int(255 * (1 - t / 0.6))
+        
+        def draw_product(frame, state):
+            prod_size, alpha = state
+            sprite = self.sprites.get(product_img, prod_size, animated=True)
+            # Fade as a global opacity: the sprite's own transparency is kept
+            blit(frame, sprite, (width - sprite.width) // 2, (height - sprite.height) // 2,
+                 opacity=alpha)
+        
+        def brand_alpha(t):
             if t > 0.4:
-                alpha = min((t - 0.4) / 0.6, 1)
-                brand = product_name or "GET YOURS NOW"
-                self.add_text(bg, brand.upper(), width//2, height//2, 
-                            size=70, alpha=int(alpha * 255), color=(255, 255, 255))
-                
-                if t > 0.6:
-                    self.add_text(bg, "www.yourstore.com", width//2, height * 2 // 3, 
-                                size=40, alpha=int((t - 0.6) / 0.4 * 255), color=(200, 200, 200))
-            
-            frames.append(np.array(bg))
+                return int(min((t - 0.4) / 0.6, 1) * 255)
+            return None
+        
+        def website_alpha(t):
+            if t > 0.6:
+                return int((t - 0.6) / 0.4 * 255)
+            return None
         
-        return ImageSequenceClip(frames, fps=fps)
+        layers = [
+            # Fade to black
+            Layer(fill_background, state=lambda t: int(255 * (1 - t)) // 5, name="background"),
+            Layer(draw_product, state=product_state, name="product"),
+            # Final CTA
+            self._text_layer((product_name or "GET YOURS NOW").upper(), width//2, height//2, px(70),
+                             color=(255, 255, 255), alpha=brand_alpha, name="brand"),
+            self._text_layer("www.yourstore.com", width//2, height * 2 // 3, px(40),
+                             color=(200, 200, 200), alpha=website_alpha, name="website"),
+        ]
+        return LayeredScene(width, height, SCENE_DURATIONS["closing"], layers,
+                            pool=self.frame_pool(width, height))
     
     def create_gradient_bg(self, width, height, color1, color2):
         """Create gradient background"""
-        bg = Image.new('RGB', (width, height))
-        draw = ImageDraw.Draw(bg)
-        
-        for y in range(height):
-            t = y / height
-            r = int(color1[0] * (1-t) + color2[0] * t)
-            g = int(color1[1] * (1-t) + color2[1] * t)
-            b = int(color1[2] * (1-t) + color2[2] * t)
-            draw.line([(0, y), (width, y)], fill=(r, g, b))
-        
-        return bg
+        return Image.fromarray(self.backgrounds.linear(width, height, color1, color2))
     
-    def add_text(self, img, text, x, y, size=50, color=(255, 255, 255), alpha=255):
-        """Add text to image"""
-        draw = ImageDraw.Draw(img, 'RGBA')
-        
-        try:
-            # Try to use a nice font
-            font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", size)
-        except:
-            font = ImageFont.load_default()
+    def add_text(self, img, text, x, y, size=50, color=(255, 255, 255), alpha=255,
+                 quantize=False):
+        """Add text to a frame array or PIL image
         
-        # Get text bounding box
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        # Center text
-        position = (x - text_width // 2, y - text_height // 2)
-        
-        # Add text with alpha
-        color_with_alpha = (*color, alpha)
-        draw.text(position, text, font=font, fill=color_with_alpha)
+        Text is drawn from cached sprites; quantize=True snaps animated sizes
+        to a small set so each size is only rasterized once.
+        """
+        self.text.draw(img, text, x, y, size=size, color=color, alpha=alpha, quantize=quantize)
     
     def generate_voiceover(self, script):
-        """Generate voiceover using gTTS"""
+        """Generate voiceover with the TTS backend (gTTS by default), cached per script"""
+        with span(self.report, "generate_voiceover"):
+            try:
+                return self.voiceovers.get_or_create(script, self.tts)
+            except Exception as e:
+                print(f"Error generating voiceover: {e}")
+                return None
+    
+    def make_soundtrack(self, script, include_voiceover=True, include_music=False, duration=30):
+        """Voiceover and/or music as one in-memory AudioTrack, None when there is neither
+        
+        The voiceover is decoded once, padded or cut to `duration`, and
+        mixed with the ducked music bed without writing any audio file.
+        """
+        voiceover_path = self.generate_voiceover(script) if include_voiceover else None
+        with span(self.report, "build_soundtrack"):
+            try:
+                return build_soundtrack(duration, voiceover_path, music=include_music,
+                                        music_path=self.music_path)
+            except Exception as e:
+                print(f"Error building soundtrack: {e}")
+                return None
+    
+    def start_soundtrack(self, script, include_voiceover=True, include_music=False, duration=30):
+        """Run make_soundtrack in a background thread; returns a Future of the track"""
+        if self.overlap_voiceover:
+            return self._tts_pool.submit(self.make_soundtrack, script, include_voiceover,
+                                         include_music, duration)
+        future = Future()
+        future.set_result(self.make_soundtrack(script, include_voiceover, include_music, duration))
+        return future
+    
+    def _music_key(self, include_music):
+        """Music part of render cache keys
+
+        A music file is identified by its size and mtime as well as its path,
+        so replacing it in place invalidates the cached renders. A missing
+        file keys on None, like a render whose soundtrack failed.
+        """
+        if not include_music:
+            return None
+        if not self.music_path:
+            return "synthesized"
         try:
-            audio_path = self.temp_dir / "voiceover.mp3"
-            tts = gTTS(text=script, lang='en', slow=False)
-            tts.save(str(audio_path))
-            return str(audio_path)
-        except Exception as e:
-            print(f"Error generating voiceover: {e}")
+            stat = os.stat(self.music_path)
+        except OSError as e:
+            print(f"Error reading music file: {e}")
+            return None
+        return (str(self.music_path), stat.st_size, stat.st_mtime_ns)
+    
+    def _voice_key(self, include_voiceover):
+        """Voiceover part of render cache keys"""
+        if not include_voiceover:
             return None
+        return (self.tts.name, self.tts.lang, self.tts.voice, getattr(self.tts, "slow", False))
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from gtts import gTTS
+
+from ffmpeg_writer import get_ffmpeg_exe
+
+
+class GTTSBackend:
+    """Google Translate text-to-speech (needs network access)"""
+
+    name = "gtts"
+
+    def __init__(self, lang="en", voice="com", slow=False):
+        self.lang = lang
+        # gTTS picks the accent through the Google domain, e.g. "co.uk"
+        self.voice = voice
+        self.slow = slow
+
+    def synthesize(self, text, path):
+        gTTS(text=text, lang=self.lang, tld=self.voice, slow=self.slow).save(str(path))
+
+
+class ToneBackend:
+    """Offline stand-in: a quiet tone as long as the script would be spoken
+
+    `seconds` fixes the length instead of estimating it from the word count.
+    `latency` adds a fixed delay per call to imitate a network TTS service
+    when measuring how much of it overlaps with rendering.
+    """
+
+    name = "tone"
+
+    def __init__(self, lang="en", voice="sine", words_per_second=2.5, seconds=None, latency=0.0):
+        self.lang = lang
+        self.voice = voice
+        self.words_per_second = words_per_second
+        self.seconds = seconds
+        self.latency = latency
+
+    def synthesize(self, text, path):
+        time.sleep(self.latency)
+        seconds = self.seconds or max(1.0, len(text.split()) / self.words_per_second)
+        subprocess.run([get_ffmpeg_exe(), "-y", "-loglevel", "error", "-f", "lavfi",
+                        "-i", f"sine=frequency=220:duration={seconds:.2f}",
+                        "-q:a", "9", "-f", "mp3", str(path)], check=True)
+
+
+class VoiceoverCache:
+    """On-disk cache of synthesized voiceovers keyed by (script, language, voice)
+
+    Files are written under a temporary name and renamed into place, so
+    parallel renders never read a half-written MP3. Least recently used
+    entries are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, cache_dir, max_entries=64):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(script, backend):
+        inputs = {"script": script, "backend": backend.name,
+                  "lang": backend.lang, "voice": backend.voice,
+                  "slow": getattr(backend, "slow", False)}
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+    def path_for(self, key):
+        return self.cache_dir / f"{key}.mp3"
+
+    def get_or_create(self, script, backend):
+        """Path of the voiceover for `script`, synthesizing it on a miss"""
+        key = self.make_key(script, backend)
+        path = self.path_for(key)
+        if path.exists():
+            os.utime(path)
+            with self._lock:
+                self.hits += 1
+            return str(path)
+
+        with self._lock:
+            self.misses += 1
+        tmp = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            backend.synthesize(script, tmp)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        self.evict()
+        return str(path)
+
+    def evict(self):
+        entries = []
+        for path in self.cache_dir.glob("*.mp3"):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        # Always keep the newest entry, it was just written or used
+        for _, path in sorted(entries)[:-max(1, self.max_entries)]:
+            path.unlink(missing_ok=True)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(list(self.cache_dir.glob("*.mp3")))}
+
+    def clear(self):
+        for path in self.cache_dir.glob("*.mp3"):
+            path.unlink(missing_ok=True)